@@ -0,0 +1,63 @@
+"""
+Compare fixed and adaptive concurrency against the local stand-in, once on a
+fast link and once with a server that answers 429 past a concurrency limit.
+
+Usage: python benchmarks/bench_adaptive.py [-n CLIPS] [--media-limit N] [--ceiling N]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standin_server import StandinServer
+from downloader.downloader import download_clips
+from downloader.metrics import BatchMetrics
+
+def run(server, clips, download_workers, adaptive):
+    logger = logging.getLogger('bench_adaptive')
+    metrics = BatchMetrics()
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        summary = download_clips(
+            [{'name': str(i), 'url': server.clip_url(f"Slug{i}"), 'order': i, 'player': 'bench'}
+             for i in range(1, clips + 1)],
+            output_dir, max_workers=8, logger=logger, resolver='http', download_workers=download_workers,
+            use_cache=False, skip_existing=False, metrics=metrics, adaptive=adaptive
+        )
+        elapsed = time.perf_counter() - start
+    limit = download_workers
+    for line in metrics.prometheus_text().splitlines():
+        if line.startswith('twitch_clips_download_limit '):
+            limit = line.split()[1]
+    return summary, elapsed, limit
+
+def main():
+    parser = argparse.ArgumentParser(description='Adaptive concurrency benchmark')
+    parser.add_argument('-n', '--clips', type=int, default=300, help='Clips per run')
+    parser.add_argument('--payload-size', type=int, default=256 * 1024, help='Clip size in bytes')
+    parser.add_argument('--bandwidth', type=int, default=1024 * 1024, help='Per-connection throttle in bytes/s')
+    parser.add_argument('--media-limit', type=int, default=8, help='Concurrent transfers the throttling server allows')
+    parser.add_argument('--ceiling', type=int, default=64, help='Download ceiling for the adaptive runs')
+    args = parser.parse_args()
+
+    scenarios = (('fast link', 0), (f"429 past {args.media_limit}", args.media_limit))
+    runs = (('fixed 5', 5, False), ('fixed 20', 20, False), (f"adaptive 1-{args.ceiling}", args.ceiling, True))
+    for scenario, media_limit in scenarios:
+        server = StandinServer(payload_size=args.payload_size, bandwidth=args.bandwidth,
+                               media_limit=media_limit).start()
+        try:
+            for label, workers, adaptive in runs:
+                throttled_before = server.throttled_responses
+                summary, elapsed, limit = run(server, args.clips, workers, adaptive)
+                print(f"{scenario:<14} {label:<14} {elapsed:6.2f}s  {summary['completed'] / elapsed:7.1f} clips/s  "
+                      f"failed {summary['failed']:>4}  429s {server.throttled_responses - throttled_before:>5}  "
+                      f"final limit {limit}")
+        finally:
+            server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compare the streaming clip list parser with the original list-based one.
+
+Usage: python benchmarks/bench_clip_loader.py [-n LINES]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader.clip_loader import iter_clips
+
+def legacy_load_clips_info(input_text):
+    # The parser as it was before iter_clips, kept here as the baseline
+    clips_info = []
+    lines = input_text.split('\n')
+    current_index = 1
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        if not line:
+            i += 1
+            continue
+        username_match = re.match(r'^@(\S+)', line)
+        if username_match:
+            username = username_match.group(1)
+            j = i + 1
+            while j < len(lines):
+                url_line = lines[j].strip()
+                url_match = re.search(r'https?://(?:www\.)?twitch\.tv/[^/]+/clip/[\w-]+(?:\?[^\s]*)?', url_line)
+                if url_match:
+                    clips_info.append({
+                        'name': str(current_index),
+                        'url': url_match.group(0),
+                        'order': current_index,
+                        'player': username
+                    })
+                    current_index += 1
+                    i = j
+                    break
+                j += 1
+        i += 1
+    return clips_info
+
+def make_input(lines):
+    """
+    Build a well-formed export with ``lines`` lines.
+    """
+    out = []
+    for pair in range(lines // 2):
+        out.append(f"@Player{pair}")
+        out.append(f"https://www.twitch.tv/streamer{pair % 97}/clip/Slug{pair}-abcDEF?filter=clips")
+    return '\n'.join(out)
+
+def measure(label, fn):
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+
+    # Second run for memory, tracemalloc would skew the timing
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {label:<10} {elapsed:8.3f}s  peak {peak / 2 ** 20:8.1f} MiB  {count} clips")
+
+def main():
+    parser = argparse.ArgumentParser(description='Clip list parser benchmark')
+    parser.add_argument('-n', '--lines', type=int, default=1_000_000, help='Lines in the generated export')
+    parser.add_argument('--orphan-lines', type=int, default=4_000, help='Lines in the orphan-heavy input')
+    args = parser.parse_args()
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_clips_input.txt')
+    for title, text in (
+        (f"{args.lines} lines, well formed", make_input(args.lines)),
+        # Mentions without a URL made the old parser rescan to the end for each one
+        (f"{args.orphan_lines} lines, trailing orphan mentions",
+         make_input(args.orphan_lines // 2) + '\n' + '\n'.join(f"@orphan{i}" for i in range(args.orphan_lines // 2))),
+    ):
+        assert [c.as_dict() for c in iter_clips(text)] == legacy_load_clips_info(text)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        del text
+        print(title)
+        try:
+            def run_legacy():
+                with open(path, encoding='utf-8') as f:
+                    return len(legacy_load_clips_info(f.read()))
+
+            def run_streaming():
+                with open(path, encoding='utf-8') as f:
+                    return sum(1 for _ in iter_clips(f))
+
+            measure('legacy', run_legacy)
+            measure('streaming', run_streaming)
+        finally:
+            os.remove(path)
+
+if __name__ == "__main__":
+    main()
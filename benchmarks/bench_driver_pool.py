@@ -0,0 +1,78 @@
+"""
+Compare per-clip browser startup with the pooled WebDriver mode.
+
+Serves a minimal clip page from a local HTTP server so only browser cost is measured.
+
+Usage: python benchmarks/bench_driver_pool.py [-n CLIPS] [-w WORKERS]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader.driver_pool import DriverPool, create_driver, get_driver_path
+from downloader.twitch_parser import get_clip_download_url
+
+CLIP_PAGE = b'<html><body><video src="http://127.0.0.1/clip.mp4"></video></body></html>'
+
+class ClipPageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(CLIP_PAGE)))
+        self.end_headers()
+        self.wfile.write(CLIP_PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+def run_per_clip(urls, workers):
+    def resolve(url):
+        driver = create_driver()
+        try:
+            return get_clip_download_url(url, driver)
+        finally:
+            driver.quit()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(resolve, urls))
+
+def run_pooled(urls, workers):
+    with DriverPool(workers) as pool:
+        def resolve(url):
+            with pool.driver() as driver:
+                return get_clip_download_url(url, driver)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(resolve, urls))
+
+def main():
+    parser = argparse.ArgumentParser(description='WebDriver pool benchmark')
+    parser.add_argument('-n', '--clips', type=int, default=20, help='Number of clips to resolve')
+    parser.add_argument('-w', '--workers', type=int, default=5, help='Number of concurrent workers')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ClipPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_port}/user/clip/Slug{i}" for i in range(args.clips)]
+
+    # Resolve the driver binary up front so neither mode pays for the download
+    get_driver_path()
+
+    for label, runner in (('per-clip', run_per_clip), ('pooled', run_pooled)):
+        start = time.perf_counter()
+        results = runner(urls, args.workers)
+        elapsed = time.perf_counter() - start
+        resolved = sum(1 for r in results if r)
+        print(f"{label:>8}: {elapsed:7.2f}s total, {elapsed / args.clips * 1000:7.1f} ms/clip, "
+              f"{resolved}/{args.clips} resolved")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compare download throughput of the thread engine and the asyncio engine
+against the local CDN stand-in.
+
+Usage: python benchmarks/bench_engines.py [-c 5 50 500] [--payload-size BYTES]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standin_server import StandinServer
+from downloader.async_engine import AsyncDownloadEngine
+from downloader.file_manager import save_clip
+
+def run_threads(urls, output_dir, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i, url in enumerate(urls):
+            executor.submit(save_clip, url, f"clip{i}", output_dir, None)
+
+def run_asyncio(urls, output_dir, concurrency):
+    with AsyncDownloadEngine(max_concurrency=concurrency) as engine:
+        wait([engine.submit(url, f"clip{i}", output_dir) for i, url in enumerate(urls)])
+
+def main():
+    parser = argparse.ArgumentParser(description='Transfer engine benchmark')
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[5, 50, 500],
+                        help='Concurrent clips to benchmark')
+    parser.add_argument('--payload-size', type=int, default=512 * 1024, help='Clip size in bytes')
+    args = parser.parse_args()
+
+    server = StandinServer(payload_size=args.payload_size).start()
+    try:
+        for concurrency in args.concurrency:
+            urls = [server.media_url(f"Slug{i}") for i in range(concurrency)]
+            for label, runner in (('threads', run_threads), ('asyncio', run_asyncio)):
+                with tempfile.TemporaryDirectory() as output_dir:
+                    start = time.perf_counter()
+                    runner(urls, output_dir, concurrency)
+                    elapsed = time.perf_counter() - start
+                    total = sum(os.path.getsize(os.path.join(output_dir, f)) for f in os.listdir(output_dir))
+                print(f"{concurrency:>4} clips {label:<8} {elapsed:6.2f}s  "
+                      f"{concurrency / elapsed:8.1f} clips/s  {total / elapsed / 2 ** 20:8.1f} MiB/s")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
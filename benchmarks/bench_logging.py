@@ -0,0 +1,87 @@
+"""
+Measure what logging costs the threads that log: time for T threads to log
+N per-clip records each, with the file and console handlers attached
+directly to the logger (as before) and through setup_logger's queue: waiting
+for room (the default), sampled, or dropping records when the writer is behind.
+
+Usage: python benchmarks/bench_logging.py [-n RECORDS] [-t THREADS ...]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logger import WorkerQueueHandler, setup_logger, stop_logger
+
+def direct_logger(log_dir):
+    logger = logging.getLogger('TwitchClipDownloader')
+    logger.setLevel(logging.INFO)
+    logger.handlers = []
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    for handler in (RotatingFileHandler(os.path.join(log_dir, 'download.log'), maxBytes=1048576, backupCount=5),
+                    logging.StreamHandler(open(os.devnull, 'w'))):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
+
+def run(logger, threads, records):
+    """
+    :return: Wall seconds until every thread has logged its records.
+    """
+    def work(worker):
+        for i in range(records):
+            logger.info(f"Download completed: {worker * records + i}@bench",
+                        extra={'order': i, 'player': 'bench', 'phase': 'download', 'duration': 0.5})
+
+    workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Logging overhead benchmark')
+    parser.add_argument('-n', '--records', type=int, default=2000, help='Records per thread')
+    parser.add_argument('-t', '--threads', type=int, nargs='+', default=[1, 8, 32], help='Logging threads')
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        total = threads * args.records
+        with tempfile.TemporaryDirectory() as log_dir:
+            logger = direct_logger(log_dir)
+            elapsed = run(logger, threads, args.records)
+            for handler in logger.handlers:
+                handler.close()
+            print(f"{threads:>3} threads  direct        {elapsed / total * 1e6:7.2f} us/record in the worker")
+
+        with tempfile.TemporaryDirectory() as log_dir:
+            # The console handler writes to stderr; keep it out of the way
+            stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+            try:
+                json_file = os.path.join(log_dir, 'log.jsonl')
+                for label, options in (('queue', {}), ('queue + json', {'json_file': json_file}),
+                                       ('queue 10%', {'sample_rate': 0.1}),
+                                       ('queue + drop', {'drop_when_behind': True})):
+                    logger = setup_logger(log_dir=log_dir, **options)
+                    elapsed = run(logger, threads, args.records)
+                    dropped = sum(h.dropped for h in logger.handlers if isinstance(h, WorkerQueueHandler))
+                    flush_start = time.perf_counter()
+                    stop_logger()
+                    drained = time.perf_counter() - flush_start
+                    print(f"{threads:>3} threads  {label:<13} {elapsed / total * 1e6:7.2f} us/record in the worker, "
+                          f"listener done {drained * 1000:6.1f} ms later, {dropped} dropped")
+            finally:
+                sys.stderr.close()
+                sys.stderr = stderr
+        logging.getLogger('TwitchClipDownloader').handlers = []
+
+if __name__ == "__main__":
+    main()
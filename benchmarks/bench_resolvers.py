@@ -0,0 +1,84 @@
+"""
+Measure resolve latency of the HTTP resolver against recorded clip pages, and
+round trips of the batched GQL resolver against the mock endpoint.
+
+With --selenium, the browser resolver is also measured in full and lean mode
+against a page whose player adds the <video> element from script, with slow
+images, fonts and stylesheets (--asset-delay).
+
+Usage: python benchmarks/bench_resolvers.py [-n CLIPS] [-b BATCH_SIZE] [--selenium [--asset-delay SECONDS]]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standin_server import StandinServer
+from downloader.resolvers import create_resolver, GqlResolver, GQL_MAX_BATCH_SIZE
+
+FIXTURES = ('clip_page_og.html', 'clip_page_jsonld.html', 'clip_page_inline.html')
+PLAYER_FIXTURE = 'clip_page_player.html'
+
+def bench(resolver_name, server, clips, lean_browser=False):
+    with create_resolver(resolver_name, max_workers=1, lean_browser=lean_browser) as resolver:
+        latencies = []
+        resolved = 0
+        for i in range(clips):
+            slug = f"Slug{i}"
+            start = time.perf_counter()
+            url = resolver.resolve(server.clip_url(slug))
+            latencies.append(time.perf_counter() - start)
+            resolved += url == server.media_url(slug)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return resolved, p50, p99
+
+def bench_gql(server, clips, batch_size):
+    urls = [server.clip_url(f"Slug{i}") for i in range(clips)]
+    with GqlResolver(batch_size=batch_size, gql_url=f"{server.base_url}/gql") as resolver:
+        start = time.perf_counter()
+        resolver.prefetch(urls)
+        resolved = sum(1 for url in urls if resolver.resolve(url))
+        elapsed = time.perf_counter() - start
+    return resolved, elapsed, server.gql_requests
+
+def main():
+    parser = argparse.ArgumentParser(description='Clip resolver benchmark')
+    parser.add_argument('-n', '--clips', type=int, default=200, help='Clips to resolve per fixture')
+    parser.add_argument('-b', '--batch-size', type=int, default=GQL_MAX_BATCH_SIZE, help='Slugs per GQL request')
+    parser.add_argument('--selenium', action='store_true', help='Also benchmark the Selenium resolver')
+    parser.add_argument('--asset-delay', type=float, default=0.2, help='Seconds per page asset for --selenium')
+    args = parser.parse_args()
+
+    for fixture in FIXTURES:
+        server = StandinServer(fixture=fixture).start()
+        try:
+            resolved, p50, p99 = bench('http', server, args.clips)
+            print(f"{fixture:<24} {'http':<9} {resolved}/{args.clips} resolved, "
+                  f"p50 {p50:7.2f} ms, p99 {p99:7.2f} ms")
+        finally:
+            server.stop()
+
+    if args.selenium:
+        server = StandinServer(fixture=PLAYER_FIXTURE, asset_delay=args.asset_delay).start()
+        try:
+            for label, lean in (('selenium', False), ('lean', True)):
+                resolved, p50, p99 = bench('selenium', server, args.clips, lean_browser=lean)
+                print(f"{PLAYER_FIXTURE:<24} {label:<9} {resolved}/{args.clips} resolved, "
+                      f"p50 {p50:7.2f} ms, p99 {p99:7.2f} ms")
+        finally:
+            server.stop()
+
+    server = StandinServer().start()
+    try:
+        resolved, elapsed, requests_made = bench_gql(server, args.clips, args.batch_size)
+        print(f"{'gql mock':<24} {'gql':<9} {resolved}/{args.clips} resolved in {requests_made} requests, "
+              f"{elapsed * 1000:7.2f} ms total")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
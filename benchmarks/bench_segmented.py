@@ -0,0 +1,38 @@
+"""
+Compare single-stream and segmented downloads against a range-capable server
+that throttles each connection.
+
+Usage: python benchmarks/bench_segmented.py [--size BYTES] [--bandwidth BYTES_PER_SEC]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standin_server import StandinServer
+from downloader.file_manager import save_clip
+
+def main():
+    parser = argparse.ArgumentParser(description='Segmented download benchmark')
+    parser.add_argument('--size', type=int, default=32 * 1024 * 1024, help='Clip size in bytes')
+    parser.add_argument('--bandwidth', type=int, default=4 * 1024 * 1024, help='Per-connection throttle in bytes/s')
+    args = parser.parse_args()
+
+    server = StandinServer(payload_size=args.size, bandwidth=args.bandwidth).start()
+    try:
+        for label, segmented in (('single', False), ('segmented', True)):
+            with tempfile.TemporaryDirectory() as output_dir:
+                start = time.perf_counter()
+                save_clip(server.media_url('Slug'), 'clip', output_dir, None, segmented=segmented)
+                elapsed = time.perf_counter() - start
+                with open(os.path.join(output_dir, 'clip.mp4'), 'rb') as f:
+                    intact = f.read() == server.payload
+            print(f"{label:<10} {elapsed:6.2f}s  {args.size / elapsed / 2 ** 20:7.1f} MiB/s  intact={intact}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
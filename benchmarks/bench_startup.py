@@ -0,0 +1,84 @@
+"""
+Measure import cost of the core package, the CLI and the GUI with
+``python -X importtime`` and check it against a regression budget.
+
+The core and CLI must also stay free of Qt, Selenium and the other heavy
+backends, which are only loaded once they are selected.
+
+Usage: python benchmarks/bench_startup.py [-r RUNS] [--json FILE]
+Exits with status 1 if a budget is exceeded or a heavy module leaks in.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets in milliseconds of cumulative import time (median of the runs)
+TARGETS = {
+    'downloader.downloader': 150,
+    'cli': 200,
+    'gui': 600,
+}
+
+HEAVY_MODULES = ('PyQt6', 'selenium', 'webdriver_manager', 'aiohttp', 'bs4')
+QT_FREE = ('downloader.downloader', 'cli')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+def measure(module):
+    """
+    Import a module in a fresh interpreter.
+
+    :return: Tuple of (cumulative import time of the module in ms, set of heavy top-level modules loaded).
+    """
+    code = (
+        f"import sys; import {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    cumulative = None
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and match.group(4) == module and len(match.group(3)) == 1:
+            cumulative = int(match.group(2)) / 1000
+    loaded = {m for m in result.stdout.strip().split(',') if m}
+    return cumulative, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup import-time benchmark')
+    parser.add_argument('-r', '--runs', type=int, default=5, help='Runs per module (median is reported)')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    ok = True
+    for module, budget in TARGETS.items():
+        timings = []
+        loaded = set()
+        for _ in range(args.runs):
+            cumulative, loaded = measure(module)
+            timings.append(cumulative)
+        timings.sort()
+        median = timings[len(timings) // 2]
+
+        leaked = sorted(loaded) if module in QT_FREE else []
+        within = median <= budget and not leaked
+        ok = ok and within
+        results[module] = {'median_ms': median, 'budget_ms': budget, 'heavy_modules': sorted(loaded)}
+        status = 'ok' if within else 'OVER BUDGET' if not leaked else f"LOADS {', '.join(leaked)}"
+        print(f"{module:<24} {median:8.1f} ms  (budget {budget} ms)  {status}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+End-to-end benchmark of download_clips against the local stand-in server,
+across clip counts, concurrency levels and transfer engines.
+
+Each case runs in its own process so peak RSS and CPU time belong to that
+case alone; the stand-in runs in this process and is not counted. Results
+can be saved as JSON and compared with an earlier run (e.g. another commit).
+
+Usage: python benchmarks/bench_suite.py [-n 50 200] [-c 5 20] [--engine threads asyncio]
+                                        [--latency S] [--bandwidth B] [--error-rate R] [--media-limit N]
+                                        [--json FILE] [--compare FILE]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def get_peak_rss():
+    """
+    :return: Peak resident set size of this process in bytes, or None if unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def run_case(case):
+    """
+    Run one benchmark case in this process and return its measurements.
+    """
+    from downloader.downloader import download_clips
+    from downloader.metrics import BatchMetrics
+
+    logger = logging.getLogger('bench_suite')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    clips = [{'name': str(i), 'url': f"{case['base_url']}/streamer/clip/Slug{i}", 'order': i, 'player': 'bench'}
+             for i in range(1, case['clips'] + 1)]
+    with tempfile.TemporaryDirectory() as output_dir:
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        summary = download_clips(
+            clips, output_dir, max_workers=case['resolvers'], logger=logger, resolver='http',
+            engine=case['engine'], download_workers=case['workers'], use_cache=False, skip_existing=False,
+            metrics=BatchMetrics(), adaptive=case['adaptive']
+        )
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+
+    latencies = [c.get('resolve_seconds', 0) + c.get('download_seconds', 0) for c in summary['clips']]
+    peak_rss = get_peak_rss()
+    return {
+        'clips': case['clips'],
+        'workers': case['workers'],
+        'engine': case['engine'],
+        'adaptive': case['adaptive'],
+        'completed': summary['completed'],
+        'failed': summary['failed'],
+        'elapsed_seconds': round(elapsed, 3),
+        'clips_per_second': round(summary['completed'] / elapsed, 2) if elapsed else None,
+        'latency_p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        'peak_rss_mb': round(peak_rss / 2 ** 20, 1) if peak_rss else None,
+        'cpu_seconds': round(cpu, 3),
+    }
+
+def spawn_case(case, verbose=False):
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-case', json.dumps(case)],
+        stdout=subprocess.PIPE, stderr=None if verbose else subprocess.DEVNULL, text=True, cwd=ROOT
+    )
+    if process.returncode:
+        raise RuntimeError(f"Benchmark case failed: {case}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def case_key(result):
+    return result['clips'], result['workers'], result['engine'], result['adaptive']
+
+def print_result(result, baseline=None):
+    line = (f"{result['clips']:>5} clips  {result['engine']:<8} {'adaptive ' if result['adaptive'] else ''}"
+            f"{result['workers']:>3} workers  {result['clips_per_second']:8.1f} clips/s  "
+            f"p50 {result['latency_p50_ms']:8.1f} ms  p99 {result['latency_p99_ms']:8.1f} ms  "
+            f"rss {result['peak_rss_mb']} MB  cpu {result['cpu_seconds']:6.2f}s  failed {result['failed']}")
+    if baseline:
+        change = (result['clips_per_second'] / baseline['clips_per_second'] - 1) * 100
+        line += f"  ({change:+.1f}% clips/s vs baseline)"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end download benchmark')
+    parser.add_argument('-n', '--clips', type=int, nargs='+', default=[50, 200], help='Clip counts')
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[5, 20],
+                        help='Download concurrency levels')
+    parser.add_argument('--engine', nargs='+', choices=['threads', 'asyncio'], default=['threads', 'asyncio'])
+    parser.add_argument('--adaptive', action='store_true', help='Treat concurrency levels as adaptive ceilings')
+    parser.add_argument('--resolvers', type=int, default=5, help='Resolver threads')
+    parser.add_argument('--payload-size', type=int, default=512 * 1024, help='Clip size in bytes')
+    parser.add_argument('--page-delay', type=float, default=0.0, help='Clip page render delay in seconds')
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds added before every response')
+    parser.add_argument('--bandwidth', type=int, default=4 * 1024 * 1024, help='Per-connection bytes/s')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--media-limit', type=int, default=0, help='Concurrent transfers before 429s')
+    parser.add_argument('--seed', type=int, default=1, help='Error injection seed')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Earlier results file to compare clips/s against')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Show the log output of each case')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    from benchmarks.standin_server import StandinServer
+
+    server_config = {
+        'payload_size': args.payload_size,
+        'page_delay': args.page_delay,
+        'latency': args.latency,
+        'bandwidth': args.bandwidth,
+        'error_rate': args.error_rate,
+        'media_limit': args.media_limit,
+        'seed': args.seed,
+    }
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = {case_key(r): r for r in json.load(f)['results']}
+
+    results = []
+    for clips in args.clips:
+        for workers in args.concurrency:
+            for engine in args.engine:
+                # A fresh server per case keeps throttling and error counters independent
+                server = StandinServer(**server_config).start()
+                try:
+                    case = {'base_url': server.base_url, 'clips': clips, 'workers': workers, 'engine': engine,
+                            'adaptive': args.adaptive, 'resolvers': args.resolvers}
+                    result = spawn_case(case, args.verbose)
+                finally:
+                    server.stop()
+                result['errors_injected'] = server.errors_injected
+                result['throttled_responses'] = server.throttled_responses
+                results.append(result)
+                print_result(result, baseline.get(case_key(result)))
+
+    if args.json:
+        report = {
+            'commit': get_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'server': server_config,
+            'results': results,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Measure the cost of the streaming MP4 validator: CPU time per MiB fed at
+several chunk sizes, and wall/CPU time of save_clip with and without
+validation against the local stand-in server.
+
+Usage: python benchmarks/bench_validator.py [--size BYTES] [-n CLIPS]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standin_server import StandinServer, make_payload
+from downloader.file_manager import save_clip
+from downloader.mp4_validator import Mp4Validator
+
+def feed_cost(payload, chunk_size, rounds):
+    """
+    :return: CPU seconds per MiB spent in Mp4Validator.feed/finish.
+    """
+    view = memoryview(payload)
+    chunks = [view[i:i + chunk_size] for i in range(0, len(view), chunk_size)]
+    start = time.process_time()
+    for _ in range(rounds):
+        validator = Mp4Validator()
+        for chunk in chunks:
+            validator.feed(chunk)
+        validator.finish()
+    return (time.process_time() - start) / (rounds * len(payload) / 2 ** 20)
+
+def main():
+    parser = argparse.ArgumentParser(description='MP4 validator overhead benchmark')
+    parser.add_argument('--size', type=int, default=32 * 1024 * 1024, help='Clip size in bytes')
+    parser.add_argument('-n', '--clips', type=int, default=20, help='Clips per end-to-end run')
+    args = parser.parse_args()
+
+    payload = make_payload(args.size)
+    for chunk_size in (8 * 1024, 64 * 1024, 256 * 1024):
+        rounds = max(1, 2 ** 28 // args.size * chunk_size // (256 * 1024))
+        print(f"feed {chunk_size // 1024:>4} KiB chunks  {feed_cost(payload, chunk_size, rounds) * 1e6:8.2f} us/MiB")
+
+    server = StandinServer(payload_size=args.size).start()
+    try:
+        for label, validate in (('save_clip', False), ('save_clip + validate', True)):
+            with tempfile.TemporaryDirectory() as output_dir:
+                cpu_start = time.process_time()
+                start = time.perf_counter()
+                for i in range(args.clips):
+                    save_clip(server.media_url(f"Slug{i}"), str(i), output_dir, None, validate=validate)
+                elapsed = time.perf_counter() - start
+                cpu = time.process_time() - cpu_start
+            # CPU time includes the in-process stand-in server, which is the same for both runs
+            total = args.clips * args.size / 2 ** 20
+            print(f"{label:<22} {elapsed:6.2f}s  {total / elapsed:7.1f} MiB/s  cpu {cpu / total * 1000:6.2f} ms/MiB")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
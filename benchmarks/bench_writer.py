@@ -0,0 +1,104 @@
+"""
+Compare the buffered disk writer with the previous 8 KiB iter_content writer,
+downloading many clips at once from the local stand-in server.
+
+Each writer runs in its own process so its CPU time is not mixed with the
+server's.
+
+Usage: python benchmarks/bench_writer.py [-n CLIPS] [-c CONCURRENCY] [--size BYTES]
+                                         [--buffer-sizes KIB ...] [--fsync] [--drop-cache]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def legacy_save(session, url, file_path):
+    # The writer save_clip used before the DiskWriter
+    with session.get(url, stream=True, timeout=(10, 60)) as response:
+        response.raise_for_status()
+        with open(file_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                f.write(chunk)
+
+def run_case(case):
+    from downloader.disk_writer import DiskWriter
+    from downloader.file_manager import create_session, save_clip
+    import downloader.file_manager as file_manager
+
+    session = create_session(case['concurrency'])
+    file_manager._session = session
+    writer = None
+    if case['buffer_size']:
+        writer = DiskWriter(buffer_size=case['buffer_size'], buffers=2 * case['concurrency'],
+                            fsync=case['fsync'], drop_cache=case['drop_cache']).start()
+
+    def download(i, output_dir):
+        url = f"{case['base_url']}/media/Slug{i}.mp4"
+        if writer is None:
+            path = os.path.join(output_dir, f"{i}.mp4")
+            legacy_save(session, url, path)
+            if case['fsync']:
+                with open(path, 'rb+') as f:
+                    os.fsync(f.fileno())
+        else:
+            save_clip(url, str(i), output_dir, None, writer=writer)
+
+    with tempfile.TemporaryDirectory(dir=case['dir']) as output_dir:
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=case['concurrency']) as executor:
+            list(executor.map(lambda i: download(i, output_dir), range(case['clips'])))
+        if writer is not None:
+            writer.close()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        sizes = {os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir)}
+
+    return {'elapsed': elapsed, 'cpu': cpu, 'intact': sizes == {case['size']}}
+
+def main():
+    parser = argparse.ArgumentParser(description='Disk writer benchmark')
+    parser.add_argument('-n', '--clips', type=int, default=100, help='Clips per run')
+    parser.add_argument('-c', '--concurrency', type=int, default=20, help='Concurrent downloads')
+    parser.add_argument('--size', type=int, default=8 * 1024 * 1024, help='Clip size in bytes')
+    parser.add_argument('--buffer-sizes', type=int, nargs='+', default=[64, 256, 1024],
+                        help='DiskWriter buffer sizes in KiB')
+    parser.add_argument('--fsync', action='store_true', help='fsync every clip')
+    parser.add_argument('--drop-cache', action='store_true', help='Drop finished clips from the page cache')
+    parser.add_argument('--dir', help='Directory to write to (defaults to the system temp directory)')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    from benchmarks.standin_server import StandinServer
+
+    server = StandinServer(payload_size=args.size).start()
+    try:
+        runs = [('iter_content 8 KiB', 0)] + [(f"DiskWriter {size} KiB", size * 1024) for size in args.buffer_sizes]
+        total = args.clips * args.size
+        for label, buffer_size in runs:
+            case = {'base_url': server.base_url, 'clips': args.clips, 'concurrency': args.concurrency,
+                    'size': args.size, 'buffer_size': buffer_size, 'fsync': args.fsync,
+                    'drop_cache': args.drop_cache, 'dir': args.dir}
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', json.dumps(case)],
+                                     stdout=subprocess.PIPE, text=True, cwd=ROOT, check=True)
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            print(f"{label:<20} {result['elapsed']:6.2f}s  {total / result['elapsed'] / 2 ** 20:8.1f} MiB/s  "
+                  f"cpu {result['cpu']:6.2f}s  ({result['cpu'] / (total / 2 ** 30):5.2f} s/GiB)  "
+                  f"intact={result['intact']}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Local stand-in for Twitch clip pages and the clip CDN.
+
+Serves recorded clip pages from benchmarks/fixtures with the media URL pointed
+back at this server, deterministic MP4-shaped payloads for each slug, filler
+page assets under /static/ and a mock of the batched GQL clip access token
+endpoint at /gql.
+
+Network conditions are configurable: per-request latency, clip page render
+delay, per-connection bandwidth, a random error rate and 429 throttling past
+a number of concurrent transfers.
+
+Usage: python benchmarks/standin_server.py [--port PORT] [--fixture NAME]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+CLIP_PATH = re.compile(r'^/(?P<user>[^/]+)/clip/(?P<slug>[\w-]+)')
+MEDIA_PATH = re.compile(r'^/media/(?P<slug>[\w-]+)\.mp4')
+STATIC_PATH = re.compile(r'^/static/[\w.-]+\.(?P<ext>\w+)')
+STATIC_TYPES = {
+    'css': 'text/css', 'js': 'application/javascript', 'png': 'image/png', 'jpg': 'image/jpeg',
+    'woff2': 'font/woff2', 'svg': 'image/svg+xml',
+}
+RANGE_PATTERN = re.compile(r'bytes=(\d+)-(\d*)$')
+
+PAYLOAD_ETAG = '"standin-payload-1"'
+PAYLOAD_LAST_MODIFIED = 'Wed, 01 May 2024 18:22:10 GMT'
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+def make_payload(size):
+    """
+    Build an MP4-shaped payload (ftyp + moov + mdat boxes, 28 s at 1920x1080) of exactly ``size`` bytes.
+
+    :param size: Total payload size in bytes.
+    :return: bytes
+    """
+    ftyp = struct.pack('>I4s4sI8s', 24, b'ftyp', b'isom', 512, b'isomiso2')
+    # mvhd v0: timescale 1000, duration 28s
+    mvhd_body = struct.pack('>B3xIIII', 0, 0, 0, 1000, 28000) + b'\x00' * 80
+    mvhd = struct.pack('>I4s', 8 + len(mvhd_body), b'mvhd') + mvhd_body
+    # tkhd v0 of a 1920x1080 video track; width and height are 16.16 fixed point
+    tkhd_body = struct.pack('>B3x', 0) + b'\x00' * 72 + struct.pack('>II', 1920 << 16, 1080 << 16)
+    tkhd = struct.pack('>I4s', 8 + len(tkhd_body), b'tkhd') + tkhd_body
+    trak = struct.pack('>I4s', 8 + len(tkhd), b'trak') + tkhd
+    moov = struct.pack('>I4s', 8 + len(mvhd) + len(trak), b'moov') + mvhd + trak
+    header = ftyp + moov
+    mdat_size = max(size - len(header), 8)
+    mdat = struct.pack('>I4s', mdat_size, b'mdat')
+    filler = bytes(range(256)) * (mdat_size // 256 + 1)
+    return header + mdat + filler[:mdat_size - 8]
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _inject_faults(self):
+        """
+        Apply the configured latency and error rate to this request.
+
+        :return: True if an error response was sent and the request is done.
+        """
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and server.roll() < server.error_rate:
+            with server.lock:
+                server.errors_injected += 1
+            self._send(503, b'Service Unavailable', 'text/plain')
+            return True
+        return False
+
+    def do_GET(self):
+        server = self.server
+        if self._inject_faults():
+            return
+        match = CLIP_PATH.match(self.path)
+        if match:
+            if server.page_delay:
+                time.sleep(server.page_delay)
+            body = server.page_template.replace('{{MEDIA_URL}}', server.media_url(match.group('slug')))
+            return self._send(200, body.encode('utf-8'), 'text/html; charset=utf-8')
+
+        match = STATIC_PATH.match(self.path)
+        if match:
+            # Images, fonts and scripts of the page, which a full browser load waits for
+            if server.asset_delay:
+                time.sleep(server.asset_delay)
+            body = b'' if match.group('ext') == 'js' else b'\0' * server.asset_size
+            return self._send(200, body, STATIC_TYPES.get(match.group('ext'), 'application/octet-stream'))
+
+        match = MEDIA_PATH.match(self.path)
+        if match:
+            if not server.enter_media():
+                return self._send(429, b'Too Many Requests', 'text/plain')
+            try:
+                return self._send_payload()
+            finally:
+                server.leave_media()
+
+        self._send(404, b'Not Found', 'text/plain')
+
+    def do_HEAD(self):
+        if self._inject_faults():
+            return
+        if MEDIA_PATH.match(self.path):
+            return self._send_payload(head=True)
+        self._send(404, b'', 'text/plain')
+
+    def _send_payload(self, head=False):
+        """
+        Serve the MP4 payload with ETag/Last-Modified validators and single-range support.
+        """
+        payload = self.server.payload
+        size = len(payload)
+        start, end = 0, size - 1
+        status = 200
+
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        match = RANGE_PATTERN.match(range_header or '')
+        if match and (if_range is None or if_range in (PAYLOAD_ETAG, PAYLOAD_LAST_MODIFIED)):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        body = payload[start:end + 1]
+        self.send_response(status)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', PAYLOAD_ETAG)
+        self.send_header('Last-Modified', PAYLOAD_LAST_MODIFIED)
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not head:
+            self._write_throttled(body)
+
+    def _write_throttled(self, body):
+        """
+        Write a body at no more than server.bandwidth bytes/s on this connection.
+        """
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            return self.wfile.write(body)
+
+        chunk_size = max(1024, bandwidth // 20)
+        start = time.monotonic()
+        for offset in range(0, len(body), chunk_size):
+            self.wfile.write(body[offset:offset + chunk_size])
+            ahead = (offset + chunk_size) / bandwidth - (time.monotonic() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def do_POST(self):
+        server = self.server
+        if self.path != '/gql':
+            return self._send(404, b'Not Found', 'text/plain')
+
+        length = int(self.headers.get('Content-Length', 0))
+        operations = json.loads(self.rfile.read(length) or b'[]')
+        if self._inject_faults():
+            return
+        single = isinstance(operations, dict)
+        if single:
+            operations = [operations]
+        with server.lock:
+            server.gql_requests += 1
+
+        if server.gql_batch_limit and len(operations) > server.gql_batch_limit:
+            body = {'error': 'Bad Request', 'status': 400,
+                    'message': f"batch request limit exceeded ({server.gql_batch_limit})"}
+            return self._send(400, json.dumps(body).encode('utf-8'), 'application/json')
+
+        results = [server.clip_access_token(op.get('variables', {}).get('slug', '')) for op in operations]
+        body = json.dumps(results[0] if single else results).encode('utf-8')
+        self._send(200, body, 'application/json')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, fixture='clip_page_og.html',
+                 payload_size=1024 * 1024, page_delay=0.0, gql_batch_limit=0,
+                 bandwidth=0, media_limit=0, latency=0.0, error_rate=0.0, seed=None,
+                 asset_delay=0.0, asset_size=64 * 1024):
+        """
+        :param host: Interface to bind.
+        :param port: Port to bind, 0 for any free port.
+        :param fixture: Recorded clip page served for every clip URL.
+        :param payload_size: Size of each MP4 payload in bytes.
+        :param page_delay: Seconds to wait before answering a clip page request.
+        :param gql_batch_limit: Reject GQL batches larger than this (0 for no limit).
+        :param bandwidth: Per-connection payload throttle in bytes/s (0 for unthrottled).
+        :param media_limit: Answer 429 to media requests beyond this many concurrent transfers (0 for no limit).
+        :param latency: Seconds added before every response, like a network round trip.
+        :param error_rate: Fraction of requests (0-1) answered with a 503.
+        :param seed: Seed for the error injection, for repeatable runs.
+        :param asset_delay: Seconds to wait before answering a /static/ asset request.
+        :param asset_size: Size of each /static/ asset other than scripts, in bytes.
+        """
+        super().__init__((host, port), StandinHandler)
+        self.page_template = load_fixture(fixture)
+        self.payload = make_payload(payload_size)
+        self.page_delay = page_delay
+        self.gql_batch_limit = gql_batch_limit
+        self.bandwidth = bandwidth
+        self.media_limit = media_limit
+        self.latency = latency
+        self.error_rate = error_rate
+        self.asset_delay = asset_delay
+        self.asset_size = asset_size
+        self.errors_injected = 0
+        self._random = random.Random(seed)
+        self.media_active = 0
+        self.throttled_responses = 0
+        self.gql_requests = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def clip_url(self, slug, user='streamer'):
+        return f"{self.base_url}/{user}/clip/{slug}"
+
+    def media_url(self, slug):
+        return f"{self.base_url}/media/{slug}.mp4"
+
+    def roll(self):
+        with self.lock:
+            return self._random.random()
+
+    def enter_media(self):
+        """
+        Count a media transfer in, or refuse it when media_limit transfers are already running.
+
+        :return: False if the request should be throttled.
+        """
+        with self.lock:
+            if self.media_limit and self.media_active >= self.media_limit:
+                self.throttled_responses += 1
+                return False
+            self.media_active += 1
+            return True
+
+    def leave_media(self):
+        with self.lock:
+            self.media_active -= 1
+
+    def clip_access_token(self, slug):
+        """
+        Build a VideoAccessToken_Clip response for a slug. Slugs starting with
+        "Missing" resolve to a null clip, like deleted clips do on Twitch.
+        """
+        if not slug or slug.startswith('Missing'):
+            return {'data': {'clip': None}, 'extensions': {'operationName': 'VideoAccessToken_Clip'}}
+
+        token = json.dumps({'clip_uri': self.media_url(slug), 'expires': int(time.time()) + 86400})
+        return {
+            'data': {
+                'clip': {
+                    'id': str(abs(hash(slug)) % 10 ** 10),
+                    'playbackAccessToken': {'signature': f"sig{len(slug):04d}", 'value': token},
+                    'videoQualities': [
+                        {'frameRate': 30, 'quality': '480', 'sourceURL': self.media_url(slug)},
+                        {'frameRate': 60, 'quality': '1080', 'sourceURL': self.media_url(slug)},
+                        {'frameRate': 60, 'quality': '720', 'sourceURL': self.media_url(slug)},
+                    ],
+                }
+            },
+            'extensions': {'operationName': 'VideoAccessToken_Clip'},
+        }
+
+    def start(self):
+        """
+        Serve from a background thread and return self.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Twitch clip stand-in server')
+    parser.add_argument('--port', type=int, default=8700, help='Port to listen on')
+    parser.add_argument('--fixture', default='clip_page_og.html', help='Clip page fixture to serve')
+    parser.add_argument('--payload-size', type=int, default=1024 * 1024, help='MP4 payload size in bytes')
+    parser.add_argument('--bandwidth', type=int, default=0, help='Per-connection throttle in bytes/s')
+    parser.add_argument('--page-delay', type=float, default=0.0, help='Seconds before a clip page is served')
+    parser.add_argument('--media-limit', type=int, default=0, help='Concurrent media transfers before 429s')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added before every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--asset-delay', type=float, default=0.0, help='Seconds before a page asset is served')
+    args = parser.parse_args()
+
+    server = StandinServer(port=args.port, fixture=args.fixture,
+                           payload_size=args.payload_size, page_delay=args.page_delay,
+                           bandwidth=args.bandwidth, media_limit=args.media_limit,
+                           latency=args.latency, error_rate=args.error_rate, asset_delay=args.asset_delay)
+    print(f"Serving clip pages on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ def build_executable():
         '--hidden-import=PyQt6',
         '--hidden-import=selenium',
         '--hidden-import=webdriver_manager',
+        '--hidden-import=aiohttp',
     ]
     
     if sys.platform.startswith('win'):
@@ -0,0 +1,104 @@
+import json
+import os
+import sqlite3
+import sys
+from contextlib import redirect_stdout
+from downloader.clip_loader import iter_clips
+from downloader.downloader import download_jobs
+from downloader.job_queue import JobQueue, get_jobs_path, make_batch_id
+from downloader.scheduling import BandwidthLimiter
+from utils.config import parse_arguments
+from utils.logger import setup_logger
+
+def main(argv=None):
+    """
+    Headless batch entry point: queue every clip in the input file in the
+    output directory's job queue, download them and write a JSON summary.
+
+    "cli.py resume -o <dir>" continues the queue of an earlier run that
+    crashed or was stopped; more processes started the same way join in
+    as extra workers.
+
+    :return: Exit status, 0 if every clip was downloaded or skipped, 1 otherwise.
+    """
+    args = parse_arguments(argv)
+    logger = setup_logger(json_file=args.log_json, level=args.log_level.upper(), sample_rate=args.log_sample,
+                          drop_when_behind=args.log_drop)
+
+    def on_issue(line_number, message):
+        logger.warning(f"{args.input}:{line_number}: {message}")
+
+    # Keep stdout for the JSON summary only
+    with redirect_stdout(sys.stderr):
+        try:
+            jobs = open_jobs(args)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Cannot open the job queue in {args.output}: {str(e)}")
+            return 2
+        try:
+            # A fresh run works on its own clips only; leftovers of earlier runs wait for "resume"
+            batch = None
+            if args.resume:
+                if args.retry_failed:
+                    logger.info(f"Queued {jobs.retry_failed()} failed clips again")
+            else:
+                batch = make_batch_id()
+                try:
+                    with open(args.input, encoding='utf-8') as f:
+                        logger.info(f"Queued {jobs.add(iter_clips(f, on_issue=on_issue), batch)} clips")
+                except OSError as e:
+                    logger.error(f"Cannot read input file: {str(e)}")
+                    return 2
+                leftover = jobs.unfinished(exclude_batch=batch)
+                if leftover:
+                    logger.warning(f"{leftover} unfinished clips of an earlier run are left in the queue; "
+                                   f"run 'cli.py resume -o {args.output}' to download them")
+            logger.info(f"Jobs: {jobs.counts(batch)}")
+
+            summary = download_jobs(
+                jobs,
+                args.output,
+                batch=batch,
+                max_workers=args.threads,
+                logger=logger,
+                resolver=args.resolver,
+                lean_browser=args.lean_browser,
+                engine=args.engine,
+                segmented=args.segmented,
+                download_workers=args.download_workers,
+                use_cache=not args.no_cache,
+                purge_cache=args.purge_cache,
+                metrics_file=args.metrics_file,
+                trace_file=args.trace_file,
+                adaptive=args.adaptive,
+                min_workers=args.min_workers,
+                retries=args.retries,
+                max_outage=args.max_outage,
+                failed_file=args.failed_file,
+                write_buffer_size=args.write_buffer * 1024,
+                sync_writes=args.fsync,
+                drop_cache=args.drop_cache,
+                validate=not args.no_validate,
+                bandwidth=BandwidthLimiter(args.max_bandwidth, args.bandwidth_policy, logger)
+            )
+        finally:
+            jobs.close()
+
+    output = json.dumps(summary, indent=2)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    return 1 if summary['failed'] or summary['cancelled'] else 0
+
+def open_jobs(args):
+    """
+    Open the job queue of the output directory, creating the directory if needed.
+    """
+    os.makedirs(args.output, exist_ok=True)
+    return JobQueue(get_jobs_path(args.output), wal=not args.no_wal)
+
+if __name__ == "__main__":
+    sys.exit(main())
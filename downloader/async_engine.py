@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+from downloader.disk_writer import DEFAULT_BUFFER_SIZE
+from downloader.file_manager import discard_part, get_part_paths, get_resume_headers, start_part, finish_part
+from downloader.mp4_validator import InvalidMediaError, Mp4Validator, validate_file
+
+def open_part(file_path, part_path, status, headers, offset):
+    """
+    start_part() followed by opening the partial file, as one blocking call.
+
+    :return: Tuple (file object, offset, total).
+    """
+    mode, offset, total = start_part(file_path, status, headers, offset)
+    return open(part_path, mode), offset, total
+
+def write_chunks(f, chunks, digest=None):
+    """
+    Write chunks to a partial file, adding them to the running digest first.
+    """
+    if digest is not None:
+        for chunk in chunks:
+            digest.update(chunk)
+    f.writelines(chunks)
+
+def close_part(f, chunks, digest=None):
+    """
+    Write the last chunks to a partial file and close it, as one blocking call.
+    """
+    try:
+        write_chunks(f, chunks, digest)
+    finally:
+        f.close()
+
+class AsyncDownloadEngine:
+    """
+    asyncio-based transfer engine.
+
+    Runs an event loop on one background thread and keeps a keep-alive
+    connection pool per host, so hundreds of downloads can be in flight
+    without one thread each. Safe to call submit() from any thread.
+
+    File I/O (opening, writing, resume metadata, validation of resumed files)
+    runs on a small thread pool, so a slow disk never stalls the event loop.
+    """
+
+    def __init__(self, max_concurrency=256, limit_per_host=0, chunk_size=65536, timeout=300, logger=None,
+                 retry_policy=None, validate=True, bandwidth=None, write_size=DEFAULT_BUFFER_SIZE, disk_threads=4):
+        """
+        :param max_concurrency: Maximum number of downloads in flight.
+        :param limit_per_host: Maximum open connections per host (0 for no per-host limit).
+        :param chunk_size: Bytes read from the socket per write.
+        :param timeout: Total seconds allowed per download attempt.
+        :param logger: Logger object
+        :param retry_policy: Optional RetryPolicy for transient failures; backoffs wait on the
+                             event loop without holding a connection slot.
+        :param validate: Check the MP4 box structure of every download (see save_clip).
+        :param bandwidth: Optional BandwidthLimiter shared with other transfers; each download
+                          paces its reads to its share.
+        :param write_size: Bytes collected from the socket before they are handed to a disk thread.
+        :param disk_threads: Threads doing file I/O for all downloads.
+        """
+        self.max_concurrency = max_concurrency
+        self.limit_per_host = limit_per_host
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self.retry_policy = retry_policy
+        self.validate = validate
+        self.bandwidth = bandwidth
+        self.write_size = max(chunk_size, write_size)
+        self.disk_threads = max(1, disk_threads)
+        self._disk = None
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+
+    def start(self):
+        """
+        Start the event loop thread and open the connection pool.
+        """
+        if self._thread is not None:
+            return self
+
+        self._disk = ThreadPoolExecutor(max_workers=self.disk_threads, thread_name_prefix='AsyncDownloadDisk')
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='AsyncDownloadEngine', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self._loop).result()
+        return self
+
+    async def _open(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=30
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def submit(self, download_url, clip_name, output_dir, callback=None, stats=None, priority=0):
+        """
+        Schedule a download and return immediately.
+
+        :param download_url: Download URL.
+        :param clip_name: File name without extension.
+        :param output_dir: Output directory.
+        :param callback: Called as callback(file_path, error) when the download finishes;
+                         error is None on success. Runs on the engine thread, keep it short.
+        :param stats: Optional dictionary filled with transfer stats: bytes, ttfb (seconds) and retries, and
+                      sha256 when the file was fetched from its first byte (see save_clip).
+        :param priority: Bandwidth priority of the download, lower first.
+        :return: concurrent.futures.Future resolving to the file path.
+        """
+        if self._thread is None:
+            self.start()
+
+        file_path = os.path.join(output_dir, f"{clip_name}.mp4")
+        if stats is None:
+            stats = {}
+        stats.update(bytes=0, ttfb=None, retries=stats.get('retries', 0), sha256=None)
+        future = asyncio.run_coroutine_threadsafe(self._download(download_url, file_path, stats, priority),
+                                                  self._loop)
+
+        if callback is not None:
+            def on_done(done):
+                error = done.exception()
+                try:
+                    callback(file_path, error)
+                except Exception as e:
+                    self.logger.error(f"Download callback failed: {str(e)}")
+            future.add_done_callback(on_done)
+        return future
+
+    async def _download(self, download_url, file_path, stats, priority=0):
+        if self.retry_policy is None:
+            return await self._fetch(download_url, file_path, stats, priority)
+        return await self.retry_policy.run_async(
+            lambda: self._fetch(download_url, file_path, stats, priority), download_url, stats,
+            description=f"Download of {os.path.basename(file_path)}"
+        )
+
+    def _on_disk(self, func, *args):
+        """
+        Run a blocking file operation on the disk threads.
+
+        :return: Awaitable of func's result.
+        """
+        return self._loop.run_in_executor(self._disk, func, *args)
+
+    async def _fetch(self, download_url, file_path, stats, priority=0):
+        part_path, _ = get_part_paths(file_path)
+        async with self._semaphore:
+            headers, offset = await self._on_disk(get_resume_headers, file_path)
+            request_start = time.perf_counter()
+            async with self._session.get(download_url, headers=headers) as response:
+                stats['ttfb'] = time.perf_counter() - request_start
+                response.raise_for_status()
+                f, offset, total = await self._on_disk(open_part, file_path, part_path, response.status,
+                                                       response.headers, offset)
+                validator = Mp4Validator() if self.validate and not offset else None
+                # Hashed on the disk threads as the chunks are written; a resumed file is hashed from disk
+                digest = hashlib.sha256() if not offset else None
+                share = self.bandwidth.open(priority) if self.bandwidth is not None else None
+                # Chunks are collected into larger writes to keep the hand-offs few
+                pending, pending_size = [], 0
+                try:
+                    try:
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            if validator is not None:
+                                validator.feed(chunk)
+                            pending.append(chunk)
+                            pending_size += len(chunk)
+                            stats['bytes'] += len(chunk)
+                            if pending_size >= self.write_size:
+                                await self._on_disk(write_chunks, f, pending, digest)
+                                pending, pending_size = [], 0
+                            if share is not None:
+                                await share.consume_async(len(chunk))
+                    finally:
+                        # On failure the chunks still read are kept for resuming
+                        await self._on_disk(close_part, f, pending, digest)
+                except InvalidMediaError:
+                    await self._on_disk(discard_part, file_path)
+                    raise
+                finally:
+                    if share is not None:
+                        share.close()
+
+            def check(path):
+                stats['media'] = validator.finish() if validator is not None else validate_file(path)
+            await self._on_disk(finish_part, file_path, total, check if self.validate else None)
+        if digest is not None:
+            stats['sha256'] = digest.hexdigest()
+        return file_path
+
+    def close(self):
+        """
+        Close the connection pool and stop the event loop thread.
+        """
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._disk.shutdown()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
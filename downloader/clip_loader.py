@@ -1,43 +1,102 @@
+import io
 import re
 
-def load_clips_info(input_text):
-    clips_info = []
-    
-    # Split text into lines to preserve order
-    lines = input_text.split('\n')
+# "@username", optionally followed by "#<order>" to pin the clip's number (used by failed-clip files)
+USERNAME_PATTERN = re.compile(r'^@(\S+)(?:\s+#(\d+))?')
+CLIP_URL_PATTERN = re.compile(r'https?://(?:www\.)?twitch\.tv/[^/]+/clip/[\w-]+(?:\?[^\s]*)?')
+
+class ClipRecord:
+    """
+    One clip from the input list.
+
+    Supports clip['url']-style access so it can be used wherever the old
+    clip dictionaries were.
+    """
+    __slots__ = ('name', 'url', 'order', 'player', 'line')
+
+    def __init__(self, name, url, order, player, line=None):
+        self.name = name
+        self.url = url
+        self.order = order
+        self.player = player
+        self.line = line
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        return {'name': self.name, 'url': self.url, 'order': self.order, 'player': self.player}
+
+    def __repr__(self):
+        return f"ClipRecord(order={self.order}, player={self.player!r}, url={self.url!r})"
+
+def iter_clips(lines, on_issue=None):
+    """
+    Parse clip information in a single pass, yielding clips as they are found.
+
+    Each "@username" line is paired with the next line containing a clip URL.
+
+    :param lines: File object or any iterable of lines (a plain string is split into lines).
+    :param on_issue: Optional callback on_issue(line_number, message) for orphan or malformed lines.
+    :return: Generator of ClipRecord objects.
+    """
+    if isinstance(lines, str):
+        lines = io.StringIO(lines)
+
     current_index = 1
-    
-    # Process lines in pairs (username line + URL line)
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
+    username = None
+    username_line = None
+    pinned_order = None
+
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+
         # Skip empty lines
         if not line:
-            i += 1
             continue
-            
-        # Extract username from @ mention
-        username_match = re.match(r'^@(\S+)', line)
-        if username_match:
-            username = username_match.group(1)  # This preserves case
-            
-            # Look for URL in next lines
-            j = i + 1
-            while j < len(lines):
-                url_line = lines[j].strip()
-                url_match = re.search(r'https?://(?:www\.)?twitch\.tv/[^/]+/clip/[\w-]+(?:\?[^\s]*)?', url_line)
-                if url_match:
-                    clips_info.append({
-                        'name': str(current_index),
-                        'url': url_match.group(0),
-                        'order': current_index,
-                        'player': username  # Using case-preserved username from @ mention
-                    })
-                    current_index += 1
-                    i = j
-                    break
-                j += 1
-        i += 1
-    
-    return clips_info
+
+        if username is None:
+            # Extract username from @ mention
+            username_match = USERNAME_PATTERN.match(line)
+            if username_match:
+                username = username_match.group(1)  # This preserves case
+                username_line = line_number
+                pinned_order = int(username_match.group(2)) if username_match.group(2) else None
+            elif on_issue is not None:
+                if 'twitch.tv' in line and CLIP_URL_PATTERN.search(line):
+                    on_issue(line_number, "Clip URL without a preceding @username")
+                else:
+                    on_issue(line_number, f"Unrecognised line: {line[:80]}")
+            continue
+
+        # Look for the URL belonging to the pending username
+        url_match = CLIP_URL_PATTERN.search(line) if 'twitch.tv' in line else None
+        if url_match:
+            order = pinned_order or current_index
+            yield ClipRecord(str(order), url_match.group(0), order, username, line_number)
+            current_index += 1
+            username = None
+        elif on_issue is not None:
+            if USERNAME_PATTERN.match(line):
+                on_issue(line_number, f"@{username} (line {username_line}) is still waiting for a URL, "
+                                      f"mention ignored")
+            else:
+                on_issue(line_number, f"Unrecognised line: {line[:80]}")
+
+    if username is not None and on_issue is not None:
+        on_issue(username_line, f"@{username} has no clip URL")
+
+def load_clips_info(input_text):
+    """
+    Parse clip information from the input text.
+
+    :param input_text: Text with "@username" lines each followed by a clip URL.
+    :return: List of ClipRecord objects in input order.
+    """
+    return list(iter_clips(input_text))
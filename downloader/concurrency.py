@@ -0,0 +1,237 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+# HTTP statuses that mean the server wants fewer requests from us
+THROTTLE_STATUSES = (429, 500, 502, 503, 504)
+
+# Latencies below this count as equal, so jitter on fast local links is not read as queueing
+LATENCY_FLOOR = 0.05
+# Rounds to stay at a limit after an increase did not raise throughput
+HOLD_ROUNDS = 4
+
+def get_status_code(error):
+    """
+    :param error: Exception raised by requests or aiohttp.
+    :return: HTTP status code carried by the error, or None.
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        status = getattr(error, 'status', None)
+    return status if isinstance(status, int) else None
+
+def is_throttling_error(error):
+    """
+    Check whether a failure means the server or network is overloaded:
+    a 429/5xx response or a timeout.
+
+    :param error: Exception (or message) describing a failed request.
+    """
+    if not isinstance(error, BaseException):
+        return False
+    if get_status_code(error) in THROTTLE_STATUSES:
+        return True
+    # requests.Timeout and aiohttp's timeouts do not all derive from TimeoutError
+    return isinstance(error, TimeoutError) or any('Timeout' in cls.__name__ for cls in type(error).__mro__)
+
+def get_available_memory():
+    """
+    :return: Physical memory available to new processes in bytes, or None if unknown.
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            return None
+    elif sys.platform.startswith('win'):
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+    elif hasattr(os, 'sysconf'):
+        try:
+            return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (ValueError, OSError):
+            return None
+    return None
+
+def memory_pressure(min_free=512 * 1024 * 1024):
+    """
+    Build a pressure check for AdaptiveLimiter that fires when free memory runs low.
+
+    :param min_free: Free memory in bytes below which new browsers should not be started.
+    """
+    def check():
+        available = get_available_memory()
+        return available is not None and available < min_free
+    return check
+
+class AdaptiveLimiter:
+    """
+    Semaphore whose limit is tuned with AIMD (additive increase, multiplicative decrease).
+
+    Completed work is reported with record(). Once per round (as many
+    completions as the current limit) the limiter looks at the round's
+    throughput and median latency: the limit keeps growing (doubling at first,
+    like TCP slow start, then by one) while throughput rises and latency stays
+    near its best, steps back when an increase brings nothing, and is cut by
+    ``decrease`` as soon as a round sees throttling responses, timeouts or
+    memory pressure.
+    """
+
+    def __init__(self, floor=1, ceiling=20, initial=None, decrease=0.5, latency_tolerance=2.0,
+                 min_gain=0.05, pressure=None, on_change=None, name='workers', logger=None):
+        """
+        :param floor: Lowest limit.
+        :param ceiling: Highest limit.
+        :param initial: Starting limit; defaults to the floor.
+        :param decrease: Factor applied to the limit on congestion.
+        :param latency_tolerance: Rounds whose median latency exceeds the best seen by this factor shrink the limit.
+        :param min_gain: Relative throughput gain over the previous round needed to grow the limit.
+        :param pressure: Optional callable returning True when the host is short on resources.
+        :param on_change: Optional callback on_change(limit) after every change.
+        :param name: Name used in log messages.
+        :param logger: Logger object
+        """
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.limit = min(self.ceiling, max(self.floor, initial or self.floor))
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.min_gain = min_gain
+        self.pressure = pressure
+        self.on_change = on_change
+        self.name = name
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self.in_use = 0
+        self.throttled = 0
+        self._condition = threading.Condition()
+        self._reset_round()
+        # Double the limit each round until the first sign of congestion, then grow by one
+        self._slow_start = True
+        # Throughput of the round before the last increase
+        self._baseline = None
+        self._best_latency = None
+        self._hold_rounds = 0
+        self._cooldown_until = 0.0
+
+    def _reset_round(self):
+        self._round_start = time.monotonic()
+        self._round_done = 0
+        self._round_size = 0
+        self._round_latencies = []
+        self._round_throttled = False
+        self._round_peak = self.in_use
+
+    def acquire(self):
+        with self._condition:
+            while self.in_use >= self.limit:
+                self._condition.wait()
+            self.in_use += 1
+            self._round_peak = max(self._round_peak, self.in_use)
+
+    def release(self):
+        with self._condition:
+            self.in_use -= 1
+            self._condition.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def record(self, latency, size=1, throttled=False):
+        """
+        Report one finished unit of work.
+
+        :param latency: Seconds the work took (or its time to first byte).
+        :param size: Amount of work done, e.g. bytes downloaded.
+        :param throttled: The work failed with a throttling response or a timeout.
+        """
+        with self._condition:
+            self._round_done += 1
+            self._round_size += size
+            if throttled:
+                self.throttled += 1
+                self._round_throttled = True
+            elif latency is not None:
+                self._round_latencies.append(latency)
+
+            # Back off on the first sign of congestion instead of waiting for the round to end,
+            # but only once per cooldown: work started before the cut fails at the old limit
+            backoff = throttled and time.monotonic() >= self._cooldown_until
+            changed = self._adjust() if backoff or self._round_done >= self.limit else None
+
+        if changed is not None and self.on_change is not None:
+            self.on_change(changed)
+
+    def _end_slow_start(self):
+        self._slow_start = False
+        self._baseline = None
+
+    def _adjust(self):
+        """
+        Close the current round and move the limit.
+
+        :return: The new limit if it changed, otherwise None.
+        """
+        elapsed = time.monotonic() - self._round_start
+        throughput = self._round_size / elapsed if elapsed > 0 else None
+        latencies = sorted(self._round_latencies)
+        latency = latencies[len(latencies) // 2] if latencies else None
+        limit = self.limit
+        reason = None
+
+        if self._round_throttled or (self.pressure is not None and self.pressure()):
+            limit = max(self.floor, int(self.limit * self.decrease))
+            reason = 'throttled' if self._round_throttled else 'memory pressure'
+            self._cooldown_until = time.monotonic() + (self._best_latency or 1.0) * self.latency_tolerance
+            # Throughput and latency measured under congestion are no baseline
+            self._end_slow_start()
+            self._best_latency = None
+        elif self._hold_rounds:
+            self._hold_rounds -= 1
+        else:
+            if latency is not None:
+                self._best_latency = min(self._best_latency or latency, latency)
+            if latency is not None and latency > max(self._best_latency, LATENCY_FLOOR) * self.latency_tolerance:
+                limit = max(self.floor, self.limit - 1)
+                reason = 'latency rising'
+                self._end_slow_start()
+            elif self._round_peak >= self.limit and throughput is not None:
+                # Only grow while the current limit is actually used
+                if self._baseline is None or throughput >= self._baseline * (1 + self.min_gain):
+                    limit = min(self.ceiling, self.limit * 2 if self._slow_start else self.limit + 1)
+                    reason = 'throughput rising'
+                    self._baseline = throughput
+                else:
+                    # The last step bought nothing: step back and stay there for a while before probing again
+                    limit = max(self.floor, self.limit - 1)
+                    reason = 'throughput flat'
+                    self._end_slow_start()
+                    self._hold_rounds = HOLD_ROUNDS
+
+        self._reset_round()
+        if limit == self.limit:
+            return None
+        self.logger.info(f"Adaptive {self.name}: {self.limit} -> {limit} ({reason})")
+        self.limit = limit
+        self._condition.notify_all()
+        return limit
@@ -0,0 +1,262 @@
+import errno
+import logging
+import os
+import queue
+import threading
+
+DEFAULT_BUFFER_SIZE = 256 * 1024
+DEFAULT_BUFFERS = 64
+# Written bytes between progress checkpoints of a preallocated file
+CHECKPOINT_BYTES = 4 * 1024 * 1024
+
+# Errors meaning the filesystem cannot preallocate, not that the disk is full
+_UNSUPPORTED_ERRNOS = (errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL)
+
+def preallocate(fd, offset, length):
+    """
+    Reserve disk space for a file up front so it is written contiguously
+    and a full disk is detected before any data is transferred.
+
+    :param fd: File descriptor open for writing.
+    :param offset: First byte to reserve.
+    :param length: Number of bytes to reserve.
+    :return: True if the space was reserved, False if the platform or filesystem cannot.
+    :raises OSError: If the disk is full.
+    """
+    if length <= 0 or not hasattr(os, 'posix_fallocate'):
+        return False
+    try:
+        os.posix_fallocate(fd, offset, length)
+    except OSError as e:
+        if e.errno in _UNSUPPORTED_ERRNOS:
+            return False
+        raise
+    return True
+
+def _write_at(fd, data, position):
+    """
+    Write all of data at position; the only thread writing a file is the writer thread.
+    """
+    while data:
+        if hasattr(os, 'pwrite'):
+            written = os.pwrite(fd, data, position)
+        else:
+            os.lseek(fd, position, os.SEEK_SET)
+            written = os.write(fd, data)
+        data = data[written:]
+        position += written
+    return position
+
+class WriterFile:
+    """
+    A file being written by a DiskWriter. Writes are queued and performed in
+    order on the writer thread; close() waits for them.
+    """
+
+    def __init__(self, writer, fd, path, position, checkpoint=None):
+        self.writer = writer
+        self.fd = fd
+        self.path = path
+        # Offset the next queued write goes to
+        self.position = position
+        # Offset the writer thread has written up to
+        self.written = position
+        self.checkpoint = checkpoint
+        self.checkpointed = position
+        self.error = None
+        self.closed = False
+        self._done = threading.Event()
+
+    def write(self, buffer, length):
+        """
+        Queue length bytes of a buffer taken from DiskWriter.get_buffer(). The
+        buffer goes back to the writer's pool once written.
+
+        :raises OSError: If an earlier write to this file failed.
+        """
+        if self.error is not None:
+            self.writer.release_buffer(buffer)
+            raise self.error
+        self.writer._queue.put((self, buffer, length, self.position))
+        self.position += length
+
+    def close(self):
+        """
+        Wait for the queued writes, drop unused preallocated space and close the file.
+
+        :return: Bytes in the file.
+        :raises OSError: The first write, sync or close error.
+        """
+        if not self.closed:
+            self.closed = True
+            self.writer._queue.put((self, None, 0, None))
+            self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.close()
+        except OSError:
+            # Do not hide the error that ended the transfer
+            if exc_type is None:
+                raise
+
+class DiskWriter:
+    """
+    Writes downloads to disk on a dedicated thread.
+
+    Network threads read each response into a buffer from a fixed pool of
+    reusable buffers and hand it over with a single queue put, so they never
+    wait for the disk unless every buffer is in flight; the pool also caps
+    the memory held by data waiting to be written. Files are preallocated
+    from their expected size, which keeps them contiguous and fails early
+    on a full disk.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, buffers=DEFAULT_BUFFERS, preallocate=True,
+                 fsync=False, drop_cache=False, logger=None):
+        """
+        :param buffer_size: Bytes read from the network per buffer.
+        :param buffers: Number of pooled buffers; bounds the data queued for the disk.
+        :param preallocate: Reserve each file's expected size when it is opened.
+        :param fsync: Flush each file to stable storage before it is reported finished.
+        :param drop_cache: Advise the kernel to drop a finished file from the page cache,
+                           so large batches do not evict everything else.
+        :param logger: Logger object
+        """
+        self.buffer_size = buffer_size
+        self.preallocate = preallocate
+        self.fsync = fsync
+        self.drop_cache = drop_cache and hasattr(os, 'posix_fadvise')
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self._pool = queue.Queue()
+        for _ in range(max(1, buffers)):
+            self._pool.put(bytearray(buffer_size))
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='DiskWriter', daemon=True)
+                self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Finish queued writes and stop the writer thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def get_buffer(self):
+        """
+        :return: A free buffer of buffer_size bytes; blocks while all are queued for the disk.
+        """
+        return self._pool.get()
+
+    def release_buffer(self, buffer):
+        self._pool.put(buffer)
+
+    def open(self, path, mode='wb', total=None, checkpoint=None):
+        """
+        Open a file for queued writes.
+
+        :param path: File to write.
+        :param mode: 'wb' to start over or 'ab' to continue after the existing data.
+        :param total: Expected final size in bytes, if known, for preallocation.
+        :param checkpoint: Optional callable checkpoint(written) recording how many bytes are on disk.
+                           A preallocated file is full size from the start, so a run that dies leaves
+                           nothing else to resume from. Called before preallocating, then from the
+                           writer thread every CHECKPOINT_BYTES and when the file is closed.
+        :return: WriterFile; use it as a context manager or call close().
+        """
+        self.start()
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        if mode == 'wb':
+            flags |= os.O_TRUNC
+        fd = os.open(path, flags, 0o666)
+        try:
+            position = os.fstat(fd).st_size if mode == 'ab' else 0
+            if self.preallocate and total is not None:
+                if checkpoint is not None:
+                    checkpoint(position)
+                preallocate(fd, position, total - position)
+            else:
+                # The file's size is its progress
+                checkpoint = None
+        except BaseException:
+            os.close(fd)
+            raise
+        return WriterFile(self, fd, path, position, checkpoint)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            file, buffer, length, position = job
+            if buffer is None:
+                self._finish(file)
+                continue
+            try:
+                if file.error is None:
+                    file.written = _write_at(file.fd, memoryview(buffer)[:length], position)
+                    if file.checkpoint is not None and file.written - file.checkpointed >= CHECKPOINT_BYTES:
+                        self._checkpoint(file)
+            except OSError as e:
+                file.error = e
+            finally:
+                self.release_buffer(buffer)
+
+    def _checkpoint(self, file):
+        try:
+            file.checkpoint(file.written)
+            file.checkpointed = file.written
+        except OSError as e:
+            # Only a resume after a crash would start earlier than it could
+            self.logger.debug(f"Could not record progress of {file.path}: {str(e)}")
+
+    def _finish(self, file):
+        try:
+            # A transfer that stopped early leaves preallocated space behind; cut the
+            # file back so its size is what was written and a resume starts there
+            if os.fstat(file.fd).st_size != file.written:
+                os.ftruncate(file.fd, file.written)
+            if file.checkpoint is not None and file.checkpointed != file.written:
+                self._checkpoint(file)
+            if file.error is None and self.fsync:
+                os.fsync(file.fd)
+            if file.error is None and self.drop_cache:
+                os.posix_fadvise(file.fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError as e:
+            file.error = file.error or e
+        finally:
+            try:
+                os.close(file.fd)
+            except OSError as e:
+                file.error = file.error or e
+            file._done.set()
+
+# Shared writer for downloads that do not bring their own
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_disk_writer():
+    """
+    Return the process-wide DiskWriter with default settings, starting it on first use.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DiskWriter().start()
+        return _writer
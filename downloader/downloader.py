@@ -1,95 +1,455 @@
 import os
-import requests
-from concurrent.futures import ThreadPoolExecutor
-import concurrent.futures
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
-from downloader.file_manager import save_clip, FileCounter, get_max_number
-from downloader.twitch_parser import get_clip_download_url
-from utils.logger import setup_logger
-
-# Set up logging
-logger = setup_logger()
-
-def download_clip(clip_info, output_dir, logger):
-    """
-    Download a single Twitch clip and save it.
-    
-    :param clip_info: Dictionary containing clip name and link
-    :param output_dir: Directory to save the file
-    :param logger: Logger object
-    """
-    clip_url = clip_info['url']
-    clip_name = clip_info['name']
-    
-    download_url = get_clip_download_url(clip_url)
-    if download_url:
-        save_clip(download_url, clip_name, output_dir)
-        logger.info(f"Download completed: {clip_name}")
-    else:
-        logger.error(f"Failed to get download URL for {clip_name}")
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+from downloader.concurrency import AdaptiveLimiter, is_throttling_error, memory_pressure
+from downloader.disk_writer import DiskWriter, DEFAULT_BUFFER_SIZE
+from downloader.file_manager import save_clip, FileCounter, SharedFileCounter, get_max_number
+from downloader.job_queue import JobWorker
+from downloader.manifest import Manifest
+from downloader.metrics import BatchMetrics, MetricsFileWriter
+from downloader.mp4_validator import InvalidMediaError
+from downloader.pipeline import ClipPipeline
+from downloader import progress as clip_state
+from downloader.resolve_cache import CachedResolver, open_resolve_cache
+from downloader.resolvers import create_resolver, get_clip_slug, GQL_MAX_BATCH_SIZE
+from downloader.retry import RetryPolicy
+from downloader.scheduling import ReadyPrefix, clip_priority
+from downloader.summary import BatchSummary
 
-def download_clips(clips_info, output_dir, max_workers=5, logger=None):
+# Fresh lookups of a clip whose download URL served something other than the clip, before giving up
+MAX_RERESOLVES = 2
+
+def download_clips(clips_info, output_dir, max_workers=5, logger=None, resolver='auto',
+                   batch_size=GQL_MAX_BATCH_SIZE, engine='threads', segmented=False,
+                   download_workers=20, cancel_event=None, use_cache=True, purge_cache=False,
+                   skip_existing=True, summary=None, metrics=None, metrics_file=None, trace_file=None,
+                   adaptive=False, min_workers=1, retries=3, failed_file=None, progress=None,
+                   write_buffer_size=DEFAULT_BUFFER_SIZE, sync_writes=False, drop_cache=False, validate=True,
+                   bandwidth=None, on_ready=None, lean_browser=False, max_outage=600.0, number_source=None):
     """
     Download multiple Twitch clips in parallel.
+
+    Clips flow through a resolve stage (max_workers threads, one pooled browser
+    each) into a bounded queue drained by a separate download stage. Downloads
+    start in priority order: a clip's 'priority' if it has one, otherwise its order.
     
-    :param clips_info: List containing all clip information (name and url).
+    :param clips_info: Iterable of clip information (name and url); may be a generator.
     :param output_dir: Directory to save the files.
-    :param max_workers: Maximum number of concurrent threads.
+    :param max_workers: Maximum number of concurrent resolvers (and pooled browsers).
     :param logger: Logger object
+    :param resolver: How clip pages are resolved: 'auto' (HTTP, Selenium fallback), 'http', 'selenium'
+                     or 'gql' (batched GraphQL lookups).
+    :param batch_size: Clips per request for the 'gql' resolver.
+    :param engine: Transfer engine: 'threads' (one download per thread) or 'asyncio'
+                   (downloads run on a shared event loop).
+    :param segmented: Split large clips into concurrent range requests ('threads' engine only).
+    :param download_workers: Maximum number of downloads in flight.
+    :param cancel_event: threading.Event that stops the batch when set.
+    :param use_cache: Reuse resolved URLs from the on-disk resolve cache.
+    :param purge_cache: Empty the resolve cache before starting.
+    :param skip_existing: Skip clips the output directory's manifest already lists.
+    :param summary: BatchSummary to record results in; a new one is created if None.
+    :param metrics: BatchMetrics to record timings in; a new one is created if None.
+    :param metrics_file: Keep this file updated with metrics in Prometheus text format during the batch.
+    :param trace_file: Write resolve and download spans to this file as Chrome trace JSON.
+    :param adaptive: Tune resolver and download concurrency while the batch runs, between
+                     min_workers and the max_workers / download_workers ceilings.
+    :param min_workers: Concurrency floor for adaptive mode.
+    :param retries: Extra attempts for resolves and downloads that fail with a transient error.
+    :param max_outage: Seconds a host may stay unreachable (circuit breaker open) before the clips waiting
+                       for it fail; shorter outages only pause the batch.
+    :param failed_file: Write clips that still failed to this file, in the input format, so they can be re-run.
+    :param progress: ClipProgress to report per-clip state, bytes and speed to (e.g. for a GUI table).
+    :param write_buffer_size: Bytes per disk write; with the 'threads' engine also bytes per network read.
+    :param sync_writes: fsync every clip before it is recorded as downloaded.
+    :param drop_cache: Drop finished clips from the OS page cache.
+    :param validate: Check each clip's MP4 structure while it downloads, re-download broken ones
+                     and add duration and resolution to the summary.
+    :param bandwidth: BandwidthLimiter capping the combined download rate; its rate may be changed while
+                      the batch runs.
+    :param on_ready: Optional callback on_ready(order, count) called whenever the run of clips on disk
+                     from the start of the input grows (see ReadyPrefix).
+    :param lean_browser: Resolve with lean browsers (see create_driver): eager page loads, no images,
+                         fonts, stylesheets or media, and the URL taken from the network log.
+    :param number_source: Optional store shared with other workers on the same output directory (a JobQueue)
+                          that allocates the manifest numbers; by default they are counted in this process.
+    :return: Summary dictionary (see BatchSummary.as_dict).
     """
+    if summary is None:
+        summary = BatchSummary()
+    if metrics is None:
+        metrics = BatchMetrics(trace=bool(trace_file))
+    if cancel_event is None:
+        cancel_event = threading.Event()
+
     if logger is None:
         from utils.logger import setup_logger
         logger = setup_logger()
 
-    logger.info(f"Starting download of {len(clips_info)} clips to {output_dir}")
+    if hasattr(clips_info, '__len__'):
+        logger.info(f"Starting download of {len(clips_info)} clips to {output_dir}")
+    else:
+        logger.info(f"Starting download to {output_dir}")
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         logger.info(f"Created output directory: {output_dir}")
 
-    # Initialize the file counter with the next available number
-    start_number = get_max_number(output_dir) + 1
-    file_counter = FileCounter(start_number)
+    # Initialize the file counter with the next available number; directories
+    # without a manifest yet fall back to scanning the files
+    manifest = Manifest(output_dir)
+    if manifest.exists:
+        start_number = manifest.max_number + 1
+    else:
+        start_number = get_max_number(output_dir) + 1
+    if number_source is not None:
+        file_counter = SharedFileCounter(number_source, start_number)
+    else:
+        file_counter = FileCounter(start_number)
+    ready = ReadyPrefix(on_ready, logger)
+    metrics.register_gauge('ready_prefix', lambda: ready.count)
+
+    def pending_clips():
+        for clip in clips_info:
+            slug = get_clip_slug(clip['url'])
+            ready.add(clip)
+            if skip_existing and slug and manifest.is_present(slug):
+                logger.info(f"Already downloaded, skipping: {get_clip_filename(clip)}",
+                            extra=log_fields(clip, 'skip', slug=slug))
+                summary.record_skipped(clip, 'already downloaded')
+                if progress is not None:
+                    progress.set_state(clip, clip_state.SKIPPED)
+                ready.mark_ready(clip)
+                continue
+            if progress is not None:
+                progress.set_state(clip, clip_state.QUEUED)
+            yield clip
+
+    # Shared by all resolver threads; browser-backed resolvers keep one pooled browser per thread
+    clip_resolver = create_resolver(resolver, max_workers, logger, batch_size=batch_size,
+                                    lean_browser=lean_browser)
+    if use_cache or purge_cache:
+        cache = open_resolve_cache(logger)
+        if purge_cache:
+            cache.purge()
+        if use_cache:
+            clip_resolver = CachedResolver(clip_resolver, cache, logger)
+        else:
+            cache.close()
+
+    # One policy for the whole batch so each host's circuit breaker sees every request
+    retry_policy = RetryPolicy(attempts=retries + 1, max_outage=max_outage, cancel_event=cancel_event, logger=logger)
 
-    def download_with_new_driver(clip):
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        
-        with webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options) as driver:
-            return download_single_clip(clip, output_dir, logger, driver, file_counter)
+    resolve_limiter = download_limiter = None
+    if adaptive:
+        # Browsers are the memory hogs, so only the resolve stage watches free memory
+        resolve_limiter = AdaptiveLimiter(min_workers, max_workers, pressure=memory_pressure(),
+                                          on_change=clip_resolver.trim_browsers, name='resolvers', logger=logger)
+        download_limiter = AdaptiveLimiter(min_workers, download_workers, name='downloads', logger=logger)
+        metrics.register_gauge('resolve_limit', lambda: resolve_limiter.limit)
+        metrics.register_gauge('download_limit', lambda: download_limiter.limit)
+
+    if engine == 'asyncio':
+        from downloader.async_engine import AsyncDownloadEngine
+        transfer_engine = AsyncDownloadEngine(max_concurrency=download_workers, logger=logger,
+                                              retry_policy=retry_policy, validate=validate,
+                                              bandwidth=bandwidth, write_size=write_buffer_size).start()
+        # One thread only hands clips to the event loop
+        download_threads = 1
+        writer = None
+    elif engine == 'threads':
+        transfer_engine = None
+        download_threads = download_workers
+        # Two buffers per download keep every connection reading while the previous buffer is written
+        writer = DiskWriter(buffer_size=write_buffer_size, buffers=2 * download_workers, fsync=sync_writes,
+                            drop_cache=drop_cache, logger=logger).start()
+    else:
+        raise ValueError(f"Unknown engine: {engine}")
+
+    pipeline = ClipPipeline(
+        lambda clips: resolve_clips(clips, clip_resolver, logger, summary, metrics, resolve_limiter,
+                                    retry_policy, progress),
+        lambda clip, download_url: save_resolved_clip(clip, download_url, output_dir, logger, file_counter,
+                                                      transfer_engine, segmented, manifest, summary, metrics,
+                                                      download_limiter, retry_policy, progress, writer,
+                                                      validate, bandwidth, ready, clip_resolver),
+        resolve_workers=max_workers,
+        download_workers=download_workers,
+        download_threads=download_threads,
+        batch_size=clip_resolver.batch_size,
+        cancel_event=cancel_event,
+        logger=logger,
+        resolve_limiter=resolve_limiter,
+        download_limiter=download_limiter,
+        priority=clip_priority
+    )
+
+    metrics.register_gauge('in_flight', lambda: pipeline.in_flight)
+    metrics.register_gauge('queued', lambda: pipeline.queued)
+    metrics.register_gauge('browsers_alive', lambda: clip_resolver.browsers_alive)
+    metrics_writer = MetricsFileWriter(metrics, metrics_file).start() if metrics_file else None
 
     try:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(download_with_new_driver, clip) for clip in clips_info]
-            
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    logger.error(f"Error downloading clip: {str(e)}")
+        pipeline.run(pending_clips())
+        if pipeline.cancelled:
+            logger.info("Download process cancelled")
     except Exception as e:
         logger.error(f"Error in download process: {str(e)}")
     finally:
+        clip_resolver.close()
+        if transfer_engine is not None:
+            transfer_engine.close()
+        if writer is not None:
+            writer.close()
+        if metrics_writer is not None:
+            metrics_writer.stop()
+        if trace_file:
+            metrics.write_trace(trace_file)
+        summary.finish(cancelled=pipeline.cancelled)
+        if failed_file and summary.failed:
+            summary.write_failed(failed_file)
+            logger.info(f"{len(summary.failed)} failed clips written to {failed_file}")
         logger.info("Download process completed")
 
-def download_single_clip(clip, output_dir, logger, driver, file_counter):
-    clip_url = clip['url']
-    clip_order = clip['order']
-    player_name = clip['player']
-    filename = f"{clip_order}@{player_name}"
-    
-    try:
-        download_url = get_clip_download_url(clip_url, driver)
-        if download_url:
-            logger.info(f"Processing clip: {filename}")
-            save_clip(download_url, filename, output_dir, file_counter)
-            logger.info(f"Download completed: {filename}")
-        else:
-            logger.error(f"Failed to get download URL for clip {filename}")
-    except Exception as e:
-        logger.error(f"Error downloading clip: {str(e)}")
+    return summary.as_dict()
+
+def download_jobs(jobs, output_dir, logger=None, cancel_event=None, batch=None, **options):
+    """
+    Work through a durable JobQueue as one worker: claim clips, download them
+    with download_clips and settle each job. Several processes may run this
+    on the same queue at once.
+
+    :param jobs: JobQueue to work on.
+    :param output_dir: Directory to save the files.
+    :param logger: Logger object
+    :param cancel_event: threading.Event that stops the worker when set; unfinished jobs return to the queue.
+    :param batch: Only work on the jobs of this batch (a fresh run); None works on every batch (resume).
+    :param options: Further download_clips arguments.
+    :return: Summary dictionary of the clips this worker handled, with the job counts of the batch (or the
+             whole queue) under 'jobs'.
+    """
+    if cancel_event is None:
+        cancel_event = threading.Event()
+    with JobWorker(jobs, batch=batch, cancel_event=cancel_event, logger=logger) as worker:
+        # Manifest numbers come from the queue, so concurrent workers never repeat one
+        summary = download_clips(worker.clips(), output_dir, logger=logger, cancel_event=cancel_event,
+                                 summary=worker.summary, number_source=jobs, **options)
+    summary['jobs'] = jobs.counts(batch)
+    return summary
+
+def get_clip_filename(clip):
+    return f"{clip['order']}@{clip['player']}"
+
+def log_fields(clip, phase, duration=None, slug=None):
+    """
+    Per-clip fields for a log record (logger.info(..., extra=log_fields(...))), used by the JSON-lines log
+    and by log sampling.
+
+    :param phase: Stage of the clip: 'skip', 'resolve' or 'download'.
+    :param duration: Seconds the phase took, if known.
+    """
+    return {
+        'order': clip.get('order'),
+        'player': clip.get('player'),
+        'slug': slug or get_clip_slug(clip['url']),
+        'phase': phase,
+        'duration': round(duration, 3) if duration is not None else None,
+    }
+
+def resolve_clips(clips, resolver, logger, summary=None, metrics=None, limiter=None, retry_policy=None,
+                  progress=None):
+    """
+    Resolve a batch of clips to download URLs.
+
+    Transient errors are retried with backoff when a retry policy is given.
+
+    :return: List of (clip, download_url) pairs; download_url is None for failures.
+    """
+    # Batching resolvers look up the whole batch in one round trip here
+    prefetch_start = time.perf_counter()
+    resolver.prefetch(clip['url'] for clip in clips)
+    prefetch_end = time.perf_counter()
+    if metrics is not None and len(clips) > 1:
+        metrics.record_span('prefetch', prefetch_start, prefetch_end, clips=len(clips))
+
+    results = []
+    throttled = False
+    for clip in clips:
+        filename = get_clip_filename(clip)
+        error = "no download URL found"
+        start = time.perf_counter()
+        stats = {}
+        if progress is not None:
+            progress.set_state(clip, clip_state.RESOLVING)
+        try:
+            if retry_policy is not None:
+                download_url = retry_policy.run(lambda: resolver.resolve(clip['url']), clip['url'], stats,
+                                                description=f"Resolve of {filename}")
+            else:
+                download_url = resolver.resolve(clip['url'])
+        except Exception as e:
+            logger.error(f"Error resolving clip {filename}: {str(e)}",
+                         extra=log_fields(clip, 'resolve', time.perf_counter() - start))
+            download_url, error = None, e
+        throttled = throttled or bool(stats.get('throttled')) or is_throttling_error(error)
+        if metrics is not None:
+            # A batched clip waited for the whole prefetch round trip as well
+            end = time.perf_counter()
+            metrics.record_resolve(clip, end - start + prefetch_end - prefetch_start, bool(download_url))
+            metrics.record_span('resolve', start, end, clip, resolver=resolver.name)
+        if not download_url:
+            logger.error(f"Failed to get download URL for clip {filename}",
+                         extra=log_fields(clip, 'resolve', time.perf_counter() - start))
+            if summary is not None:
+                summary.record_failed(clip, 'resolve', error)
+        if progress is not None:
+            progress.set_state(clip, clip_state.RESOLVED if download_url else clip_state.FAILED,
+                               error=None if download_url else error)
+        results.append((clip, download_url))
+
+    if limiter is not None:
+        limiter.record(time.perf_counter() - prefetch_start, sum(1 for _, url in results if url), throttled)
+    return results
+
+def resolve_again(clip, resolver, logger, retry_policy=None):
+    """
+    Look a clip up afresh after its download URL served something other than the clip,
+    dropping what the resolver (and its cache) remembered about it first.
+
+    :return: New download URL.
+    :raises ValueError: If the clip no longer resolves to a download URL.
+    """
+    filename = get_clip_filename(clip)
+    logger.warning(f"Download of {filename} is not valid media, resolving the clip again",
+                   extra=log_fields(clip, 'resolve'))
+    resolver.invalidate(clip['url'])
+    if retry_policy is not None:
+        download_url = retry_policy.run(lambda: resolver.resolve(clip['url']), clip['url'], {},
+                                        description=f"Resolve of {filename}")
+    else:
+        download_url = resolver.resolve(clip['url'])
+    if not download_url:
+        raise ValueError(f"no download URL found for {filename}")
+    return download_url
+
+def save_resolved_clip(clip, download_url, output_dir, logger, file_counter, engine=None, segmented=False,
+                       manifest=None, summary=None, metrics=None, limiter=None, retry_policy=None,
+                       progress=None, writer=None, validate=True, bandwidth=None, ready=None, resolver=None):
+    """
+    Download a clip whose download URL is already known and record it in the manifest.
+
+    Transient errors are retried with backoff when a retry policy is given (the
+    async engine applies its own policy). A download that is not valid media is
+    not retried from the same URL: with a resolver, the clip is resolved again
+    (up to MAX_RERESOLVES times) and downloaded from the new URL.
+
+    :return: Future of the transfer when an async engine is used, otherwise None.
+    """
+    filename = get_clip_filename(clip)
+    logger.info(f"Processing clip: {filename}", extra=log_fields(clip, 'download'))
+    stats = {}
+    start = time.perf_counter()
+    if progress is not None:
+        # The view reads the live byte count from stats while the transfer runs
+        progress.set_state(clip, clip_state.DOWNLOADING, stats)
+
+    def record(ok, error=None):
+        end = time.perf_counter()
+        if metrics is not None:
+            metrics.record_download(clip, stats, end - start, ok)
+            metrics.record_span('download', start, end, clip, bytes=stats.get('bytes', 0), ok=ok)
+        if limiter is not None:
+            # Time to first byte tracks server load; total time also grows with clip size
+            limiter.record(stats.get('ttfb') or end - start, stats.get('bytes', 0),
+                           throttled=bool(stats.get('throttled')) or is_throttling_error(error))
+
+    def completed():
+        record(True)
+        entry = None
+        if manifest is not None:
+            entry = manifest.add(get_clip_slug(clip['url']), f"{filename}.mp4", file_counter.get_next(),
+                                 sha256=stats.get('sha256'))
+        if summary is not None:
+            clip_metrics = metrics.clip_metrics(clip) if metrics is not None else {}
+            clip_metrics.pop('order', None)
+            clip_metrics.pop('player', None)
+            media = stats.get('media') or {}
+            if 'duration' in media:
+                clip_metrics['duration_seconds'] = media['duration']
+            if 'width' in media:
+                clip_metrics['resolution'] = f"{media['width']}x{media['height']}"
+            summary.record_completed(clip, filename=f"{filename}.mp4", size=entry['size'] if entry else None,
+                                     **clip_metrics)
+        if progress is not None:
+            progress.set_state(clip, clip_state.DONE)
+        if ready is not None:
+            ready.mark_ready(clip)
+        logger.info(f"Download completed: {filename}",
+                    extra=log_fields(clip, 'download', time.perf_counter() - start))
+
+    def failed(error):
+        record(False, error)
+        logger.error(f"Error downloading clip {filename}: {str(error)}",
+                     extra=log_fields(clip, 'download', time.perf_counter() - start))
+        if summary is not None:
+            summary.record_failed(clip, 'download', error)
+        if progress is not None:
+            progress.set_state(clip, clip_state.FAILED, error=error)
+
+    if engine is not None:
+        # Done only once the clip is saved or given up on, across fresh resolves
+        outcome = Future()
+
+        def submit(url, reresolves):
+            def on_done(file_path, error):
+                if isinstance(error, InvalidMediaError) and resolver is not None and reresolves < MAX_RERESOLVES:
+                    # Resolving may load a page in a browser; keep it off the engine thread
+                    threading.Thread(target=submit_again, args=(reresolves,), daemon=True).start()
+                elif error is None:
+                    completed()
+                    outcome.set_result(file_path)
+                else:
+                    failed(error)
+                    outcome.set_exception(error)
+            engine.submit(url, filename, output_dir, callback=on_done, stats=stats, priority=clip_priority(clip))
+
+        def submit_again(reresolves):
+            try:
+                url = resolve_again(clip, resolver, logger, retry_policy)
+            except Exception as e:
+                failed(e)
+                outcome.set_exception(e)
+                return
+            submit(url, reresolves + 1)
+
+        submit(download_url, 0)
+        return outcome
+
+    def attempt(url):
+        # The share is held per attempt, so a clip waiting out a backoff leaves its bandwidth to the others
+        with bandwidth.open(clip_priority(clip)) if bandwidth is not None else nullcontext() as share:
+            return save_clip(url, filename, output_dir, file_counter, segmented=segmented, stats=stats,
+                             writer=writer, validate=validate, bandwidth=share)
+
+    reresolves = 0
+    while True:
+        try:
+            if retry_policy is not None:
+                retry_policy.run(lambda: attempt(download_url), download_url, stats,
+                                 description=f"Download of {filename}")
+            else:
+                attempt(download_url)
+            break
+        except InvalidMediaError as e:
+            if resolver is None or reresolves >= MAX_RERESOLVES:
+                return failed(e)
+            reresolves += 1
+            try:
+                download_url = resolve_again(clip, resolver, logger, retry_policy)
+            except Exception as e:
+                return failed(e)
+        except Exception as e:
+            return failed(e)
+    completed()
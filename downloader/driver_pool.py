@@ -0,0 +1,223 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+
+# Requests a lean browser never makes: images, fonts, stylesheets and the clip media itself, which is
+# downloaded separately once its URL has been seen
+BLOCKED_URL_PATTERNS = (
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.css', '*.mp4', '*.mp4?*',
+)
+
+# The chromedriver binary is resolved once per process and shared by every pool
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def get_driver_path():
+    """
+    Resolve the chromedriver binary, downloading it on first use only.
+
+    :return: Path to the chromedriver executable.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+def create_driver(lean=False):
+    """
+    Start a new headless Chrome instance.
+
+    :param lean: Start a lean browser for get_clip_download_url_lean: page loads return at
+                 DOMContentLoaded, heavy resources are blocked through DevTools and network
+                 events are recorded in the performance log.
+    :return: WebDriver instance.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    if lean:
+        chrome_options.page_load_strategy = 'eager'
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_argument("--autoplay-policy=no-user-gesture-required")
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    driver = webdriver.Chrome(service=Service(get_driver_path()), options=chrome_options)
+    if lean:
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(BLOCKED_URL_PATTERNS)})
+        except Exception:
+            driver.quit()
+            raise
+    return driver
+
+class DriverPool:
+    """
+    Pool of long-lived WebDriver instances shared by the download workers.
+
+    Drivers are started lazily up to ``size``, reset between checkouts and
+    replaced when they stop responding.
+    """
+
+    def __init__(self, size, driver_factory=create_driver, logger=None):
+        self.size = size
+        self.driver_factory = driver_factory
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._all = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self, timeout=None):
+        """
+        Check out a driver, starting a new one if no idle driver is available.
+
+        :param timeout: Seconds to wait for a free driver, or None to wait forever.
+        :return: WebDriver instance.
+        """
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Timed out waiting for a free browser")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._all.add(driver)
+            alive = len(self._all)
+        self.logger.info(f"Started browser {alive}/{self.size}")
+        return driver
+
+    def release(self, driver, discard=False):
+        """
+        Return a driver to the pool, resetting it for the next clip.
+
+        A driver that fails the reset is quit; the next checkout starts a replacement.
+
+        :param driver: WebDriver instance obtained from acquire().
+        :param discard: Quit the driver instead of reusing it.
+        """
+        try:
+            if not discard and not self._closed:
+                try:
+                    self.reset(driver)
+                except Exception as e:
+                    self.logger.warning(f"Browser failed health check, replacing it: {str(e)}")
+                    discard = True
+
+            if discard or self._closed:
+                self._quit(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    def reset(self, driver):
+        """
+        Clear cookies and storage left behind by the previous clip.
+
+        Raises if the browser no longer responds, which doubles as a health check.
+
+        :param driver: WebDriver instance.
+        """
+        driver.delete_all_cookies()
+        driver.execute_script(
+            "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+        )
+        driver.get("about:blank")
+
+    def trim(self, keep):
+        """
+        Quit idle browsers until at most ``keep`` are running, e.g. to free memory.
+        Browsers that are checked out are left alone.
+
+        :param keep: Number of browsers to keep.
+        """
+        while self.alive > keep:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(driver)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """
+        Context manager that checks out a driver and always returns it.
+
+        :param timeout: Seconds to wait for a free driver.
+        """
+        driver = self.acquire(timeout)
+        discard = False
+        try:
+            yield driver
+        except Exception:
+            discard = not self.is_alive(driver)
+            raise
+        finally:
+            self.release(driver, discard=discard)
+
+    @property
+    def alive(self):
+        """
+        Number of browsers currently running, idle or checked out.
+        """
+        with self._lock:
+            return len(self._all)
+
+    def is_alive(self, driver):
+        """
+        Check whether the browser behind a driver still responds.
+
+        :param driver: WebDriver instance.
+        :return: True if the browser answered.
+        """
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        with self._lock:
+            self._all.discard(driver)
+        self.logger.info("Browser shut down")
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Shut down every browser started by the pool.
+        """
+        self._closed = True
+        with self._lock:
+            drivers = list(self._all)
+        for driver in drivers:
+            self._quit(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
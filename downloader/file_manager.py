@@ -1,6 +1,47 @@
+import hashlib
+import json
+import logging
 import os
-import requests
+import re
 import threading
+import time
+from downloader.disk_writer import get_disk_writer
+from downloader.mp4_validator import InvalidMediaError, Mp4Validator, validate_file
+
+logger = logging.getLogger('TwitchClipDownloader')
+
+# Shared Session so clips reuse keep-alive connections to the CDN
+_session = None
+_session_lock = threading.Lock()
+
+def create_session(pool_size=10):
+    """
+    Create a requests Session with a keep-alive connection pool.
+
+    :param pool_size: Number of connections kept open per host.
+    :return: requests.Session object.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_session(pool_size=64):
+    """
+    Return the process-wide download Session, creating it on first use.
+
+    :param pool_size: Number of connections kept open per host.
+    :return: requests.Session object.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session(pool_size)
+        return _session
 
 # Thread-safe counter for file naming
 class FileCounter:
@@ -14,6 +55,23 @@ class FileCounter:
             self.count += 1
             return current
 
+class SharedFileCounter:
+    """
+    FileCounter drawing its numbers from a store shared with other processes,
+    e.g. the JobQueue, so workers on one output directory never repeat a number.
+    """
+
+    def __init__(self, source, start_number):
+        """
+        :param source: Object with next_number(floor) returning a number unique to the caller.
+        :param start_number: Lowest number to hand out.
+        """
+        self.source = source
+        self.start_number = start_number
+
+    def get_next(self):
+        return self.source.next_number(self.start_number)
+
 def get_max_number(output_dir):
     max_number = 0
     if os.path.exists(output_dir):
@@ -26,24 +84,250 @@ def get_max_number(output_dir):
                     continue
     return max_number
 
-def save_clip(download_url, clip_name, output_dir, file_counter):
+CONTENT_RANGE_PATTERN = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+class IncompleteDownloadError(IOError):
+    pass
+
+def get_part_paths(file_path):
+    """
+    :param file_path: Final path of the clip.
+    :return: Tuple of (partial download path, resume metadata path).
+    """
+    part_path = f"{file_path}.part"
+    return part_path, f"{part_path}.json"
+
+def get_resume_headers(file_path):
+    """
+    Build request headers that continue a partial download of file_path.
+
+    A partial file is only resumed when an ETag or Last-Modified validator was
+    recorded for it, so a changed file on the server restarts from zero.
+
+    :param file_path: Final path of the clip.
+    :return: Tuple of (headers dict, bytes already on disk).
+    """
+    part_path, meta_path = get_part_paths(file_path)
+    try:
+        offset = os.path.getsize(part_path)
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        validator = meta.get('validator')
+    except (OSError, ValueError):
+        return {}, 0
+
+    # A preallocated part file is full size from the start; only the recorded bytes were written
+    if meta.get('written') is not None:
+        offset = min(offset, meta['written'])
+    if not offset or not validator:
+        return {}, 0
+    # Every byte is there but the file never got its final name: fetch it again rather than an empty range
+    if meta.get('total') is not None and offset >= meta['total']:
+        return {}, 0
+    return {'Range': f"bytes={offset}-", 'If-Range': validator}, offset
+
+def start_part(file_path, status, headers, offset):
+    """
+    Decide how to open the partial file for a response and record how to resume it.
+
+    :param file_path: Final path of the clip.
+    :param status: HTTP status code of the response.
+    :param headers: Response headers.
+    :param offset: Bytes already on disk when the request was made.
+    :return: Tuple of (file mode, bytes already on disk, expected total size or None).
+    """
+    part_path, meta_path = get_part_paths(file_path)
+    total = None
+    match = CONTENT_RANGE_PATTERN.match(headers.get('Content-Range', ''))
+    if status == 206 and match and int(match.group(1)) == offset:
+        mode = 'ab'
+        if match.group(3) != '*':
+            total = int(match.group(3))
+    else:
+        # Server ignored the range or the file changed: start over
+        mode, offset = 'wb', 0
+        if headers.get('Content-Length') and not headers.get('Content-Encoding'):
+            total = int(headers['Content-Length'])
+
+    if mode == 'ab' and os.path.getsize(part_path) > offset:
+        # Preallocated space past the bytes a dead run had written
+        os.truncate(part_path, offset)
+
+    validator = headers.get('ETag') or headers.get('Last-Modified')
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'validator': validator, 'total': total}, f)
+    return mode, offset, total
+
+def record_part_progress(file_path, written):
+    """
+    Record in the resume metadata how many bytes of a partial download are on disk,
+    for part files whose size does not tell (preallocated ones).
+
+    :param file_path: Final path of the clip.
+    :param written: Bytes written from the start of the file.
+    """
+    _, meta_path = get_part_paths(file_path)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    meta['written'] = written
+    # Replaced in one step, so a crash never leaves metadata that cannot be read
+    temp_path = f"{meta_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temp_path, meta_path)
+
+def discard_part(file_path):
+    """
+    Delete a partial download and its resume metadata, so the next attempt starts over.
+    """
+    for path in get_part_paths(file_path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def finish_part(file_path, total, check=None):
+    """
+    Atomically move a finished partial download into place.
+
+    :param file_path: Final path of the clip.
+    :param total: Expected size in bytes, or None if the server did not say.
+    :param check: Optional callable check(part_path) run once the size is right, before the
+                  rename; if it raises InvalidMediaError the partial file is discarded.
+    :raises IncompleteDownloadError: If the partial file is shorter or longer than expected.
+    :raises InvalidMediaError: If check rejected the file.
+    """
+    part_path, meta_path = get_part_paths(file_path)
+    size = os.path.getsize(part_path)
+    if total is not None and size != total:
+        raise IncompleteDownloadError(f"Incomplete download: got {size} of {total} bytes for {file_path}")
+    if check is not None:
+        try:
+            check(part_path)
+        except InvalidMediaError:
+            discard_part(file_path)
+            raise
+
+    os.replace(part_path, file_path)
+    try:
+        os.remove(meta_path)
+    except OSError:
+        pass
+
+def read_into(response, buffer):
+    """
+    Read the next part of a streamed requests response into buffer.
+
+    Errors are raised as the same requests exceptions iter_content would raise.
+
+    :return: Number of bytes read; 0 at the end of the body.
+    """
+    from requests.exceptions import ChunkedEncodingError, ConnectionError, ContentDecodingError
+    from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+    try:
+        return response.raw.readinto(buffer)
+    except ProtocolError as e:
+        raise ChunkedEncodingError(e)
+    except DecodeError as e:
+        raise ContentDecodingError(e)
+    except ReadTimeoutError as e:
+        raise ConnectionError(e)
+
+def save_clip(download_url, clip_name, output_dir, file_counter, segmented=False, stats=None, writer=None,
+              validate=True, bandwidth=None):
     """
     Download and save a Twitch clip to the specified directory.
+
+    Data goes to "<name>.mp4.part" first and is renamed only once the byte
+    count matches and the MP4 structure checks out; an existing partial file
+    is continued with a Range request.
     
     :param download_url: Download URL.
     :param clip_name: Name of the clip (including order and username with case preserved).
     :param output_dir: Output directory.
     :param file_counter: Thread-safe counter for file naming.
+    :param segmented: Fetch large clips over several concurrent range requests.
+    :param stats: Optional dictionary filled with transfer stats: bytes, ttfb (seconds) and retries, and
+                  sha256 (hex digest taken while streaming) when the file was fetched from its first byte.
+    :param writer: DiskWriter that performs the writes (defaults to the shared one).
+    :param validate: Check the MP4 box structure as it arrives and record duration and
+                     resolution in stats['media'].
+    :param bandwidth: BandwidthShare that paces the reads of this transfer.
+    :return: True once the clip is saved.
+    :raises: The request, HTTP or file error that stopped the download; the partial
+             file is kept so the next attempt resumes it, unless the data was not a
+             valid MP4 (InvalidMediaError).
     """
-    try:
-        # Create file path with exact case preservation
-        file_path = os.path.join(output_dir, f"{clip_name}.mp4")
-        
-        response = requests.get(download_url, stream=True)
-        with open(file_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        print(f"File saved successfully: {file_path}")
-    except Exception as e:
-        print(f"Error saving file: {str(e)}")
+    if stats is None:
+        stats = {}
+    stats.update(bytes=0, ttfb=None, retries=stats.get('retries', 0), sha256=None)
+
+    # Create file path with exact case preservation
+    file_path = os.path.join(output_dir, f"{clip_name}.mp4")
+    part_path, _ = get_part_paths(file_path)
+    validator = None
+
+    def check(path):
+        # Resumed and segmented transfers were not seen from the first byte; their box headers are read from disk
+        stats['media'] = validator.finish() if validator is not None else validate_file(path)
+
+    if segmented:
+        from downloader.segmented import save_clip_segmented
+        if save_clip_segmented(download_url, file_path, stats=stats, check=check if validate else None,
+                               bandwidth=bandwidth):
+            logger.debug(f"File saved successfully: {file_path}")
+            return True
+
+    headers, offset = get_resume_headers(file_path)
+    request_start = time.perf_counter()
+    with get_session().get(download_url, stream=True, headers=headers, timeout=(10, 60)) as response:
+        stats['ttfb'] = time.perf_counter() - request_start
+        response.raise_for_status()
+        mode, offset, total = start_part(file_path, response.status_code, response.headers, offset)
+        if offset:
+            logger.info(f"Resuming {file_path} at byte {offset}")
+        if response.headers.get('Content-Encoding'):
+            response.raw.decode_content = True
+        if validate and not offset:
+            validator = Mp4Validator()
+        # Hashed as it streams, so the manifest need not read the file back; a resumed file is hashed from disk
+        digest = hashlib.sha256() if not offset else None
+
+        # Read straight into pooled buffers; the writer thread does the disk I/O
+        writer = writer or get_disk_writer()
+        try:
+            with writer.open(part_path, mode, total,
+                             checkpoint=lambda written: record_part_progress(file_path, written)) as part:
+                while True:
+                    buffer = writer.get_buffer()
+                    try:
+                        length = read_into(response, buffer)
+                        if length and validator is not None:
+                            validator.feed(memoryview(buffer)[:length])
+                        if length and digest is not None:
+                            digest.update(memoryview(buffer)[:length])
+                    except BaseException:
+                        writer.release_buffer(buffer)
+                        raise
+                    if not length:
+                        writer.release_buffer(buffer)
+                        break
+                    part.write(buffer, length)
+                    stats['bytes'] += length
+                    if bandwidth is not None:
+                        bandwidth.consume(length)
+        except InvalidMediaError:
+            # e.g. an error page served with 200: nothing in it is worth resuming
+            discard_part(file_path)
+            raise
+
+    finish_part(file_path, total, check if validate else None)
+    if digest is not None:
+        stats['sha256'] = digest.hexdigest()
+
+    logger.debug(f"File saved successfully: {file_path}")
+    return True
@@ -0,0 +1,385 @@
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from itertools import islice
+from downloader.summary import BatchSummary
+
+JOBS_NAME = '.clips_jobs.sqlite'
+# Clips inserted per transaction by JobQueue.add, so huge inputs are never held in memory
+ADD_CHUNK_SIZE = 5000
+
+# Job states
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+def get_jobs_path(output_dir):
+    return os.path.join(output_dir, JOBS_NAME)
+
+def make_worker_id():
+    """
+    :return: Worker ID "<host>:<pid>:<random>", unique per JobQueue user.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def make_batch_id():
+    """
+    :return: ID tagging the jobs of one run, so the run claims only its own clips.
+    """
+    return uuid.uuid4().hex[:12]
+
+def is_local_worker_dead(worker):
+    """
+    Check whether a worker ID belongs to a process on this host that no longer runs.
+
+    :return: True only if that is certain; workers on other hosts are never reported dead.
+    """
+    host, _, rest = worker.partition(':')
+    pid = rest.partition(':')[0]
+    # os.kill(pid, 0) would terminate the process on Windows
+    if host != socket.gethostname() or not pid.isdigit() or sys.platform.startswith('win'):
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+class JobQueue:
+    """
+    Durable queue of clips to download, shared by any number of worker processes.
+
+    Jobs live in a SQLite database next to the downloads. A worker claims
+    jobs by taking a lease on them, keeps the lease alive with heartbeats
+    while it works and marks each job done or failed. Leases of workers
+    that stop heartbeating expire and their jobs return to the queue, so a
+    crashed run loses only the clips that were in flight.
+
+    Jobs are tagged with the batch (run) that queued them. A new run claims
+    only its own batch; jobs left unfinished by earlier runs are picked up
+    by resuming, which claims every batch.
+
+    WAL mode needs every worker on the same host. Workers on several
+    machines sharing a network filesystem need wal=False, and the
+    filesystem must support reliable locking.
+    """
+
+    def __init__(self, path, lease_seconds=120.0, max_attempts=5, wal=True, logger=None):
+        """
+        :param path: SQLite database file.
+        :param lease_seconds: How long a claim is valid without a heartbeat.
+        :param max_attempts: Claims after which a job whose workers keep dying is marked failed.
+        :param wal: Use write-ahead logging (all workers on one host).
+        :param logger: Logger object
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self._lock = threading.Lock()
+        # Autocommit, so claims can take the write lock up front with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        if wal:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            # Commits stay durable across crashes; a power loss may drop the last few
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY, url TEXT NOT NULL, clip_order INTEGER NOT NULL, player TEXT NOT NULL, '
+            'state TEXT NOT NULL, worker TEXT, lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'error TEXT, updated_at REAL NOT NULL, UNIQUE (url, clip_order, player))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id)')
+        if 'batch' not in [row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')]:
+            # Queues from before batches existed: their jobs belong to no batch and are only resumed
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN batch TEXT')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, state, id)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+    def _transaction(self, func):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    def add(self, clips, batch=None):
+        """
+        Queue clips, ADD_CHUNK_SIZE per transaction, so the input may be a
+        generator of any length. Clips already queued move to the new batch;
+        finished or failed ones are queued again (the manifest skips files
+        that are still intact), pending ones keep their place.
+
+        :param clips: Iterable of clip dictionaries (order, player, url).
+        :param batch: Batch ID of the run queuing the clips (see make_batch_id).
+        :return: Number of clips queued.
+        """
+        clips = iter(clips)
+        count = 0
+        while True:
+            chunk = list(islice(clips, ADD_CHUNK_SIZE))
+            if not chunk:
+                return count
+            now = time.time()
+
+            def insert(conn):
+                conn.executemany(
+                    'INSERT INTO jobs (url, clip_order, player, state, batch, updated_at) VALUES (?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (url, clip_order, player) DO UPDATE SET batch = excluded.batch, '
+                    'state = CASE WHEN jobs.state IN (?, ?) THEN excluded.state ELSE jobs.state END, '
+                    'attempts = CASE WHEN jobs.state IN (?, ?) THEN 0 ELSE jobs.attempts END, '
+                    'error = CASE WHEN jobs.state IN (?, ?) THEN NULL ELSE jobs.error END, '
+                    'updated_at = excluded.updated_at',
+                    ((clip['url'], clip['order'], clip['player'], PENDING, batch, now) + (DONE, FAILED) * 3
+                     for clip in chunk)
+                )
+            self._transaction(insert)
+            count += len(chunk)
+
+    def _reclaim(self, conn, now):
+        """
+        Return jobs with expired leases, or leased by dead local workers, to the queue.
+        """
+        dead = [worker for (worker,) in conn.execute(
+            'SELECT DISTINCT worker FROM jobs WHERE state = ?', (LEASED,)
+        ) if is_local_worker_dead(worker)]
+        expired = conn.execute(
+            f"SELECT id, attempts, worker FROM jobs WHERE state = ? AND (lease_until < ? "
+            f"OR worker IN ({','.join('?' * len(dead))}))", (LEASED, now, *dead)
+        ).fetchall()
+        for job_id, attempts, worker in expired:
+            if attempts >= self.max_attempts:
+                conn.execute('UPDATE jobs SET state = ?, worker = NULL, error = ?, updated_at = ? WHERE id = ?',
+                             (FAILED, f"worker lost the job {attempts} times", now, job_id))
+            else:
+                conn.execute('UPDATE jobs SET state = ?, worker = NULL, updated_at = ? WHERE id = ?',
+                             (PENDING, now, job_id))
+        if expired:
+            self.logger.info(f"Reclaimed {len(expired)} jobs from stopped workers")
+        return len(expired)
+
+    def claim(self, worker, limit=1, batch=None):
+        """
+        Lease up to limit queued jobs, oldest first.
+
+        :param worker: ID of the claiming worker (see make_worker_id).
+        :param batch: Only claim jobs of this batch; None claims jobs of every batch (resume).
+        :return: List of clip dictionaries with a 'job_id' key.
+        """
+        def take(conn):
+            now = time.time()
+            self._reclaim(conn, now)
+            if batch is None:
+                rows = conn.execute(
+                    'SELECT id, url, clip_order, player FROM jobs WHERE state = ? ORDER BY id LIMIT ?',
+                    (PENDING, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    'SELECT id, url, clip_order, player FROM jobs WHERE batch = ? AND state = ? ORDER BY id LIMIT ?',
+                    (batch, PENDING, limit)
+                ).fetchall()
+            conn.executemany(
+                'UPDATE jobs SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? '
+                'WHERE id = ?', [(LEASED, worker, now + self.lease_seconds, now, row[0]) for row in rows]
+            )
+            return rows
+        return [{'job_id': job_id, 'name': str(order), 'url': url, 'order': order, 'player': player}
+                for job_id, url, order, player in self._transaction(take)]
+
+    def heartbeat(self, worker):
+        """
+        Extend the leases of every job the worker holds.
+
+        :return: Number of leases extended.
+        """
+        now = time.time()
+        return self._transaction(lambda conn: conn.execute(
+            'UPDATE jobs SET lease_until = ? WHERE state = ? AND worker = ?', (now + self.lease_seconds, LEASED, worker)
+        ).rowcount)
+
+    def finish(self, job_id, worker, error=None):
+        """
+        Mark a leased job done, or failed with error. A job whose lease was
+        lost to another worker is left alone.
+
+        :return: True if the job was still leased by this worker.
+        """
+        return self._transaction(lambda conn: conn.execute(
+            'UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL, error = ?, updated_at = ? '
+            'WHERE id = ? AND state = ? AND worker = ?',
+            (FAILED if error is not None else DONE, None if error is None else str(error), time.time(),
+             job_id, LEASED, worker)
+        ).rowcount == 1)
+
+    def release(self, worker):
+        """
+        Return every job the worker still holds to the queue, e.g. after a cancelled run.
+
+        :return: Number of jobs released.
+        """
+        return self._transaction(lambda conn: conn.execute(
+            'UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL, attempts = MAX(attempts - 1, 0), '
+            'updated_at = ? WHERE state = ? AND worker = ?', (PENDING, time.time(), LEASED, worker)
+        ).rowcount)
+
+    def retry_failed(self):
+        """
+        Queue every failed job again.
+
+        :return: Number of jobs queued.
+        """
+        return self._transaction(lambda conn: conn.execute(
+            'UPDATE jobs SET state = ?, attempts = 0, error = NULL, updated_at = ? WHERE state = ?',
+            (PENDING, time.time(), FAILED)
+        ).rowcount)
+
+    def counts(self, batch=None):
+        """
+        :param batch: Only count jobs of this batch.
+        :return: Dictionary with the number of jobs per state.
+        """
+        with self._lock:
+            if batch is None:
+                return dict(self._conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+            return dict(self._conn.execute('SELECT state, COUNT(*) FROM jobs WHERE batch = ? GROUP BY state',
+                                           (batch,)).fetchall())
+
+    def unfinished(self, exclude_batch=None):
+        """
+        :param exclude_batch: Leave out the jobs of this batch.
+        :return: Number of pending or leased jobs, e.g. left behind by an earlier run.
+        """
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM jobs WHERE state IN (?, ?) AND batch IS NOT ?', (PENDING, LEASED, exclude_batch)
+            ).fetchone()[0]
+
+    def leased_by_others(self, worker, batch=None):
+        with self._lock:
+            if batch is None:
+                return self._conn.execute('SELECT COUNT(*) FROM jobs WHERE state = ? AND worker != ?',
+                                          (LEASED, worker)).fetchone()[0]
+            return self._conn.execute('SELECT COUNT(*) FROM jobs WHERE batch = ? AND state = ? AND worker != ?',
+                                      (batch, LEASED, worker)).fetchone()[0]
+
+    def next_number(self, floor=1):
+        """
+        Allocate a manifest file number that is unique across every worker of the queue.
+
+        :param floor: Lowest number to hand out, e.g. one past the highest in the manifest.
+        :return: The allocated number.
+        """
+        def allocate(conn):
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES ('file_number', ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = MAX(value + 1, excluded.value)", (floor,)
+            )
+            return conn.execute("SELECT value FROM counters WHERE name = 'file_number'").fetchone()[0]
+        return self._transaction(allocate)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class JobSummary(BatchSummary):
+    """
+    BatchSummary that also settles each clip's job in the queue.
+    """
+
+    def __init__(self, jobs, worker):
+        super().__init__()
+        self.jobs = jobs
+        self.worker = worker
+
+    def _finish_job(self, clip, error=None):
+        if clip.get('job_id') is not None:
+            self.jobs.finish(clip['job_id'], self.worker, error)
+
+    def record_completed(self, clip, **fields):
+        super().record_completed(clip, **fields)
+        self._finish_job(clip)
+
+    def record_failed(self, clip, phase, error):
+        super().record_failed(clip, phase, error)
+        self._finish_job(clip, error)
+
+    def record_skipped(self, clip, reason):
+        super().record_skipped(clip, reason)
+        self._finish_job(clip)
+
+class JobWorker:
+    """
+    Feeds a download batch from a JobQueue: claims jobs as the batch asks for
+    clips and heartbeats the leases in the background.
+
+    Use as a context manager around download_clips; leases still held on exit
+    (cancelled or never finished clips) go back to the queue.
+    """
+
+    def __init__(self, jobs, batch=None, claim_size=10, poll_interval=5.0, cancel_event=None, logger=None):
+        """
+        :param jobs: JobQueue to work on.
+        :param batch: Only work on this batch's jobs; None works on every batch (resume).
+        :param claim_size: Jobs leased per claim.
+        :param poll_interval: Seconds between checks while only other workers hold jobs.
+        :param cancel_event: threading.Event that stops claiming when set.
+        :param logger: Logger object
+        """
+        self.jobs = jobs
+        self.batch = batch
+        self.worker = make_worker_id()
+        self.claim_size = claim_size
+        self.poll_interval = poll_interval
+        self.cancel_event = cancel_event or threading.Event()
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self.summary = JobSummary(jobs, self.worker)
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def clips(self):
+        """
+        :return: Generator of claimed clips. It ends once the queue is empty; while
+                 other workers still hold leases it keeps polling, so jobs of a
+                 worker that dies are picked up here.
+        """
+        while not self.cancel_event.is_set():
+            claimed = self.jobs.claim(self.worker, self.claim_size, self.batch)
+            if claimed:
+                yield from claimed
+            elif self.jobs.leased_by_others(self.worker, self.batch):
+                self.cancel_event.wait(self.poll_interval)
+            else:
+                return
+
+    def _run_heartbeat(self):
+        interval = self.jobs.lease_seconds / 3
+        while not self._stop.wait(interval):
+            try:
+                self.jobs.heartbeat(self.worker)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Job heartbeat failed: {str(e)}")
+
+    def __enter__(self):
+        self._heartbeat = threading.Thread(target=self._run_heartbeat, name='JobHeartbeat', daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._heartbeat.join()
+        released = self.jobs.release(self.worker)
+        if released:
+            self.logger.info(f"Returned {released} unfinished jobs to the queue")
@@ -0,0 +1,177 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+MANIFEST_NAME = '.clips_manifest.jsonl'
+
+def hash_file(file_path, block_size=1024 * 1024):
+    """
+    :param file_path: File to hash.
+    :return: Hex SHA-256 digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class Manifest:
+    """
+    Index of the clips in an output directory.
+
+    Stored as an append-only JSON-lines file: one record per completed download
+    with slug, filename, size, content hash and allocated number. Later records
+    win, and a torn final line (crash mid-append) is ignored on load.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.max_number = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        self._entries = {}
+        self.max_number = 0
+        if not self.exists:
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(entry)
+
+    def _apply(self, entry):
+        self._entries[entry.get('slug') or entry['filename']] = entry
+        self.max_number = max(self.max_number, entry.get('number') or 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, slug):
+        return self._entries.get(slug)
+
+    def is_present(self, slug):
+        """
+        Check whether a clip was already downloaded and its file is still intact in size.
+
+        Only stats the one file, never lists the directory.
+
+        :param slug: Clip slug.
+        :return: True if the recorded file exists with the recorded size.
+        """
+        entry = self._entries.get(slug)
+        if entry is None:
+            return False
+        try:
+            return os.path.getsize(os.path.join(self.output_dir, entry['filename'])) == entry['size']
+        except OSError:
+            return False
+
+    def next_number(self):
+        """
+        Allocate the next file number without scanning the directory.
+        """
+        with self._lock:
+            self.max_number += 1
+            return self.max_number
+
+    def add(self, slug, filename, number=None, sha256=None):
+        """
+        Record a completed download. The record is appended and fsynced in one write.
+
+        :param slug: Clip slug (may be None for files of unknown origin).
+        :param filename: File name inside the output directory.
+        :param number: Allocated file number; a new one is allocated if None.
+        :param sha256: Hex SHA-256 of the file if it was computed while downloading;
+                       otherwise the file is read back to hash it.
+        :return: The stored entry.
+        """
+        file_path = os.path.join(self.output_dir, filename)
+        entry = {
+            'slug': slug,
+            'filename': filename,
+            'size': os.path.getsize(file_path),
+            'sha256': sha256 or hash_file(file_path),
+            'number': number if number is not None else self.next_number(),
+            'completed_at': time.time(),
+        }
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+        return entry
+
+    def rebuild(self, clips=None):
+        """
+        Recreate the manifest from the files in the output directory.
+
+        :param clips: Optional clip list the files were downloaded from, used to
+                      recover the slug of each "<order>@<player>.mp4" file.
+        :return: Number of files indexed.
+        """
+        from downloader.resolvers import get_clip_slug
+
+        slugs = {}
+        for clip in clips or ():
+            slugs[f"{clip['order']}@{clip['player']}.mp4"] = get_clip_slug(clip['url'])
+
+        # Number the files in the order they were written
+        filenames = sorted(
+            (f for f in os.listdir(self.output_dir) if f.endswith('.mp4')),
+            key=lambda f: os.path.getmtime(os.path.join(self.output_dir, f))
+        )
+        entries = []
+        for number, filename in enumerate(filenames, start=1):
+            file_path = os.path.join(self.output_dir, filename)
+            entries.append({
+                'slug': slugs.get(filename),
+                'filename': filename,
+                'size': os.path.getsize(file_path),
+                'sha256': hash_file(file_path),
+                'number': number,
+                'completed_at': os.path.getmtime(file_path),
+            })
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            os.replace(temp_path, self.path)
+            self.load()
+        return len(entries)
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the clip manifest of an output directory')
+    parser.add_argument('output', help='Output directory to index')
+    parser.add_argument('-i', '--input', help='Clip list the directory was downloaded from, to recover slugs')
+    args = parser.parse_args()
+
+    clips = None
+    if args.input:
+        from downloader.clip_loader import iter_clips
+        with open(args.input, encoding='utf-8') as f:
+            clips = list(iter_clips(f))
+
+    count = Manifest(args.output).rebuild(clips)
+    print(f"Indexed {count} files in {os.path.join(args.output, MANIFEST_NAME)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+
+# Histogram buckets (seconds) for resolve latency and time-to-first-byte
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+class BatchMetrics:
+    """
+    Per-clip timings, pool-wide gauges and trace spans for one download batch.
+
+    Exported as Prometheus text exposition format and as Chrome trace JSON
+    (load it in chrome://tracing or ui.perfetto.dev).
+    """
+
+    def __init__(self, trace=False):
+        """
+        :param trace: Keep resolve/download spans for write_trace().
+        """
+        self.trace = trace
+        self.started = time.perf_counter()
+        self.resolve_latency = Histogram()
+        self.ttfb = Histogram()
+        self.clips = {}
+        self.counters = {'clips_resolved': 0, 'clips_downloaded': 0, 'clips_failed': 0,
+                         'bytes_downloaded': 0, 'retries': 0}
+        self._gauges = {}
+        self._events = []
+        self._lock = threading.Lock()
+
+    def register_gauge(self, name, read):
+        """
+        :param name: Gauge name, e.g. 'in_flight'.
+        :param read: Callable returning the current value; polled at export time.
+        """
+        self._gauges[name] = read
+
+    @staticmethod
+    def _key(clip):
+        # Orders repeat across players and across the batches of one job queue
+        job_id = clip.get('job_id')
+        return ('job', job_id) if job_id is not None else (clip['order'], clip['player'])
+
+    def _clip(self, clip):
+        return self.clips.setdefault(self._key(clip), {'order': clip['order'], 'player': clip['player']})
+
+    def record_span(self, name, start, end, clip=None, **args):
+        """
+        Record a trace span from its perf_counter() start and end, attributed to a clip when given.
+        The two may be taken on different threads, e.g. for a download finished by the engine.
+        """
+        if not self.trace:
+            return
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': round((start - self.started) * 1e6),
+            'dur': round((end - start) * 1e6),
+            'pid': os.getpid(),
+            # One trace row per clip keeps overlapping async downloads readable
+            'tid': clip['order'] if clip is not None else 0,
+            'args': dict(args, player=clip['player']) if clip is not None else args,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def record_resolve(self, clip, seconds, ok):
+        with self._lock:
+            self._clip(clip)['resolve_seconds'] = round(seconds, 6)
+            self.resolve_latency.observe(seconds)
+            if ok:
+                self.counters['clips_resolved'] += 1
+
+    def record_download(self, clip, stats, seconds, ok):
+        """
+        :param clip: Clip dictionary.
+        :param stats: Transfer stats filled in by the engine (bytes, ttfb, retries).
+        :param seconds: Wall-clock duration of the transfer.
+        :param ok: Whether the download succeeded.
+        """
+        size = stats.get('bytes', 0)
+        with self._lock:
+            entry = self._clip(clip)
+            entry.update(
+                download_seconds=round(seconds, 6),
+                bytes=size,
+                throughput_bps=round(size / seconds) if seconds > 0 else None,
+                retries=stats.get('retries', 0),
+            )
+            if stats.get('ttfb') is not None:
+                entry['ttfb_seconds'] = round(stats['ttfb'], 6)
+                self.ttfb.observe(stats['ttfb'])
+            self.counters['bytes_downloaded'] += size
+            self.counters['retries'] += stats.get('retries', 0)
+            self.counters['clips_downloaded' if ok else 'clips_failed'] += 1
+
+    def clip_metrics(self, clip):
+        with self._lock:
+            return dict(self.clips.get(self._key(clip), {}))
+
+    def prometheus_text(self, prefix='twitch_clips'):
+        """
+        :return: All metrics in Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, value in self.counters.items():
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+            for name, histogram in (('resolve_seconds', self.resolve_latency), ('ttfb_seconds', self.ttfb)):
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {count}')
+                lines.append(f'{prefix}_{name}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{prefix}_{name}_sum {histogram.total:.6f}")
+                lines.append(f"{prefix}_{name}_count {histogram.count}")
+
+        for name, read in self._gauges.items():
+            try:
+                value = read()
+            except Exception:
+                continue
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """
+        Atomically write the Prometheus text file (node_exporter textfile collector format).
+        """
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+
+    def write_trace(self, path):
+        """
+        Write recorded spans as Chrome trace JSON.
+        """
+        with self._lock:
+            events = list(self._events)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+class MetricsFileWriter:
+    """
+    Rewrites the Prometheus text file every few seconds while a batch runs.
+    """
+
+    def __init__(self, metrics, path, interval=5.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='MetricsFileWriter', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.metrics.write_prometheus(self.path)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.metrics.write_prometheus(self.path)
@@ -0,0 +1,223 @@
+import os
+import struct
+
+# Largest moov box kept in memory to read duration and resolution from; bigger ones are only size-checked
+MAX_MOOV_SIZE = 16 * 1024 * 1024
+# Top-level boxes a clip needs: file type, movie header (or fragments) and media data
+REQUIRED_BOXES = (b'ftyp', b'mdat')
+
+class InvalidMediaError(IOError):
+    """
+    Raised when downloaded data is not a complete MP4 file.
+    """
+
+def _describe(data):
+    """
+    Name what a non-MP4 payload most likely is, for error messages.
+    """
+    start = bytes(data[:64]).lstrip().lower()
+    if start.startswith((b'<!doctype', b'<html', b'<?xml', b'<')):
+        return 'an HTML/XML page'
+    if start.startswith((b'{', b'[')):
+        return 'a JSON document'
+    return 'not an MP4 file'
+
+def _is_box_type(box_type):
+    return all(0x20 <= c <= 0x7e for c in box_type)
+
+def _iter_boxes(data):
+    """
+    Yield (type, body) for the boxes in a fully buffered container body.
+    """
+    offset = 0
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1 and offset + 16 <= len(data):
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header or offset + size > len(data):
+            return
+        yield box_type, data[offset + header:offset + size]
+        offset += size
+
+def parse_moov(data):
+    """
+    Read duration and video resolution from the body of a moov box.
+
+    :return: Dictionary with duration (seconds), width and height, each only if present.
+    """
+    media = {}
+    for box_type, body in _iter_boxes(data):
+        if box_type == b'mvhd' and len(body) >= 20:
+            if body[0] == 1 and len(body) >= 32:
+                timescale, duration = struct.unpack_from('>IQ', body, 20)
+            else:
+                timescale, duration = struct.unpack_from('>II', body, 12)
+            if timescale:
+                media['duration'] = round(duration / timescale, 3)
+        elif box_type == b'trak' and 'width' not in media:
+            for child_type, child in _iter_boxes(body):
+                if child_type != b'tkhd':
+                    continue
+                # Width and height are 16.16 fixed point at the end of the box
+                offset = 88 if child[:1] == b'\x01' else 76
+                if len(child) >= offset + 8:
+                    width, height = struct.unpack_from('>II', child, offset)
+                    if width and height:
+                        media['width'], media['height'] = width >> 16, height >> 16
+    return media
+
+class Mp4Validator:
+    """
+    Checks an MP4 (ISO-BMFF) byte stream as it arrives.
+
+    Only top-level box headers are parsed; box bodies are skipped without
+    copying, except the moov box, which is kept to read duration and
+    resolution. feed() fails on the first bytes that cannot be MP4 (such as
+    an HTML error page), finish() fails if the stream ended inside a box or
+    required boxes are missing.
+    """
+
+    def __init__(self):
+        self.position = 0
+        self.boxes = []
+        self.media = {}
+        self._header = bytearray()
+        # Bytes left in the current box body; None while reading a header, -1 for a box running to the end
+        self._remaining = None
+        self._box_type = None
+        self._moov = None
+
+    def feed(self, data):
+        """
+        :param data: Next bytes of the stream (bytes, bytearray or memoryview).
+        :raises InvalidMediaError: If the stream is not a valid MP4 so far.
+        """
+        view = memoryview(data)
+        self.position += len(view)
+        while view:
+            if self._remaining is None:
+                view = self._read_header(view)
+                continue
+            if self._remaining == -1:
+                # Box extends to the end of the file (size 0): nothing more to parse
+                return
+            take = min(len(view), self._remaining)
+            if self._moov is not None:
+                self._moov += view[:take]
+            self._remaining -= take
+            view = view[take:]
+            if not self._remaining:
+                self._end_box()
+
+    @property
+    def in_body(self):
+        """
+        Bytes left in the current box body (the rest of the file for a box of size 0), or 0 between boxes.
+        """
+        if self._remaining is None:
+            return 0
+        return self._remaining if self._remaining > 0 else float('inf')
+
+    @property
+    def wants_body(self):
+        """
+        True while the current box body is parsed (moov), False if it may be skipped unseen.
+        """
+        return self._moov is not None
+
+    def skip(self, count):
+        """
+        Advance over at most count bytes of the current box body without reading them.
+        """
+        if self.wants_body:
+            raise ValueError("The moov box body must be fed, not skipped")
+        take = count if self._remaining == -1 else min(count, self._remaining or 0)
+        self.position += take
+        if self._remaining and self._remaining > 0:
+            self._remaining -= take
+            if not self._remaining:
+                self._end_box()
+
+    def _read_header(self, view):
+        need = 8 if len(self._header) < 8 or struct.unpack_from('>I', self._header)[0] != 1 else 16
+        take = min(len(view), need - len(self._header))
+        self._header += view[:take]
+        view = view[take:]
+        if len(self._header) < need:
+            return view
+        size, box_type = struct.unpack_from('>I4s', self._header)
+        if size == 1 and need == 8:
+            # 64-bit size follows the type
+            return view
+
+        start = self.position - len(view) - len(self._header)
+        if not self.boxes and box_type != b'ftyp':
+            raise InvalidMediaError(f"Payload is {_describe(self._header + view[:56])}, "
+                                    f"starting with {bytes(self._header[:8])!r}")
+        if not _is_box_type(box_type):
+            raise InvalidMediaError(f"Corrupt MP4: invalid box type {box_type!r} at byte {start}")
+        if size == 1:
+            size = struct.unpack_from('>Q', self._header, 8)[0]
+        if size and size < len(self._header):
+            raise InvalidMediaError(f"Corrupt MP4: box {box_type.decode('ascii')} at byte {start} has size {size}")
+
+        self.boxes.append((box_type.decode('ascii'), start, size or None))
+        self._box_type = box_type
+        self._remaining = size - len(self._header) if size else -1
+        self._moov = bytearray() if box_type == b'moov' and 0 < size <= MAX_MOOV_SIZE else None
+        self._header = bytearray()
+        if not self._remaining:
+            self._end_box()
+        return view
+
+    def _end_box(self):
+        if self._moov is not None:
+            self.media.update(parse_moov(self._moov))
+            self._moov = None
+        self._remaining = None
+        self._box_type = None
+
+    def finish(self):
+        """
+        Check that the stream ended cleanly at a box boundary with every required box present.
+
+        :return: Dictionary with the clip's duration, width and height, as far as found.
+        :raises InvalidMediaError: If the file is truncated or incomplete.
+        """
+        if self._header or (self._remaining is not None and self._remaining > 0):
+            box_type = self._box_type.decode('ascii') if self._box_type else 'header'
+            missing = self._remaining if self._remaining else 8 - len(self._header)
+            raise InvalidMediaError(f"Truncated MP4: stream ended at byte {self.position} inside {box_type}, "
+                                    f"{missing} bytes short")
+        types = {box[0].encode('ascii') for box in self.boxes}
+        missing = [box_type.decode('ascii') for box_type in REQUIRED_BOXES if box_type not in types]
+        if not types & {b'moov', b'moof'}:
+            missing.append('moov')
+        if missing:
+            raise InvalidMediaError(f"Incomplete MP4: no {', '.join(missing)} box in {self.position} bytes")
+        return dict(self.media)
+
+def validate_file(file_path):
+    """
+    Validate an MP4 file on disk by walking its top-level boxes. Only box
+    headers and the moov box are read, so this costs a few small reads
+    however large the file is.
+
+    :return: Dictionary with the clip's duration, width and height, as far as found.
+    :raises InvalidMediaError: If the file is truncated or not an MP4.
+    """
+    validator = Mp4Validator()
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        while validator.position < size:
+            if validator.in_body and not validator.wants_body:
+                validator.skip(size - validator.position)
+                f.seek(validator.position)
+            else:
+                # Headers arrive 8 bytes at a time; the moov body in one read
+                validator.feed(f.read(validator.in_body or 8))
+    return validator.finish()
@@ -0,0 +1,174 @@
+import logging
+import queue
+import threading
+from contextlib import nullcontext
+from concurrent.futures import Future
+from itertools import count, islice
+
+# Tells a download worker that the resolve stage has finished
+_DONE = object()
+
+class ClipPipeline:
+    """
+    Two-stage streaming pipeline: a small pool of resolver threads feeds a
+    bounded queue that a larger download stage drains.
+
+    Clips are pulled from the input iterator only as resolvers become free, and
+    resolvers block when the queue is full, so nothing is materialised up front.
+    Resolved clips wait in a priority queue, so when download slots are
+    scarce the clip with the lowest priority value (by default its order)
+    starts first, whatever order the resolvers finished in.
+    """
+
+    def __init__(self, resolve_batch, download, resolve_workers=5, download_workers=20,
+                 download_threads=None, batch_size=1, queue_size=None, cancel_event=None, logger=None,
+                 resolve_limiter=None, download_limiter=None, priority=None):
+        """
+        :param resolve_batch: Called with a list of clips, returns a list of (clip, download_url) pairs.
+                              Pairs with no download URL are dropped.
+        :param download: Called as download(clip, download_url). May return a Future, in which case
+                         the download counts as in flight until the future is done.
+        :param resolve_workers: Number of resolver threads.
+        :param download_workers: Maximum number of downloads in flight.
+        :param download_threads: Threads running download(); defaults to download_workers.
+        :param batch_size: Clips handed to resolve_batch at once.
+        :param queue_size: Resolved clips buffered between the stages; defaults to 2 * download_workers.
+        :param cancel_event: threading.Event that stops the pipeline when set.
+        :param logger: Logger object
+        :param resolve_limiter: Optional AdaptiveLimiter gating resolve_batch calls; resolve_workers
+                                threads are started and the limiter decides how many run at once.
+        :param download_limiter: Optional AdaptiveLimiter replacing the fixed download_workers cap.
+        :param priority: Callable returning a clip's download priority (lower first); defaults to the clip order.
+        """
+        self.resolve_batch = resolve_batch
+        self.download = download
+        self.resolve_workers = max(1, resolve_workers)
+        self.download_workers = max(1, download_workers)
+        self.download_threads = max(1, download_threads or self.download_workers)
+        self.batch_size = max(1, batch_size)
+        self.queue_size = queue_size or 2 * self.download_workers
+        self.cancel_event = cancel_event or threading.Event()
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self.resolve_limiter = resolve_limiter
+        self.download_limiter = download_limiter
+        self.priority = priority or (lambda clip: clip['order'])
+        # Live counts while run() is active, for progress and metrics
+        self.in_flight = 0
+        self._resolved = None
+        # Notified when in_flight drops to zero
+        self._count_changed = threading.Condition()
+
+    def _add_in_flight(self, delta):
+        with self._count_changed:
+            self.in_flight += delta
+            if not self.in_flight:
+                self._count_changed.notify_all()
+
+    @property
+    def queued(self):
+        """
+        Resolved clips waiting for a download slot.
+        """
+        return self._resolved.qsize() if self._resolved is not None else 0
+
+    def cancel(self):
+        """
+        Stop taking new clips. Downloads already in flight are allowed to finish.
+        """
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def run(self, clips):
+        """
+        Push every clip through both stages and wait until all downloads are done.
+
+        :param clips: Iterable of clip dictionaries, consumed lazily.
+        """
+        clips = iter(clips)
+        clips_lock = threading.Lock()
+        resolved = self._resolved = queue.PriorityQueue(maxsize=self.queue_size)
+        # Ties keep arrival order and keep the clips themselves out of comparisons
+        sequence = count()
+        in_flight = self.download_limiter or threading.BoundedSemaphore(self.download_workers)
+
+        def next_batch():
+            with clips_lock:
+                return list(islice(clips, self.batch_size))
+
+        def put(item):
+            # Blocks while the download stage is saturated (backpressure)
+            while not self.cancelled:
+                try:
+                    resolved.put((self.priority(item[0]), next(sequence), item), timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        resolve_slot = self.resolve_limiter or nullcontext()
+
+        def resolve_worker():
+            while not self.cancelled:
+                # Take clips off the input only once a resolve slot is free
+                with resolve_slot:
+                    batch = next_batch()
+                    if not batch:
+                        return
+                    try:
+                        results = self.resolve_batch(batch)
+                    except Exception as e:
+                        self.logger.error(f"Error resolving clips: {str(e)}")
+                        continue
+                for clip, download_url in results:
+                    if download_url and not put((clip, download_url)):
+                        return
+
+        def release():
+            self._add_in_flight(-1)
+            in_flight.release()
+
+        def download_worker():
+            while True:
+                item = resolved.get()[2]
+                if item is _DONE:
+                    return
+                if self.cancelled:
+                    continue
+
+                in_flight.acquire()
+                self._add_in_flight(1)
+                try:
+                    result = self.download(*item)
+                except Exception as e:
+                    self.logger.error(f"Error downloading clip: {str(e)}")
+                    result = None
+
+                if isinstance(result, Future):
+                    # Only counted, so finished futures are not kept for the rest of the run
+                    result.add_done_callback(lambda _: release())
+                else:
+                    release()
+
+        downloaders = [
+            threading.Thread(target=download_worker, name=f"ClipDownload-{i}", daemon=True)
+            for i in range(self.download_threads)
+        ]
+        resolvers = [
+            threading.Thread(target=resolve_worker, name=f"ClipResolve-{i}", daemon=True)
+            for i in range(self.resolve_workers)
+        ]
+        for thread in downloaders + resolvers:
+            thread.start()
+
+        for thread in resolvers:
+            thread.join()
+        for _ in downloaders:
+            resolved.put((float('inf'), next(sequence), _DONE))
+        for thread in downloaders:
+            thread.join()
+        # Downloads handed off as futures finish on other threads
+        with self._count_changed:
+            self._count_changed.wait_for(lambda: not self.in_flight)
@@ -0,0 +1,112 @@
+import threading
+import time
+
+# Clip states in the order a clip normally goes through them
+QUEUED = 'queued'
+RESOLVING = 'resolving'
+RESOLVED = 'resolved'
+DOWNLOADING = 'downloading'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+class ClipProgress:
+    """
+    Thread-safe per-clip progress for a batch: state, bytes and speed.
+
+    Workers only record state changes. Byte counts are read from each clip's
+    live transfer stats dictionary when a view polls, so progress costs
+    nothing per chunk no matter how often the transfer loop runs.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._dirty = set()
+        self._active = set()
+        self._counts = {}
+        self._finished_bytes = 0
+        self._lock = threading.Lock()
+
+    def set_state(self, clip, state, stats=None, error=None):
+        """
+        :param clip: Clip dictionary.
+        :param state: One of the state constants of this module.
+        :param stats: Live transfer stats dictionary of the download (see save_clip).
+        :param error: Failure message for FAILED.
+        """
+        now = time.monotonic()
+        # Orders repeat across batches sharing a job queue; order and player name the file
+        key = (clip['order'], clip['player'])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {
+                    'order': clip['order'],
+                    'player': clip['player'],
+                    'stats': None,
+                    'started': None,
+                    'finished': None,
+                    'error': None,
+                    'state': None,
+                }
+            if entry['state'] is not None:
+                self._counts[entry['state']] -= 1
+            self._counts[state] = self._counts.get(state, 0) + 1
+            entry['state'] = state
+            if stats is not None:
+                entry['stats'] = stats
+            if state == DOWNLOADING:
+                entry['started'] = now
+                self._active.add(key)
+            elif state in (DONE, FAILED, SKIPPED):
+                entry['finished'] = now
+                entry['error'] = str(error) if error is not None else None
+                self._active.discard(key)
+                self._finished_bytes += (entry['stats'] or {}).get('bytes', 0)
+            self._dirty.add(key)
+
+    @staticmethod
+    def _row(entry, now):
+        stats = entry['stats'] or {}
+        size = stats.get('bytes', 0)
+        speed = None
+        if entry['started'] is not None:
+            elapsed = (entry['finished'] or now) - entry['started']
+            speed = size / elapsed if elapsed > 0 else None
+        return {'order': entry['order'], 'player': entry['player'], 'state': entry['state'],
+                'bytes': size, 'speed': speed, 'error': entry['error']}
+
+    def get(self, order, player):
+        """
+        :return: Current row for a clip, or None if it has no progress yet.
+        """
+        with self._lock:
+            entry = self._entries.get((order, player))
+            return self._row(entry, time.monotonic()) if entry else None
+
+    def take_changes(self):
+        """
+        Rows changed since the last call, plus every clip still downloading.
+
+        :return: List of row dictionaries (order, player, state, bytes, speed, error).
+        """
+        now = time.monotonic()
+        with self._lock:
+            keys = self._dirty | self._active
+            self._dirty = set()
+            return [self._row(self._entries[key], now) for key in keys]
+
+    def totals(self):
+        """
+        :return: Dictionary with the number of clips per state, bytes downloaded and the
+                 current combined speed of running downloads.
+        """
+        now = time.monotonic()
+        with self._lock:
+            totals = dict(self._counts, bytes=self._finished_bytes, speed=0.0)
+            # Only running downloads are walked, so this stays cheap for huge batches
+            for key in self._active:
+                row = self._row(self._entries[key], now)
+                totals['bytes'] += row['bytes']
+                totals['speed'] += row['speed'] or 0.0
+        return totals
@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+from downloader.resolvers import ClipResolver, get_clip_slug
+
+# Entries are treated as stale this many seconds before the signed URL expires
+EXPIRY_MARGIN = 300
+
+def get_url_expiry(download_url):
+    """
+    Read the expiry time out of a signed clip URL.
+
+    Twitch clip URLs carry a JSON access token in the "token" query parameter
+    with an "expires" Unix timestamp.
+
+    :param download_url: Signed media URL.
+    :return: Expiry as a Unix timestamp, or None if the URL is not signed.
+    """
+    token = parse_qs(urlparse(download_url).query).get('token')
+    if not token:
+        return None
+    try:
+        expires = json.loads(token[0]).get('expires')
+    except (ValueError, AttributeError):
+        return None
+    return float(expires) if isinstance(expires, (int, float)) else None
+
+class ResolveCache:
+    """
+    On-disk SQLite cache mapping clip slug to its resolved media URL and metadata.
+
+    Entries expire with their signed URL (or after default_ttl for unsigned
+    URLs), and the least recently used entries are evicted past max_entries.
+    """
+
+    def __init__(self, path, max_entries=20000, default_ttl=6 * 3600, logger=None):
+        """
+        :param path: SQLite database file.
+        :param max_entries: Number of entries kept before LRU eviction.
+        :param default_ttl: Lifetime in seconds of URLs without a signed expiry.
+        :param logger: Logger object
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS resolved ('
+            'slug TEXT PRIMARY KEY, download_url TEXT NOT NULL, metadata TEXT, '
+            'expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS resolved_last_used ON resolved (last_used)')
+        self._conn.commit()
+
+    def get(self, slug, count=True):
+        """
+        :param slug: Clip slug.
+        :param count: Record the lookup in the hit/miss counters.
+        :return: Dictionary with download_url and metadata, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT download_url, metadata, expires_at FROM resolved WHERE slug = ?', (slug,)
+            ).fetchone()
+            if row is None or row[2] <= now:
+                if row is not None:
+                    self._conn.execute('DELETE FROM resolved WHERE slug = ?', (slug,))
+                    self._conn.commit()
+                self.misses += count
+                return None
+
+            self._conn.execute('UPDATE resolved SET last_used = ? WHERE slug = ?', (now, slug))
+            self._conn.commit()
+            self.hits += count
+        return {'download_url': row[0], 'metadata': json.loads(row[1]) if row[1] else None}
+
+    def put(self, slug, download_url, metadata=None):
+        """
+        Store a resolved clip, evicting the least recently used entries if the cache is full.
+
+        :param slug: Clip slug.
+        :param download_url: Resolved media URL.
+        :param metadata: Optional JSON-serialisable clip metadata.
+        """
+        now = time.time()
+        expires_at = get_url_expiry(download_url)
+        expires_at = expires_at - EXPIRY_MARGIN if expires_at else now + self.default_ttl
+        if expires_at <= now:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO resolved (slug, download_url, metadata, expires_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (slug, download_url, json.dumps(metadata) if metadata else None, expires_at, now)
+            )
+            self._conn.execute(
+                'DELETE FROM resolved WHERE slug IN ('
+                'SELECT slug FROM resolved ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def delete(self, slug):
+        """
+        Remove one entry, e.g. a URL that turned out to serve something other than the clip.
+        """
+        with self._lock:
+            self._conn.execute('DELETE FROM resolved WHERE slug = ?', (slug,))
+            self._conn.commit()
+
+    def purge(self):
+        """
+        Remove every entry.
+        """
+        with self._lock:
+            self._conn.execute('DELETE FROM resolved')
+            self._conn.commit()
+        self.logger.info("Resolve cache purged")
+
+    def close(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM resolved WHERE expires_at <= ?', (time.time(),))
+            self._conn.commit()
+            self._conn.close()
+
+class CachedResolver(ClipResolver):
+    """
+    Wraps another resolver and skips it for clips with a fresh cache entry.
+    """
+
+    def __init__(self, resolver, cache, logger=None):
+        self.resolver = resolver
+        self.cache = cache
+        self.name = resolver.name
+        self.batch_size = resolver.batch_size
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, clip_url):
+        slug = get_clip_slug(clip_url)
+        if not slug:
+            return None, None
+        with self._lock:
+            if slug in self._pending:
+                return slug, self._pending.pop(slug)
+        return slug, self.cache.get(slug)
+
+    def prefetch(self, clip_urls):
+        misses = []
+        for clip_url in clip_urls:
+            slug, entry = self._lookup(clip_url)
+            if entry is None:
+                misses.append(clip_url)
+            if slug:
+                # Keep the result for the resolve() call that follows
+                with self._lock:
+                    self._pending[slug] = entry
+        if misses:
+            self.resolver.prefetch(misses)
+
+    def resolve(self, clip_url):
+        slug, entry = self._lookup(clip_url)
+        if entry is not None:
+            return entry['download_url']
+
+        download_url = self.resolver.resolve(clip_url)
+        if download_url and slug:
+            metadata = None
+            if hasattr(self.resolver, 'get_metadata'):
+                metadata = self.resolver.get_metadata(clip_url)
+            self.cache.put(slug, download_url, metadata)
+        return download_url
+
+    def invalidate(self, clip_url):
+        slug = get_clip_slug(clip_url)
+        if slug:
+            with self._lock:
+                self._pending.pop(slug, None)
+            self.cache.delete(slug)
+        self.resolver.invalidate(clip_url)
+
+    def get_metadata(self, clip_url):
+        slug = get_clip_slug(clip_url)
+        entry = self.cache.get(slug, count=False) if slug else None
+        if entry is not None and entry['metadata']:
+            return entry['metadata']
+        if hasattr(self.resolver, 'get_metadata'):
+            return self.resolver.get_metadata(clip_url)
+        return None
+
+    @property
+    def browsers_alive(self):
+        return self.resolver.browsers_alive
+
+    def trim_browsers(self, keep):
+        self.resolver.trim_browsers(keep)
+
+    def close(self):
+        self.logger.info(f"Resolve cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        self.resolver.close()
+        self.cache.close()
+
+def open_resolve_cache(logger=None):
+    """
+    Open the resolve cache in the application data folder.
+
+    :param logger: Logger object
+    :return: ResolveCache instance.
+    """
+    from utils.config import get_app_dir
+    return ResolveCache(os.path.join(get_app_dir('cache'), 'resolve_cache.sqlite'), logger=logger)
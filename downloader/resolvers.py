@@ -0,0 +1,414 @@
+import json
+import logging
+import re
+import threading
+from urllib.parse import quote
+from downloader.file_manager import create_session
+
+# Media URLs embedded anywhere in the page (inline scripts, preload hints, ...)
+MEDIA_URL_PATTERN = re.compile(r'https?://[^\s"\'<>\\]+?\.mp4(?:\?[^\s"\'<>\\]*)?')
+
+# Keys that hold the media URL in embedded JSON (JSON-LD, Apollo state, ...)
+MEDIA_URL_KEYS = ('contentUrl', 'sourceURL', 'videoUrl', 'video_url')
+
+META_PROPERTIES = ('og:video:secure_url', 'og:video:url', 'og:video', 'twitter:player:stream')
+
+GQL_URL = 'https://gql.twitch.tv/gql'
+GQL_CLIENT_ID = 'kimne78kx3ncx6brgo4mv6wki5h1ko'
+CLIP_ACCESS_TOKEN_HASH = '36b89d2507fce29e5ca551df756d27c1cfe079e2609642b4390aa4c35796eb11'
+
+# Twitch rejects GQL batches with more than 35 operations
+GQL_MAX_BATCH_SIZE = 35
+
+CLIP_SLUG_PATTERNS = (
+    re.compile(r'twitch\.tv/[^/]+/clip/([\w-]+)'),
+    re.compile(r'clips\.twitch\.tv/(?:embed\?clip=)?([\w-]+)'),
+    re.compile(r'/clip/([\w-]+)'),
+)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml',
+}
+
+def _find_in_json(data):
+    if isinstance(data, dict):
+        for key in MEDIA_URL_KEYS:
+            value = data.get(key)
+            if isinstance(value, str) and value.startswith('http'):
+                return value
+        data = list(data.values())
+    if isinstance(data, list):
+        for item in data:
+            found = _find_in_json(item)
+            if found:
+                return found
+    return None
+
+def extract_media_url(html):
+    """
+    Pull the clip media URL out of a clip page without rendering it.
+
+    Looks at <video>/<source> tags, OpenGraph/Twitter meta tags and embedded
+    JSON, then falls back to any .mp4 URL in the page source.
+
+    :param html: Page source.
+    :return: Media URL, or None if the page does not contain one.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    for tag in soup.find_all(['video', 'source']):
+        src = tag.get('src')
+        if src and src.startswith('http'):
+            return src
+
+    for prop in META_PROPERTIES:
+        meta = soup.find('meta', attrs={'property': prop}) or soup.find('meta', attrs={'name': prop})
+        if meta and meta.get('content', '').startswith('http'):
+            return meta['content']
+
+    for script in soup.find_all('script', attrs={'type': ['application/ld+json', 'application/json']}):
+        try:
+            found = _find_in_json(json.loads(script.string or ''))
+        except ValueError:
+            continue
+        if found:
+            return found
+
+    match = MEDIA_URL_PATTERN.search(html)
+    if match:
+        return match.group(0).replace('\\u0026', '&').replace('&amp;', '&')
+    return None
+
+def get_clip_slug(clip_url):
+    """
+    Extract the clip slug from a clip page URL.
+
+    :param clip_url: URL of the Twitch clip page.
+    :return: Clip slug, or None if the URL is not a clip URL.
+    """
+    for pattern in CLIP_SLUG_PATTERNS:
+        match = pattern.search(clip_url)
+        if match:
+            return match.group(1)
+    return None
+
+class ClipResolver:
+    """
+    Turns a Twitch clip page URL into a downloadable media URL.
+    """
+    name = 'base'
+    # Clips handed to prefetch() at once
+    batch_size = 1
+
+    def prefetch(self, clip_urls):
+        """
+        Resolve many clips ahead of time. Only batching resolvers do anything here.
+
+        :param clip_urls: Iterable of clip page URLs.
+        """
+        pass
+
+    def resolve(self, clip_url):
+        """
+        :param clip_url: URL of the Twitch clip page.
+        :return: Download URL of the clip, or None if the clip has none (e.g. it was deleted).
+        :raises: Request or browser errors, so callers can retry transient ones.
+        """
+        raise NotImplementedError
+
+    def invalidate(self, clip_url):
+        """
+        Forget anything remembered about a clip, e.g. after its media URL served something other than
+        the clip, so the next resolve() looks it up afresh.
+
+        :param clip_url: URL of the Twitch clip page.
+        """
+        pass
+
+    @property
+    def browsers_alive(self):
+        """
+        Number of headless browsers this resolver keeps open.
+        """
+        return 0
+
+    def trim_browsers(self, keep):
+        """
+        Quit idle browsers until at most ``keep`` are open.
+        """
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class HttpResolver(ClipResolver):
+    """
+    Browser-free resolver: fetches the clip page over a pooled Session and parses it.
+    """
+    name = 'http'
+
+    def __init__(self, session=None, timeout=10, pool_size=10, logger=None):
+        self.session = session or create_session(pool_size)
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+
+    def resolve(self, clip_url):
+        response = self.session.get(clip_url, timeout=self.timeout)
+        response.raise_for_status()
+        return extract_media_url(response.text)
+
+    def close(self):
+        self.session.close()
+
+class SeleniumResolver(ClipResolver):
+    """
+    Resolver that renders the clip page in a pooled headless Chrome.
+
+    In lean mode the pool's browsers must be lean (create_driver(lean=True)):
+    the URL is taken from the player's media request instead of waiting for
+    the rendered <video> element.
+    """
+    name = 'selenium'
+
+    def __init__(self, driver_pool, lean=False):
+        self.driver_pool = driver_pool
+        self.lean = lean
+
+    def resolve(self, clip_url):
+        from downloader.twitch_parser import get_clip_download_url, get_clip_download_url_lean
+
+        with self.driver_pool.driver() as driver:
+            if self.lean:
+                return get_clip_download_url_lean(clip_url, driver, logger=self.driver_pool.logger)
+            return get_clip_download_url(clip_url, driver, logger=self.driver_pool.logger)
+
+    @property
+    def browsers_alive(self):
+        return self.driver_pool.alive
+
+    def trim_browsers(self, keep):
+        self.driver_pool.trim(keep)
+
+    def close(self):
+        self.driver_pool.close()
+
+class FallbackResolver(ClipResolver):
+    """
+    Tries each resolver in turn and returns the first URL found.
+    """
+    name = 'auto'
+
+    def __init__(self, *resolvers, logger=None):
+        self.resolvers = resolvers
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+
+    def resolve(self, clip_url):
+        error = None
+        for resolver in self.resolvers:
+            try:
+                download_url = resolver.resolve(clip_url)
+            except Exception as e:
+                self.logger.warning(f"{resolver.name} resolve failed for {clip_url}: {str(e)}")
+                error = e
+                continue
+            if download_url:
+                return download_url
+            self.logger.info(f"{resolver.name} resolver found no URL for {clip_url}")
+        # A resolver that errored may still find the clip on a retry
+        if error is not None:
+            raise error
+        return None
+
+    def invalidate(self, clip_url):
+        for resolver in self.resolvers:
+            resolver.invalidate(clip_url)
+
+    @property
+    def browsers_alive(self):
+        return sum(resolver.browsers_alive for resolver in self.resolvers)
+
+    def trim_browsers(self, keep):
+        for resolver in self.resolvers:
+            resolver.trim_browsers(keep)
+
+    def close(self):
+        for resolver in self.resolvers:
+            resolver.close()
+
+class GqlResolver(ClipResolver):
+    """
+    Resolves clips through batched GraphQL POSTs, many slugs per round trip.
+
+    Each resolved clip is kept as a metadata dict with the playback URL, the
+    signed access token and the available quality variants.
+    """
+    name = 'gql'
+
+    def __init__(self, session=None, batch_size=GQL_MAX_BATCH_SIZE, gql_url=GQL_URL,
+                 client_id=GQL_CLIENT_ID, timeout=10, logger=None):
+        self.session = session or create_session()
+        self.batch_size = max(1, batch_size)
+        self.gql_url = gql_url
+        self.client_id = client_id
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self._metadata = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, clip_urls):
+        slugs = []
+        seen = set()
+        for clip_url in clip_urls:
+            slug = get_clip_slug(clip_url)
+            if slug and slug not in seen and slug not in self._metadata:
+                seen.add(slug)
+                slugs.append(slug)
+
+        for start in range(0, len(slugs), self.batch_size):
+            self.resolve_slugs(slugs[start:start + self.batch_size])
+
+    def resolve_slugs(self, slugs, raise_errors=False):
+        """
+        Resolve one batch of slugs with a single POST.
+
+        Results of a failed request are not remembered, so later lookups try again.
+
+        :param slugs: List of clip slugs, at most batch_size long.
+        :param raise_errors: Raise request errors instead of logging them.
+        :return: Dictionary mapping slug to clip metadata (None for clips that failed or do not exist).
+        """
+        operations = [{
+            'operationName': 'VideoAccessToken_Clip',
+            'variables': {'slug': slug},
+            'extensions': {
+                'persistedQuery': {'version': 1, 'sha256Hash': CLIP_ACCESS_TOKEN_HASH}
+            },
+        } for slug in slugs]
+
+        results = {}
+        try:
+            response = self.session.post(
+                self.gql_url, json=operations, timeout=self.timeout,
+                headers={'Client-ID': self.client_id}
+            )
+            response.raise_for_status()
+            for slug, item in zip(slugs, response.json()):
+                results[slug] = parse_clip_access_token(slug, item)
+        except Exception as e:
+            if raise_errors:
+                raise
+            self.logger.warning(f"GQL batch of {len(slugs)} clips failed: {str(e)}")
+            return dict.fromkeys(slugs)
+
+        with self._lock:
+            self._metadata.update(results)
+        self.logger.info(f"Resolved {sum(1 for m in results.values() if m)}/{len(slugs)} clips in one GQL batch")
+        return results
+
+    def get_metadata(self, clip_url):
+        """
+        :param clip_url: URL of the Twitch clip page.
+        :return: Clip metadata dict, or None if the clip could not be resolved.
+        """
+        slug = get_clip_slug(clip_url)
+        if not slug:
+            return None
+        if slug not in self._metadata:
+            self.resolve_slugs([slug], raise_errors=True)
+        return self._metadata.get(slug)
+
+    def resolve(self, clip_url):
+        metadata = self.get_metadata(clip_url)
+        return metadata['playback_url'] if metadata else None
+
+    def invalidate(self, clip_url):
+        slug = get_clip_slug(clip_url)
+        with self._lock:
+            self._metadata.pop(slug, None)
+
+    def close(self):
+        self.session.close()
+
+def parse_clip_access_token(slug, item):
+    """
+    Turn one VideoAccessToken_Clip response into clip metadata.
+
+    :param slug: Clip slug the operation was sent for.
+    :param item: Decoded JSON response for that operation.
+    :return: Metadata dict, or None if the clip does not exist.
+    """
+    clip = (item.get('data') or {}).get('clip')
+    if not clip or not clip.get('videoQualities'):
+        return None
+
+    token = clip.get('playbackAccessToken') or {}
+    qualities = sorted(
+        ({
+            'quality': q.get('quality'),
+            'frame_rate': q.get('frameRate'),
+            'source_url': q.get('sourceURL'),
+        } for q in clip['videoQualities'] if q.get('sourceURL')),
+        key=lambda q: int(q['quality']) if str(q['quality']).isdigit() else 0,
+        reverse=True
+    )
+    if not qualities:
+        return None
+
+    signature = token.get('signature', '')
+    value = token.get('value', '')
+    playback_url = qualities[0]['source_url']
+    if signature or value:
+        separator = '&' if '?' in playback_url else '?'
+        playback_url = f"{playback_url}{separator}sig={signature}&token={quote(value)}"
+
+    return {
+        'slug': slug,
+        'playback_url': playback_url,
+        'signature': signature,
+        'token': value,
+        'qualities': qualities,
+    }
+
+RESOLVERS = ('auto', 'http', 'selenium', 'gql')
+
+def create_resolver(name='auto', max_workers=5, logger=None, batch_size=GQL_MAX_BATCH_SIZE, lean_browser=False):
+    """
+    Build a resolver by name.
+
+    :param name: 'http', 'selenium', 'gql', or 'auto' (HTTP first, Selenium as fallback).
+    :param max_workers: Number of concurrent workers that will share the resolver.
+    :param logger: Logger object
+    :param batch_size: Slugs per GQL request for the 'gql' resolver.
+    :param lean_browser: Run Selenium in lean mode: block heavy resources and take the media URL
+                         from network events.
+    :return: ClipResolver instance.
+    """
+    if name not in RESOLVERS:
+        raise ValueError(f"Unknown resolver: {name}")
+
+    def selenium_resolver():
+        from downloader.driver_pool import DriverPool, create_driver
+        if lean_browser:
+            return SeleniumResolver(DriverPool(max_workers, lambda: create_driver(lean=True), logger=logger),
+                                    lean=True)
+        return SeleniumResolver(DriverPool(max_workers, logger=logger))
+
+    if name == 'gql':
+        return GqlResolver(batch_size=batch_size, logger=logger)
+    if name == 'http':
+        return HttpResolver(pool_size=max_workers, logger=logger)
+    if name == 'selenium':
+        return selenium_resolver()
+    # Browsers are only started if the HTTP resolver actually misses
+    return FallbackResolver(HttpResolver(pool_size=max_workers, logger=logger), selenium_resolver(), logger=logger)
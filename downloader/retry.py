@@ -0,0 +1,312 @@
+import asyncio
+import errno
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlparse
+from downloader.concurrency import get_status_code, is_throttling_error
+
+# Statuses worth another attempt; every other 4xx means the request itself is wrong
+TRANSIENT_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+# Local failures that another attempt will not fix
+PERMANENT_ERRNOS = (errno.ENOSPC, errno.EACCES, errno.EROFS, errno.ENAMETOOLONG)
+
+class CircuitOpenError(IOError):
+    """
+    Raised instead of contacting a host whose circuit breaker is open.
+    """
+
+    def __init__(self, host, retry_in):
+        super().__init__(f"Circuit open for {host}, retry in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+def is_transient(error):
+    """
+    Classify a failure: True for errors another attempt may fix (timeouts,
+    dropped connections, 429/5xx, truncated transfers), False for permanent
+    ones (404, bad URLs, full disk). Invalid media is not retried here: the
+    same URL would serve the same payload, so callers resolve the clip again.
+
+    :param error: Exception raised by a resolve or transfer attempt.
+    """
+    if isinstance(error, CircuitOpenError):
+        return True
+    status = get_status_code(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    if is_throttling_error(error):
+        return True
+    if isinstance(error, OSError) and error.errno in PERMANENT_ERRNOS:
+        return False
+    # requests, aiohttp and Selenium name their connection-level errors consistently
+    names = ' '.join(cls.__name__ for cls in type(error).__mro__)
+    if any(name in names for name in ('Connection', 'Payload', 'ChunkedEncoding', 'IncompleteDownload',
+                                      'WebDriverException', 'Disconnected')):
+        return True
+    return False
+
+def get_retry_after(error):
+    """
+    :return: Seconds the server asked us to wait in a Retry-After header, or None.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(error, 'headers', None) or {}
+    value = headers.get('Retry-After') if hasattr(headers, 'get') else None
+    if value and str(value).isdigit():
+        return float(value)
+    return None
+
+def get_host(url):
+    return urlparse(url).netloc or url
+
+class CircuitBreaker:
+    """
+    Stops requests to a host after repeated transient failures.
+
+    Closed: requests pass. After ``failure_threshold`` consecutive failures it
+    opens and holds requests back for ``reset_timeout`` seconds, then lets a
+    single probe through (half-open); the probe's outcome closes or re-opens it.
+    """
+
+    def __init__(self, host, failure_threshold=5, reset_timeout=30.0, logger=None):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self.failures = 0
+        # Times the breaker opened since the host last answered
+        self.trips = 0
+        self.opened_at = None
+        # When the breaker first opened since the host last answered
+        self.down_since = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def wait_time(self):
+        """
+        Claim permission to send a request.
+
+        :return: 0 if the request may go ahead, otherwise seconds until the breaker lets a probe through.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if not self._probing:
+                self._probing = True
+                return 0
+            # While a probe is out, check back shortly
+            return min(self.reset_timeout, 1.0) or 1.0
+
+    @property
+    def outage(self):
+        """
+        Seconds the host has been considered down, 0 while it answers.
+        """
+        down_since = self.down_since
+        return time.monotonic() - down_since if down_since is not None else 0
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                self.logger.info(f"Circuit for {self.host} closed")
+            self.failures = 0
+            self.trips = 0
+            self.opened_at = None
+            self.down_since = None
+            self._probing = False
+
+    def release_probe(self):
+        """
+        Give up the probe slot without a verdict, e.g. when the probing operation was cancelled,
+        so the next operation probes instead.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        """
+        :return: True if this failure opened (or re-opened) the breaker.
+        """
+        with self._lock:
+            self.failures += 1
+            if self._probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.logger.warning(f"Circuit for {self.host} opened after {self.failures} failures, "
+                                    f"pausing requests for {self.reset_timeout:.0f}s")
+                self.opened_at = time.monotonic()
+                if self.down_since is None:
+                    self.down_since = self.opened_at
+                self.trips += 1
+                self._probing = False
+                return True
+            return False
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter plus one circuit breaker per host.
+
+    The same policy object is shared by every worker of a batch so the
+    breakers see all traffic to a host. While a host's breaker is open,
+    operations wait for it instead of failing, and failures that (re-)open
+    it do not use up attempts: a host outage holds the batch back until a
+    probe gets through. Only once the host has been down for ``max_outage``
+    seconds do the waiting operations give up.
+    """
+
+    def __init__(self, attempts=4, base_delay=1.0, max_delay=30.0, failure_threshold=5, reset_timeout=30.0,
+                 max_outage=600.0, cancel_event=None, logger=None):
+        """
+        :param attempts: Tries per operation, including the first.
+        :param base_delay: Backoff ceiling in seconds after the first failure; doubles per attempt.
+        :param max_delay: Upper bound on a single backoff.
+        :param failure_threshold: Consecutive transient failures that open a host's breaker.
+        :param reset_timeout: Seconds an open breaker waits before letting a probe through.
+        :param max_outage: Seconds a host may stay down before operations waiting for it fail.
+        :param cancel_event: threading.Event that aborts pending backoffs when set.
+        :param logger: Logger object
+        """
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_outage = max_outage
+        self.cancel_event = cancel_event or threading.Event()
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url):
+        """
+        :return: The CircuitBreaker of the host serving url.
+        """
+        host = get_host(url)
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(host, self.failure_threshold, self.reset_timeout, self.logger)
+            return self._breakers[host]
+
+    def backoff(self, attempt, error=None):
+        """
+        :param attempt: Number of failed attempts so far (1 after the first failure).
+        :param error: The failure, to honour a Retry-After header.
+        :return: Seconds to wait before the next attempt.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def _breaker_wait(self, breaker):
+        """
+        :return: Seconds to wait for the host's breaker before trying, 0 to go ahead.
+        :raises CircuitOpenError: Once the host has been down for longer than max_outage.
+        """
+        wait = breaker.wait_time()
+        if wait and breaker.outage >= self.max_outage:
+            raise CircuitOpenError(breaker.host, wait)
+        return wait
+
+    def _after_failure(self, error, attempt, breaker, stats, description):
+        """
+        Book-keeping after a failed attempt.
+
+        :return: (delay, charged): seconds to wait before retrying, or None to give up and re-raise,
+                 and whether the attempt counts against the attempt limit.
+        """
+        transient = is_transient(error)
+        if transient:
+            # A failure that opens the breaker blames the host, not this operation
+            charged = not breaker.record_failure()
+        else:
+            # The host answered (a 404, a page instead of the clip) or the fault is ours: no outage either way,
+            # and a probe that ends like this must not leave the breaker waiting for a verdict
+            breaker.record_success()
+            charged = True
+        if stats is not None and is_throttling_error(error):
+            stats['throttled'] = stats.get('throttled', 0) + 1
+        if not transient or (charged and attempt >= self.attempts) or self.cancel_event.is_set():
+            return None, charged
+
+        delay = self.backoff(attempt, error)
+        if stats is not None:
+            stats['retries'] = stats.get('retries', 0) + 1
+        self.logger.info(f"{description} failed ({str(error)}), attempt {attempt}/{self.attempts}, "
+                         f"retrying in {delay:.1f}s")
+        return delay, charged
+
+    def run(self, func, url, stats=None, description=None):
+        """
+        Call func() until it succeeds, fails permanently or runs out of attempts.
+
+        :param func: Callable doing one attempt.
+        :param url: URL the attempt talks to; selects the circuit breaker.
+        :param stats: Optional dictionary whose 'retries' and 'throttled' counters are updated.
+        :param description: What is being attempted, for log messages.
+        :return: Whatever func() returns.
+        :raises: The last error once retrying is pointless.
+        """
+        breaker = self.breaker(url)
+        attempt = 1
+        while True:
+            wait = self._breaker_wait(breaker)
+            if wait:
+                if self.cancel_event.wait(wait):
+                    raise CircuitOpenError(breaker.host, wait)
+                continue
+            try:
+                result = func()
+            except Exception as e:
+                delay, charged = self._after_failure(e, attempt, breaker, stats, description or url)
+                if delay is None or self.cancel_event.wait(delay):
+                    raise
+                attempt += charged
+                continue
+            except BaseException:
+                # Interrupted mid-attempt (e.g. KeyboardInterrupt): let another operation probe
+                breaker.release_probe()
+                raise
+            breaker.record_success()
+            return result
+
+    async def run_async(self, func, url, stats=None, description=None):
+        """
+        Coroutine version of run(); func() must return an awaitable.
+        """
+        breaker = self.breaker(url)
+        attempt = 1
+        while True:
+            wait = self._breaker_wait(breaker)
+            if wait:
+                await asyncio.sleep(wait)
+                if self.cancel_event.is_set():
+                    raise CircuitOpenError(breaker.host, wait)
+                continue
+            try:
+                result = await func()
+            except Exception as e:
+                delay, charged = self._after_failure(e, attempt, breaker, stats, description or url)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                if self.cancel_event.is_set():
+                    raise
+                attempt += charged
+                continue
+            except BaseException:
+                # Cancelled mid-attempt (e.g. asyncio.CancelledError): let another operation probe
+                breaker.release_probe()
+                raise
+            breaker.record_success()
+            return result
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import threading
+import time
+
+# Weight of each clip relative to the one ahead of it, with the 'order' policy
+ORDER_DECAY = 0.5
+# Smallest weight, so clips far down the order still make progress
+MIN_WEIGHT = 1 / 32
+# Seconds of budget that may be banked while no transfer wants it
+BURST_SECONDS = 0.25
+# Longest sleep of a waiting transfer before it looks at the budget again
+WAIT_SLICE = 0.05
+
+# The ready prefix is logged at INFO every this many clips, at DEBUG otherwise
+READY_LOG_EVERY = 50
+
+def clip_priority(clip):
+    """
+    :return: Scheduling priority of a clip, lower first: its 'priority' if set, otherwise its order.
+    """
+    priority = clip.get('priority')
+    return priority if priority is not None else clip['order']
+
+class BandwidthShare:
+    """
+    One transfer's claim on a BandwidthLimiter. Call consume() after each read.
+    """
+
+    def __init__(self, limiter, priority):
+        self.limiter = limiter
+        self.priority = priority
+        # Relative claim on the budget among the transfers waiting for it, set by the limiter
+        self.weight = 1.0
+        # Virtual finish time of the bytes granted so far, and the tag of the bytes waiting for a grant
+        self._finish = 0.0
+        self._tag = None
+
+    def consume(self, size):
+        """
+        Pay for size bytes just read, waiting until the budget allows it.
+        """
+        try:
+            while True:
+                delay = self.limiter._take(self, size)
+                if not delay:
+                    return
+                # Short sleeps, so rate changes and transfers finishing ahead of this one are seen quickly
+                time.sleep(min(delay, WAIT_SLICE))
+        finally:
+            self.limiter._withdraw(self)
+
+    async def consume_async(self, size):
+        try:
+            while True:
+                delay = self.limiter._take(self, size)
+                if not delay:
+                    return
+                await asyncio.sleep(min(delay, WAIT_SLICE))
+        finally:
+            self.limiter._withdraw(self)
+
+    def close(self):
+        self.limiter._remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class BandwidthLimiter:
+    """
+    Global bandwidth budget shared by every running transfer.
+
+    All transfers draw from one token bucket refilled at the budget rate, so
+    bandwidth one transfer does not use (e.g. because its server is slow) is
+    left to the others. Priority only decides who is served first when
+    several transfers wait for tokens: requests are granted in weighted fair
+    order, evenly with the 'fair' policy, or with the 'order' policy weighted
+    by clip priority, where each transfer gets ORDER_DECAY times the weight
+    of the one ahead of it, so the clip an editor needs next finishes first
+    while the rest keep moving. The rate may be changed at any time from any
+    thread.
+    """
+
+    def __init__(self, rate=0, policy='order', logger=None):
+        """
+        :param rate: Budget in bytes per second; 0 for unlimited.
+        :param policy: 'order' (weighted by clip priority) or 'fair' (equal shares).
+        :param logger: Logger object
+        """
+        if policy not in ('order', 'fair'):
+            raise ValueError(f"Unknown bandwidth policy: {policy}")
+        self.policy = policy
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self._rate = max(0, int(rate or 0))
+        self._shares = []
+        self._waiting = set()
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+        # Virtual time of the weighted fair queue: start tag of the last grant
+        self._clock = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        """
+        Change the budget; waiting transfers adapt within WAIT_SLICE seconds.
+
+        :param rate: Bytes per second; 0 for unlimited.
+        """
+        with self._lock:
+            self._refill()
+            self._rate = max(0, int(rate or 0))
+        self.logger.info(f"Bandwidth limit {'off' if not self._rate else f'{self._rate / 2 ** 20:.2f} MiB/s'}")
+
+    def open(self, priority=0):
+        """
+        Register a starting transfer.
+
+        :param priority: Lower values are served first with the 'order' policy.
+        :return: BandwidthShare; close it (or use it as a context manager) when the transfer ends.
+        """
+        share = BandwidthShare(self, priority)
+        with self._lock:
+            share._finish = self._clock
+            self._shares.append(share)
+            self._rebalance()
+        return share
+
+    def _remove(self, share):
+        with self._lock:
+            self._waiting.discard(share)
+            share._tag = None
+            if share in self._shares:
+                self._shares.remove(share)
+                self._rebalance()
+
+    def _withdraw(self, share):
+        # A transfer that stopped waiting (granted, failed or cancelled) must not hold up the queue
+        if share._tag is not None:
+            with self._lock:
+                self._waiting.discard(share)
+                share._tag = None
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._rate:
+            # Idle time banks up to one burst
+            self._tokens = min(self._tokens + (now - self._refilled) * self._rate, self._rate * BURST_SECONDS)
+        self._refilled = now
+
+    def _take(self, share, size):
+        """
+        Grant size bytes to share if the bucket has tokens and no waiter is ahead of it.
+
+        :return: 0 if granted, otherwise an estimate of the seconds to wait before asking again.
+        """
+        if not self._rate:
+            return 0
+        with self._lock:
+            rate = self._rate
+            if not rate:
+                return 0
+            self._refill()
+            if share._tag is None:
+                share._tag = max(share._finish, self._clock) + size / share.weight
+                self._waiting.add(share)
+            first = min(self._waiting, key=lambda waiting: waiting._tag)
+            if first is share and self._tokens > 0:
+                # The bucket may go into debt for one read; the next grant waits until it is paid off
+                self._tokens -= size
+                self._clock = max(self._clock, share._tag - size / share.weight)
+                share._finish = share._tag
+                share._tag = None
+                self._waiting.discard(share)
+                return 0
+            return max(-self._tokens, size if first is not share else 0) / rate or WAIT_SLICE
+
+    def _rebalance(self):
+        if self.policy == 'fair':
+            for share in self._shares:
+                share.weight = 1.0
+            return
+        for rank, share in enumerate(sorted(self._shares, key=lambda s: s.priority)):
+            share.weight = max(ORDER_DECAY ** rank, MIN_WEIGHT)
+
+class ReadyPrefix:
+    """
+    Tracks the longest run of clips, in input order, that are all on disk,
+    and reports each time it grows: an editor can start on clips 1..k while
+    the rest of the batch is still downloading.
+    """
+
+    def __init__(self, on_ready=None, logger=None):
+        """
+        :param on_ready: Optional callback on_ready(order, count), where order is the last clip
+                         of the prefix and count the number of clips in it.
+        :param logger: Logger object
+        """
+        self.on_ready = on_ready
+        self.logger = logger or logging.getLogger('TwitchClipDownloader')
+        self.count = 0
+        self.last_order = None
+        self._sequence = []
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(clip):
+        return clip['order'], clip['player']
+
+    def add(self, clip):
+        """
+        Register the next clip of the input.
+        """
+        with self._lock:
+            self._sequence.append((self._key(clip), clip['order']))
+
+    def mark_ready(self, clip):
+        """
+        Record that a clip is on disk.
+        """
+        with self._lock:
+            self._ready.add(self._key(clip))
+            start = self.count
+            while self.count < len(self._sequence) and self._sequence[self.count][0] in self._ready:
+                self._ready.discard(self._sequence[self.count][0])
+                self.count += 1
+            if self.count == start:
+                return
+            self.last_order = self._sequence[self.count - 1][1]
+            order, count = self.last_order, self.count
+
+        level = logging.INFO if count // READY_LOG_EVERY > start // READY_LOG_EVERY else logging.DEBUG
+        self.logger.log(level, f"Ready: first {count} clips are on disk (up to #{order})")
+        if self.on_ready is not None:
+            self.on_ready(order, count)
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from downloader.disk_writer import preallocate
+from downloader.file_manager import (
+    get_session, get_part_paths, get_resume_headers, finish_part, CONTENT_RANGE_PATTERN
+)
+
+# Clips smaller than two segments of this size stay single-stream
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+MAX_SEGMENTS = 8
+
+def plan_segments(size, max_segments=MAX_SEGMENTS, min_segment_size=MIN_SEGMENT_SIZE):
+    """
+    Split a file into byte ranges, one per concurrent connection.
+
+    The segment count grows with the file size, from 1 up to max_segments.
+
+    :param size: File size in bytes.
+    :param max_segments: Upper bound on the number of segments.
+    :param min_segment_size: Smallest segment worth its own connection.
+    :return: List of inclusive (start, end) byte ranges.
+    """
+    count = max(1, min(max_segments, size // min_segment_size))
+    step = -(-size // count)
+    return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+def probe(download_url, session, timeout=10):
+    """
+    Ask the server for the size of a file and whether it serves byte ranges.
+
+    :return: Tuple of (size or None, supports ranges, ETag/Last-Modified validator).
+    """
+    response = session.head(download_url, allow_redirects=True, timeout=timeout)
+    response.raise_for_status()
+    length = response.headers.get('Content-Length')
+    size = int(length) if length and length.isdigit() else None
+    accepts_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+    validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+    return size, accepts_ranges, validator
+
+def fetch_segment(download_url, part_path, start, end, session, validator=None, retries=3, timeout=30,
+                  on_progress=None, bandwidth=None):
+    """
+    Download one byte range into its offset of the preallocated partial file.
+
+    A failed attempt is retried from the last byte written, without touching
+    the other segments.
+
+    :param on_progress: Optional callback on_progress(bytes_written, retried).
+    :param bandwidth: Optional BandwidthShare of the clip, shared by its segments.
+    """
+    position = start
+    for attempt in range(retries + 1):
+        if attempt and on_progress is not None:
+            on_progress(0, True)
+        headers = {'Range': f"bytes={position}-{end}"}
+        if validator:
+            headers['If-Range'] = validator
+        try:
+            with session.get(download_url, headers=headers, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+                if response.status_code != 206 or not match or int(match.group(1)) != position:
+                    raise IOError(f"Server did not honour range {position}-{end}")
+
+                with open(part_path, 'r+b') as f:
+                    f.seek(position)
+                    for chunk in response.iter_content(chunk_size=65536):
+                        f.write(chunk)
+                        position += len(chunk)
+                        if on_progress is not None:
+                            on_progress(len(chunk), False)
+                        if bandwidth is not None:
+                            bandwidth.consume(len(chunk))
+
+            if position == end + 1:
+                return
+            raise IOError(f"Segment {start}-{end} ended at byte {position}")
+        except Exception:
+            if attempt == retries:
+                raise
+
+def save_clip_segmented(download_url, file_path, session=None, max_segments=MAX_SEGMENTS,
+                        min_segment_size=MIN_SEGMENT_SIZE, retries=3, stats=None, check=None, bandwidth=None):
+    """
+    Download a clip over several concurrent range requests.
+
+    :param download_url: Download URL.
+    :param file_path: Final path of the clip.
+    :param session: requests Session to use (defaults to the shared one).
+    :param max_segments: Upper bound on concurrent connections for this clip.
+    :param min_segment_size: Smallest segment worth its own connection.
+    :param retries: Retries per segment.
+    :param stats: Optional dictionary filled with transfer stats: bytes, ttfb (seconds) and retries.
+    :param check: Optional content check passed to finish_part.
+    :param bandwidth: Optional BandwidthShare pacing all segments together.
+    :return: True if the clip was downloaded, False if it should go single-stream
+             (small file, no range support, or a resumable partial file exists).
+    """
+    session = session or get_session()
+    if get_resume_headers(file_path)[1]:
+        return False
+
+    request_start = time.perf_counter()
+    size, accepts_ranges, validator = probe(download_url, session)
+    if not size or not accepts_ranges:
+        return False
+    segments = plan_segments(size, max_segments, min_segment_size)
+    if len(segments) < 2:
+        return False
+
+    part_path, meta_path = get_part_paths(file_path)
+    # A segmented .part has holes until every range is in, so it is never resumed
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    with open(part_path, 'wb') as f:
+        if not preallocate(f.fileno(), 0, size):
+            f.truncate(size)
+
+    if stats is None:
+        stats = {}
+    stats.update(bytes=0, ttfb=time.perf_counter() - request_start, retries=stats.get('retries', 0))
+    stats_lock = threading.Lock()
+
+    def on_progress(written, retried):
+        with stats_lock:
+            stats['bytes'] += written
+            stats['retries'] += retried
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            futures = [
+                executor.submit(fetch_segment, download_url, part_path, start, end, session, validator, retries,
+                                on_progress=on_progress, bandwidth=bandwidth)
+                for start, end in segments
+            ]
+            for future in futures:
+                future.result()
+    except Exception:
+        os.remove(part_path)
+        raise
+
+    finish_part(file_path, size, check)
+    return True
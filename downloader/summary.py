@@ -0,0 +1,84 @@
+import threading
+import time
+from downloader.retry import is_transient
+
+class BatchSummary:
+    """
+    Thread-safe record of what happened to every clip in a batch.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at = None
+        self.cancelled = False
+        self.completed = []
+        self.failed = []
+        self.skipped = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _clip_fields(clip):
+        return {'order': clip['order'], 'player': clip['player'], 'url': clip['url']}
+
+    def record_completed(self, clip, **fields):
+        entry = self._clip_fields(clip)
+        entry.update(fields)
+        with self._lock:
+            self.completed.append(entry)
+
+    def record_failed(self, clip, phase, error):
+        """
+        :param clip: Clip dictionary.
+        :param phase: 'resolve' or 'download'.
+        :param error: Exception or message describing the failure.
+        """
+        entry = self._clip_fields(clip)
+        entry.update(phase=phase, error=str(error))
+        if isinstance(error, BaseException):
+            entry['transient'] = is_transient(error)
+        with self._lock:
+            self.failed.append(entry)
+
+    def record_skipped(self, clip, reason):
+        entry = self._clip_fields(clip)
+        entry['reason'] = reason
+        with self._lock:
+            self.skipped.append(entry)
+
+    def finish(self, cancelled=False):
+        self.finished_at = time.time()
+        self.cancelled = cancelled
+
+    def write_failed(self, path):
+        """
+        Write the failed clips as an input file that can be fed straight back in
+        to retry them. Each "@player" line carries "#<order>" so the retried
+        clips keep their original file names (and resume their partial files).
+
+        :param path: File to write.
+        :return: Number of clips written.
+        """
+        with self._lock:
+            failed = sorted(self.failed, key=lambda c: c['order'])
+        with open(path, 'w', encoding='utf-8') as f:
+            for clip in failed:
+                f.write(f"@{clip['player']} #{clip['order']}\n{clip['url']}\n\n")
+        return len(failed)
+
+    def as_dict(self):
+        """
+        :return: JSON-serialisable summary of the batch.
+        """
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                'total': len(self.completed) + len(self.failed) + len(self.skipped),
+                'completed': len(self.completed),
+                'failed': len(self.failed),
+                'skipped': len(self.skipped),
+                'cancelled': self.cancelled,
+                'elapsed_seconds': round(end - self.started_at, 3),
+                'clips': sorted(self.completed, key=lambda c: c['order']),
+                'failures': sorted(self.failed, key=lambda c: c['order']),
+                'skipped_clips': sorted(self.skipped, key=lambda c: c['order']),
+            }
@@ -1,39 +1,102 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
+import json
 import logging
+import re
+import time
 
-def get_clip_download_url(clip_url, driver):
+# Clip media requests seen in the browser's network log
+MEDIA_URL_PATTERN = re.compile(r'^https?://[^?#]+\.mp4(?:[?#]|$)', re.IGNORECASE)
+
+def get_clip_download_url(clip_url, driver, logger=None):
     """
     Get the download link for a Twitch clip.
     
     :param clip_url: URL of the Twitch clip page.
     :param driver: WebDriver instance to use for fetching the page.
-    :return: Download URL of the clip, or None if failed.
+    :param logger: Logger object
+    :return: Download URL of the clip, or None if the video element has no source.
+    :raises: WebDriver errors, e.g. TimeoutException when the video never appears.
+    """
+    # Selenium is only loaded once the browser path is actually used
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    logger = logger or logging.getLogger('TwitchClipDownloader')
+    logger.debug(f"Fetching clip page: {clip_url}")
+
+    # Page load and wait errors propagate so the caller can tell a slow page from a missing clip
+    driver.get(clip_url)
+
+    # Wait for the video element to be present
+    video_element = WebDriverWait(driver, 10).until(
+        EC.presence_of_element_located((By.TAG_NAME, "video"))
+    )
+
+    # Get the src attribute of the video element
+    video_url = video_element.get_attribute('src')
+
+    if video_url:
+        logger.debug(f"Found video URL: {video_url}")
+        return video_url
+    else:
+        logger.warning(f"Video element has no source: {clip_url}")
+        return None
+
+def find_media_request(entries, media_pattern=MEDIA_URL_PATTERN):
+    """
+    Find the first clip media request in performance log entries.
+
+    :param entries: Entries returned by driver.get_log('performance').
+    :param media_pattern: Compiled pattern the media URL must match.
+    :return: Media URL, or None if no entry is a media request.
     """
-    try:
-        print(f"Fetching clip page: {clip_url}")
-        
-        driver.get(clip_url)
-        
-        # Wait for the video element to be present
-        video_element = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "video"))
-        )
-        
-        # Get the src attribute of the video element
-        video_url = video_element.get_attribute('src')
-        
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, TypeError, ValueError):
+            continue
+        if message.get('method') != 'Network.requestWillBeSent':
+            continue
+        params = message.get('params', {})
+        url = params.get('request', {}).get('url', '')
+        if media_pattern.match(url) or (params.get('type') == 'Media' and url.startswith('http')):
+            return url
+    return None
+
+def get_clip_download_url_lean(clip_url, driver, timeout=10, poll_interval=0.05, media_pattern=MEDIA_URL_PATTERN,
+                               logger=None):
+    """
+    Get the download link for a Twitch clip from the browser's network events.
+
+    The page is not rendered to the end: as soon as the player requests the
+    clip media, its URL is taken from the performance log. The driver must
+    come from create_driver(lean=True), which blocks the media request itself
+    along with images, fonts and stylesheets.
+
+    :param clip_url: URL of the Twitch clip page.
+    :param driver: Lean WebDriver instance.
+    :param timeout: Seconds to wait for the media request.
+    :param poll_interval: Seconds between reads of the performance log.
+    :param media_pattern: Compiled pattern the media URL must match.
+    :param logger: Logger object
+    :return: Download URL of the clip.
+    :raises: WebDriver errors, TimeoutException when the player never requests the media.
+    """
+    from selenium.common.exceptions import TimeoutException
+
+    logger = logger or logging.getLogger('TwitchClipDownloader')
+    logger.debug(f"Fetching clip page (lean): {clip_url}")
+
+    # Drop events left over from the previous page, including the pool's about:blank reset
+    driver.get_log('performance')
+    deadline = time.monotonic() + timeout
+    driver.get(clip_url)
+
+    while True:
+        video_url = find_media_request(driver.get_log('performance'), media_pattern)
         if video_url:
-            print(f"Found video URL: {video_url}")
+            logger.debug(f"Found video URL: {video_url}")
             return video_url
-        else:
-            print("Could not find video URL")
-            return None
-    except Exception as e:
-        logging.error(f"Error parsing clip {clip_url}: {str(e)}")
-        return None
+        if time.monotonic() >= deadline:
+            raise TimeoutException(f"No media request within {timeout}s: {clip_url}")
+        time.sleep(poll_interval)
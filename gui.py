@@ -1,30 +1,65 @@
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QTextEdit, QLineEdit, QLabel, QFileDialog
+    QPushButton, QTextEdit, QPlainTextEdit, QLineEdit, QLabel, QFileDialog, QCheckBox, QTableView,
+    QHeaderView, QSplitter, QDoubleSpinBox
 )
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QPalette, QColor, QTextCharFormat
 import sys
 import os
 from pathlib import Path
 from typing import Optional
-from downloader.downloader import download_clips
+from downloader.downloader import download_jobs
+from downloader.job_queue import JobQueue, get_jobs_path, make_batch_id
+from downloader.progress import ClipProgress
 from downloader.clip_loader import load_clips_info
-from utils.logger import setup_logger, GUILogHandler
+from downloader.resolve_cache import open_resolve_cache
+from downloader.scheduling import BandwidthLimiter
+from utils.gui_logger import GUILogHandler
+from utils.gui_progress import ClipTableModel, format_bytes
+from utils.logger import setup_logger
+
+# Lines kept in the log view; older ones scroll out (the log file keeps everything)
+MAX_LOG_LINES = 5000
 
 class DownloadThread(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    ready = pyqtSignal(int, int)
 
-    def __init__(self, clips_info, output_dir, logger):
+    def __init__(self, clips_info, output_dir, logger, use_cache=True, progress=None, bandwidth=None):
+        """
+        :param clips_info: Clips to queue, or None to resume the output directory's queue.
+        :param bandwidth: BandwidthLimiter the GUI may retune while the batch runs.
+        """
         super().__init__()
         self.clips_info = clips_info
         self.output_dir = output_dir
         self.logger = logger
+        self.use_cache = use_cache
+        self.progress = progress
+        self.bandwidth = bandwidth
 
     def run(self):
         try:
-            download_clips(self.clips_info, self.output_dir, logger=self.logger)
+            # The queue lives in the output directory, so a crashed run can be resumed from there
+            jobs = JobQueue(get_jobs_path(self.output_dir), logger=self.logger)
+            try:
+                # A new download only works on its own clips; leftovers of earlier runs wait for Resume
+                batch = None
+                if self.clips_info is not None:
+                    batch = make_batch_id()
+                    jobs.add(self.clips_info, batch)
+                    leftover = jobs.unfinished(exclude_batch=batch)
+                    if leftover:
+                        self.logger.warning(f"{leftover} unfinished clips of an earlier run are left in this folder; "
+                                            f"use Resume to download them")
+                # Let the batch find its own concurrency rather than sticking to the defaults
+                download_jobs(jobs, self.output_dir, batch=batch, logger=self.logger, use_cache=self.use_cache,
+                              adaptive=True, failed_file=os.path.join(self.output_dir, 'failed_clips.txt'),
+                              progress=self.progress, bandwidth=self.bandwidth, on_ready=self.ready.emit)
+            finally:
+                jobs.close()
             self.finished.emit()
         except Exception as e:
             self.error.emit(str(e))
@@ -33,7 +68,7 @@ class TwitchClipDownloaderGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Twitch Clip Downloader")
-        self.setGeometry(100, 100, 600, 500)
+        self.setGeometry(100, 100, 700, 650)
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -50,9 +85,14 @@ class TwitchClipDownloaderGUI(QMainWindow):
         self.output_entry.setText(self.default_output_dir)
 
         self.gui_log_handler = GUILogHandler()
-        self.gui_log_handler.new_log.connect(self.update_log)
+        self.gui_log_handler.new_logs.connect(self.update_log)
         self.logger = setup_logger(gui_handler=self.gui_log_handler)
         self.download_thread: Optional[DownloadThread] = None
+        self.progress_model: Optional[ClipTableModel] = None
+        self.ready_text = ''
+        # One budget for the window's lifetime, so the spin box can retune a running batch
+        self.bandwidth = BandwidthLimiter(logger=self.logger)
+        self.bandwidth_spin.valueChanged.connect(self.set_bandwidth)
 
     def setup_ui(self):
         # Input text area
@@ -72,15 +112,54 @@ class TwitchClipDownloaderGUI(QMainWindow):
         output_layout.addWidget(self.output_button)
         self.layout.addLayout(output_layout)
 
-        # Log area
-        self.log_text = QTextEdit()
+        # Resolve cache controls
+        cache_layout = QHBoxLayout()
+        self.cache_checkbox = QCheckBox("Use resolve cache")
+        self.cache_checkbox.setChecked(True)
+        self.purge_cache_button = QPushButton("Purge Cache")
+        self.purge_cache_button.clicked.connect(self.purge_cache)
+        cache_layout.addWidget(self.cache_checkbox)
+        cache_layout.addStretch()
+        self.bandwidth_spin = QDoubleSpinBox()
+        self.bandwidth_spin.setRange(0, 1000)
+        self.bandwidth_spin.setDecimals(1)
+        self.bandwidth_spin.setSingleStep(0.5)
+        self.bandwidth_spin.setSpecialValueText("Unlimited")
+        self.bandwidth_spin.setToolTip("Download bandwidth limit in MB/s, applied immediately; earlier clips get more")
+        cache_layout.addWidget(QLabel("Max MB/s:"))
+        cache_layout.addWidget(self.bandwidth_spin)
+        cache_layout.addWidget(self.purge_cache_button)
+        self.layout.addLayout(cache_layout)
+
+        # Per-clip progress table above the log; uniform rows keep large batches cheap to scroll
+        self.progress_table = QTableView()
+        self.progress_table.verticalHeader().setVisible(False)
+        self.progress_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.progress_table.verticalHeader().setDefaultSectionSize(20)
+        self.progress_table.horizontalHeader().setStretchLastSection(True)
+        self.progress_label = QLabel("")
+
+        # Log area, a ring buffer of the latest lines
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
-        self.layout.addWidget(self.log_text)
+        self.log_text.setMaximumBlockCount(MAX_LOG_LINES)
 
-        # Start Download button
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        splitter.addWidget(self.progress_table)
+        splitter.addWidget(self.log_text)
+        self.layout.addWidget(self.progress_label)
+        self.layout.addWidget(splitter)
+
+        # Start Download and Resume buttons
+        button_layout = QHBoxLayout()
         self.start_button = QPushButton("Start Download")
         self.start_button.clicked.connect(self.start_download)
-        self.layout.addWidget(self.start_button)
+        self.resume_button = QPushButton("Resume")
+        self.resume_button.setToolTip("Continue the unfinished clips of an earlier run in the output directory")
+        self.resume_button.clicked.connect(self.resume_download)
+        button_layout.addWidget(self.start_button, 1)
+        button_layout.addWidget(self.resume_button)
+        self.layout.addLayout(button_layout)
 
     def set_dark_mode_styles(self):
         # Set dark background and light text for better contrast
@@ -100,9 +179,9 @@ class TwitchClipDownloaderGUI(QMainWindow):
         dark_palette.setColor(QPalette.ColorRole.HighlightedText, QColor(0, 0, 0))
         self.setPalette(dark_palette)
 
-        # Style for QTextEdit (input_text and log_text)
+        # Style for the text areas and the progress table
         text_edit_style = """
-            QTextEdit {
+            QTextEdit, QPlainTextEdit, QTableView {
                 background-color: #232323;
                 color: #ffffff;
                 border: 1px solid #555555;
@@ -110,6 +189,7 @@ class TwitchClipDownloaderGUI(QMainWindow):
         """
         self.input_text.setStyleSheet(text_edit_style)
         self.log_text.setStyleSheet(text_edit_style)
+        self.progress_table.setStyleSheet(text_edit_style)
 
         # Remove link formatting
         text_char_format = QTextCharFormat()
@@ -146,45 +226,99 @@ class TwitchClipDownloaderGUI(QMainWindow):
             }
         """
         self.output_button.setStyleSheet(button_style)
+        self.purge_cache_button.setStyleSheet(button_style)
         self.start_button.setStyleSheet(button_style)
+        self.resume_button.setStyleSheet(button_style)
 
     def select_output_directory(self):
         dir_path = QFileDialog.getExistingDirectory(self, "Select Output Directory")
         if dir_path:
             self.output_entry.setText(dir_path)
 
+    def purge_cache(self):
+        cache = open_resolve_cache(self.logger)
+        try:
+            cache.purge()
+        finally:
+            cache.close()
+
     def start_download(self):
         input_text = self.input_text.toPlainText()
         output_dir = self.output_entry.text() or self.default_output_dir
 
         if not input_text.strip():
-            self.log_text.append("Please enter clip information.")
+            self.log_text.appendPlainText("Please enter clip information.")
             return
 
+        self.run_download(load_clips_info(input_text), output_dir)
+
+    def resume_download(self):
+        output_dir = self.output_entry.text() or self.default_output_dir
+        if not os.path.exists(get_jobs_path(output_dir)):
+            self.log_text.appendPlainText("No earlier run to resume in this output directory.")
+            return
+        self.run_download(None, output_dir)
+
+    def run_download(self, clips_info, output_dir):
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-        clips_info = load_clips_info(input_text)
-        self.download_thread = DownloadThread(clips_info, output_dir, self.logger)
+        progress = ClipProgress()
+        self.ready_text = ''
+        self.progress_model = ClipTableModel(progress, clips_info or (), parent=self)
+        self.progress_model.totals_changed.connect(self.update_totals)
+        self.progress_table.setModel(self.progress_model)
+        self.progress_model.start()
+
+        self.download_thread = DownloadThread(
+            clips_info, output_dir, self.logger, use_cache=self.cache_checkbox.isChecked(), progress=progress,
+            bandwidth=self.bandwidth
+        )
+        self.download_thread.ready.connect(self.update_ready)
         self.download_thread.finished.connect(self.download_finished)
         self.download_thread.error.connect(self.handle_error)
         self.download_thread.start()
 
         self.start_button.setEnabled(False)
         self.start_button.setStyleSheet(self.start_button.styleSheet())
+        self.resume_button.setEnabled(False)
+
+    def stop_progress(self):
+        # Show the final state of every clip, including log lines still buffered
+        self.gui_log_handler.flush_pending()
+        if self.progress_model is not None:
+            self.progress_model.stop()
 
     def download_finished(self):
-        self.log_text.append("Download completed.")
+        self.stop_progress()
+        self.log_text.appendPlainText("Download completed.")
         self.start_button.setEnabled(True)
         self.start_button.setStyleSheet(self.start_button.styleSheet())
+        self.resume_button.setEnabled(True)
 
     def handle_error(self, error_message):
-        self.log_text.append(f"Error: {error_message}")
+        self.stop_progress()
+        self.log_text.appendPlainText(f"Error: {error_message}")
         self.start_button.setEnabled(True)
         self.start_button.setStyleSheet(self.start_button.styleSheet())
+        self.resume_button.setEnabled(True)
+
+    def update_log(self, lines):
+        # One insert per flushed batch instead of one per record
+        self.log_text.appendPlainText('\n'.join(lines))
+
+    def set_bandwidth(self, value):
+        self.bandwidth.set_rate(value * 1024 * 1024)
+
+    def update_ready(self, order, count):
+        self.ready_text = f" - ready up to #{order}"
 
-    def update_log(self, message):
-        self.log_text.append(message)
+    def update_totals(self, totals):
+        counts = ', '.join(f"{totals[state]} {state}" for state in
+                           ('done', 'failed', 'skipped', 'downloading', 'resolved', 'resolving', 'queued')
+                           if totals.get(state))
+        speed = f", {format_bytes(totals['speed'])}/s" if totals['speed'] else ''
+        self.progress_label.setText(f"{counts} - {format_bytes(totals['bytes'])}{speed}{self.ready_text}")
 
 def main():
     app = QApplication(sys.argv)
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standin_server import StandinServer
+
+@pytest.fixture
+def server():
+    """
+    Local stand-in for Twitch clip pages and the clip CDN, serving 256 KiB clips.
+    """
+    server = StandinServer(payload_size=256 * 1024, seed=1).start()
+    yield server
+    server.stop()
@@ -0,0 +1,20 @@
+import cli
+from downloader.job_queue import JobQueue
+
+def test_missing_input_file_closes_queue(tmp_path, monkeypatch):
+    closed = []
+    close = JobQueue.close
+    monkeypatch.setattr(JobQueue, 'close', lambda self: (closed.append(self), close(self)))
+
+    assert cli.main(['-i', str(tmp_path / 'missing.txt'), '-o', str(tmp_path / 'out')]) == 2
+    assert len(closed) == 1
+
+def test_unusable_output_directory_is_not_an_input_error(tmp_path, caplog):
+    input_file = tmp_path / 'clips.txt'
+    input_file.write_text('')
+    output = tmp_path / 'out'
+    output.write_text('not a directory')
+
+    assert cli.main(['-i', str(input_file), '-o', str(output)]) == 2
+    assert 'Cannot open the job queue' in caplog.text
+    assert 'Cannot read input file' not in caplog.text
@@ -0,0 +1,23 @@
+import pytest
+
+from benchmarks.bench_clip_loader import legacy_load_clips_info, make_input
+from downloader.clip_loader import iter_clips, load_clips_info
+
+@pytest.mark.parametrize('text', [
+    make_input(200),
+    "\n\n@Alpha\n\nhttps://www.twitch.tv/s/clip/Slug1\n\n@Beta\nhttps://twitch.tv/s/clip/Slug-2?filter=clips\n",
+    "@Alpha\nsome note\nhttps://www.twitch.tv/s/clip/Slug1 trailing text\n@Beta\nhttp://twitch.tv/s/clip/Slug2\n",
+    "@Alpha\r\nhttps://www.twitch.tv/s/clip/Slug1\r\n",
+    "  @Alpha  \n   https://www.twitch.tv/s/clip/Slug1  \n",
+    "@Alpha\n@Beta\nhttps://www.twitch.tv/s/clip/Slug1\n",
+    "@Alpha\nhttps://www.twitch.tv/s/clip/Slug1\n@Orphan\n@Orphan2\n",
+    "",
+], ids=['generated', 'blank-lines', 'notes', 'crlf', 'indented', 'two-mentions', 'orphans', 'empty'])
+def test_matches_legacy_parser(text):
+    assert [clip.as_dict() for clip in iter_clips(text)] == legacy_load_clips_info(text)
+    assert [clip.as_dict() for clip in load_clips_info(text)] == legacy_load_clips_info(text)
+
+def test_reports_orphan_mentions():
+    issues = []
+    list(iter_clips("@Alpha\nhttps://www.twitch.tv/s/clip/Slug1\n@Orphan\n", on_issue=lambda *issue: issues.append(issue)))
+    assert issues == [(3, "@Orphan has no clip URL")]
@@ -0,0 +1,109 @@
+import logging
+import threading
+
+import pytest
+import requests
+
+from downloader import concurrency
+from downloader.concurrency import AdaptiveLimiter, is_throttling_error
+from downloader.downloader import download_clips
+
+class Clock:
+    """
+    Stand-in for time.monotonic() that only moves when told to.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(concurrency.time, 'monotonic', clock)
+    return clock
+
+def run_round(limiter, clock, size=1, latency=0.1, throttled=False):
+    """
+    Use every slot of the current limit for one second, then report the work.
+    """
+    slots = limiter.limit
+    for _ in range(slots):
+        limiter.acquire()
+    clock.now += 1.0
+    for _ in range(slots):
+        limiter.release()
+        limiter.record(latency, size, throttled)
+
+def test_slow_start_doubles_then_stops_at_ceiling(clock):
+    changes = []
+    limiter = AdaptiveLimiter(floor=1, ceiling=10, on_change=changes.append)
+    for _ in range(5):
+        run_round(limiter, clock)
+    assert changes == [2, 4, 8, 10]
+    assert limiter.limit == 10
+
+def test_throttling_cuts_limit(clock):
+    limiter = AdaptiveLimiter(floor=2, ceiling=32, initial=16)
+    limiter.acquire()
+    limiter.record(0.1, throttled=True)
+    assert limiter.limit == 8
+    # Work started before the cut fails too; it does not cut again during the cooldown
+    limiter.record(0.1, throttled=True)
+    assert limiter.limit == 8
+    assert limiter.throttled == 2
+
+def test_limit_never_drops_below_floor(clock):
+    limiter = AdaptiveLimiter(floor=3, ceiling=32, initial=4)
+    for _ in range(3):
+        clock.now += 10
+        limiter.record(0.1, throttled=True)
+    assert limiter.limit == 3
+
+def test_memory_pressure_cuts_limit(clock):
+    pressure = [False]
+    limiter = AdaptiveLimiter(floor=1, ceiling=32, initial=8, pressure=lambda: pressure[0])
+    pressure[0] = True
+    run_round(limiter, clock)
+    assert limiter.limit == 4
+
+def test_flat_throughput_steps_back(clock):
+    limiter = AdaptiveLimiter(floor=1, ceiling=32, initial=4)
+    # Each round finishes the same work in the same time, however many slots it uses
+    run_round(limiter, clock, size=0.25)
+    assert limiter.limit == 8
+    run_round(limiter, clock, size=0.125)
+    assert limiter.limit == 7
+
+def test_acquire_waits_for_a_free_slot():
+    limiter = AdaptiveLimiter(floor=1, ceiling=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release()
+    assert acquired.wait(5)
+    thread.join()
+
+def test_throttling_errors(server):
+    server.error_rate = 1.0
+    response = requests.get(server.media_url('Slug1'))
+    assert is_throttling_error(requests.HTTPError(response=response))
+    assert is_throttling_error(requests.Timeout())
+    assert not is_throttling_error(ValueError('bad data'))
+    assert not is_throttling_error('503 Service Unavailable')
+
+def test_adaptive_batch_against_throttling_server(server, tmp_path):
+    server.media_limit = 4
+    server.bandwidth = 2 * 1024 * 1024
+    clips = [{'name': str(i), 'url': server.clip_url(f"Slug{i}"), 'order': i, 'player': 'Player'}
+             for i in range(1, 41)]
+    summary = download_clips(clips, str(tmp_path), max_workers=4, logger=logging.getLogger('TwitchClipDownloader'),
+                             resolver='http', download_workers=32, use_cache=False, adaptive=True, retries=10)
+    # The limit had to come down: the server turned transfers away, yet every clip made it
+    assert server.throttled_responses > 0
+    assert summary['completed'] == 40
+    assert summary['failed'] == 0
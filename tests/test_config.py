@@ -0,0 +1,19 @@
+import pytest
+
+from utils.config import parse_rate
+
+@pytest.mark.parametrize('text, rate', [
+    ('0', 0),
+    ('500', 500),
+    ('500K', 500 * 1024),
+    ('2.5M', int(2.5 * 2 ** 20)),
+    ('1GiB/s', 2 ** 30),
+    (' 8 mb ', 8 * 2 ** 20),
+])
+def test_parse_rate(text, rate):
+    assert parse_rate(text) == rate
+
+@pytest.mark.parametrize('text', ['', 'fast', '-1M', '5T'])
+def test_parse_rate_rejects_garbage(text):
+    with pytest.raises(ValueError):
+        parse_rate(text)
@@ -0,0 +1,86 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks.standin_server import StandinServer
+from downloader.disk_writer import CHECKPOINT_BYTES, DiskWriter
+from downloader.file_manager import get_part_paths, get_resume_headers, save_clip
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def writer():
+    writer = DiskWriter(buffer_size=64 * 1024, buffers=4).start()
+    yield writer
+    writer.close()
+
+def write_all(writer, part, data):
+    for start in range(0, len(data), writer.buffer_size):
+        buffer = writer.get_buffer()
+        chunk = data[start:start + writer.buffer_size]
+        buffer[:len(chunk)] = chunk
+        part.write(buffer, len(chunk))
+
+def test_writes_in_order(writer, tmp_path):
+    data = os.urandom(1024 * 1024 + 123)
+    with writer.open(str(tmp_path / 'clip.part')) as part:
+        write_all(writer, part, data)
+    assert (tmp_path / 'clip.part').read_bytes() == data
+
+def test_appends_after_existing_data(writer, tmp_path):
+    path = tmp_path / 'clip.part'
+    path.write_bytes(b'head')
+    with writer.open(str(path), 'ab') as part:
+        write_all(writer, part, b'tail')
+    assert path.read_bytes() == b'headtail'
+
+def test_early_close_drops_preallocated_space(writer, tmp_path):
+    path = str(tmp_path / 'clip.part')
+    progress = []
+    part = writer.open(path, total=10 * CHECKPOINT_BYTES, checkpoint=progress.append)
+    write_all(writer, part, b'x' * (CHECKPOINT_BYTES + 1000))
+    assert part.close() == CHECKPOINT_BYTES + 1000
+    assert os.path.getsize(path) == CHECKPOINT_BYTES + 1000
+    # Recorded before preallocating, after CHECKPOINT_BYTES and on close
+    assert progress[0] == 0
+    assert progress[-1] == CHECKPOINT_BYTES + 1000
+    assert progress == sorted(progress)
+
+def test_checkpoint_only_for_preallocated_files(writer, tmp_path):
+    progress = []
+    with writer.open(str(tmp_path / 'clip.part'), checkpoint=progress.append) as part:
+        write_all(writer, part, b'x' * 1000)
+    assert progress == []
+
+@pytest.mark.skipif(not hasattr(os, 'posix_fallocate') or sys.platform.startswith('win'),
+                    reason='needs preallocation and SIGKILL')
+def test_resumes_after_kill_mid_transfer(tmp_path):
+    # 12 MiB at 8 MiB/s: killed after a second, well past the first checkpoint and short of the end
+    server = StandinServer(payload_size=12 * 1024 * 1024, bandwidth=8 * 1024 * 1024).start()
+    try:
+        script = ("import sys; from downloader.file_manager import save_clip; "
+                  "save_clip(sys.argv[1], 'clip', sys.argv[2], None)")
+        process = subprocess.Popen([sys.executable, '-c', script, server.media_url('Slug1'), str(tmp_path)],
+                                   cwd=REPO_DIR)
+        time.sleep(1.0)
+        process.send_signal(signal.SIGKILL)
+        process.wait()
+
+        file_path = str(tmp_path / 'clip.mp4')
+        part_path = get_part_paths(file_path)[0]
+        assert os.path.getsize(part_path) == len(server.payload)
+        offset = get_resume_headers(file_path)[1]
+        assert CHECKPOINT_BYTES <= offset < len(server.payload)
+
+        server.bandwidth = 0
+        stats = {}
+        save_clip(server.media_url('Slug1'), 'clip', str(tmp_path), None, stats=stats)
+        assert stats['bytes'] == len(server.payload) - offset
+        with open(file_path, 'rb') as f:
+            assert f.read() == server.payload
+    finally:
+        server.stop()
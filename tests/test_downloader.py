@@ -0,0 +1,64 @@
+import logging
+
+import pytest
+
+from downloader.async_engine import AsyncDownloadEngine
+from downloader.downloader import MAX_RERESOLVES, save_resolved_clip
+from downloader.file_manager import FileCounter
+from downloader.manifest import Manifest
+from downloader.resolvers import ClipResolver, get_clip_slug
+from downloader.summary import BatchSummary
+
+logger = logging.getLogger('TwitchClipDownloader')
+
+class StandinResolver(ClipResolver):
+    """
+    Resolves clips to the stand-in's media URL, except for the first `broken` lookups of each clip,
+    which point at the clip page (HTML served with 200) the way a stale URL might.
+    """
+    name = 'standin'
+
+    def __init__(self, server, broken=1):
+        self.server = server
+        self.broken = broken
+        self.lookups = {}
+        self.invalidated = []
+
+    def resolve(self, clip_url):
+        slug = get_clip_slug(clip_url)
+        self.lookups[slug] = self.lookups.get(slug, 0) + 1
+        if self.lookups[slug] <= self.broken:
+            return self.server.clip_url(slug)
+        return self.server.media_url(slug)
+
+    def invalidate(self, clip_url):
+        self.invalidated.append(clip_url)
+
+def download(server, tmp_path, resolver, engine=None):
+    clip = {'name': '1', 'url': 'https://www.twitch.tv/s/clip/Slug1', 'order': 1, 'player': 'Player'}
+    manifest = Manifest(str(tmp_path))
+    summary = BatchSummary()
+    future = save_resolved_clip(clip, resolver.resolve(clip['url']), str(tmp_path), logger, FileCounter(0),
+                                engine=engine, manifest=manifest, summary=summary, resolver=resolver)
+    if future is not None:
+        future.exception(timeout=30)
+    return manifest, summary
+
+@pytest.mark.parametrize('engine', ['threads', 'asyncio'])
+def test_invalid_media_is_resolved_again(server, tmp_path, engine):
+    resolver = StandinResolver(server)
+    if engine == 'asyncio':
+        with AsyncDownloadEngine(max_concurrency=2) as transfer_engine:
+            manifest, summary = download(server, tmp_path, resolver, transfer_engine)
+    else:
+        manifest, summary = download(server, tmp_path, resolver)
+    assert resolver.lookups == {'Slug1': 2}
+    assert resolver.invalidated == ['https://www.twitch.tv/s/clip/Slug1']
+    assert (tmp_path / '1@Player.mp4').read_bytes() == server.payload
+    assert manifest.is_present('Slug1')
+
+def test_gives_up_when_clip_keeps_resolving_to_invalid_media(server, tmp_path):
+    resolver = StandinResolver(server, broken=MAX_RERESOLVES + 1)
+    manifest, _ = download(server, tmp_path, resolver)
+    assert resolver.lookups == {'Slug1': MAX_RERESOLVES + 1}
+    assert not manifest.is_present('Slug1')
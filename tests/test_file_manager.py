@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.standin_server import PAYLOAD_ETAG
+from downloader.async_engine import AsyncDownloadEngine
+from downloader.file_manager import get_part_paths, get_resume_headers, save_clip
+from downloader.mp4_validator import InvalidMediaError
+from downloader.retry import is_transient
+
+def write_partial(server, file_path, size, validator=PAYLOAD_ETAG):
+    """
+    Leave a partial download of the stand-in's payload behind, as an interrupted run would.
+    """
+    part_path, meta_path = get_part_paths(file_path)
+    with open(part_path, 'wb') as f:
+        f.write(server.payload[:size])
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'validator': validator, 'total': len(server.payload)}, f)
+
+def test_downloads_through_part_file(server, tmp_path):
+    stats = {}
+    assert save_clip(server.media_url('Slug1'), 'clip', str(tmp_path), None, stats=stats)
+    file_path = tmp_path / 'clip.mp4'
+    assert file_path.read_bytes() == server.payload
+    assert stats['bytes'] == len(server.payload)
+    assert stats['media']['duration'] == 28
+    assert sorted(os.listdir(tmp_path)) == ['clip.mp4']
+
+def test_resume_headers(server, tmp_path):
+    file_path = str(tmp_path / 'clip.mp4')
+    assert get_resume_headers(file_path) == ({}, 0)
+    write_partial(server, file_path, 1000)
+    assert get_resume_headers(file_path) == ({'Range': 'bytes=1000-', 'If-Range': PAYLOAD_ETAG}, 1000)
+
+def test_resumes_partial_file_with_range(server, tmp_path):
+    file_path = str(tmp_path / 'clip.mp4')
+    half = len(server.payload) // 2
+    write_partial(server, file_path, half)
+
+    stats = {}
+    assert save_clip(server.media_url('Slug1'), 'clip', str(tmp_path), None, stats=stats)
+    # Only the missing half was transferred
+    assert stats['bytes'] == len(server.payload) - half
+    with open(file_path, 'rb') as f:
+        assert f.read() == server.payload
+    assert sorted(os.listdir(tmp_path)) == ['clip.mp4']
+
+def test_async_engine_resumes_partial_file(server, tmp_path):
+    file_path = str(tmp_path / 'clip.mp4')
+    half = len(server.payload) // 2
+    write_partial(server, file_path, half)
+
+    stats = {}
+    with AsyncDownloadEngine(max_concurrency=2) as engine:
+        engine.submit(server.media_url('Slug1'), 'clip', str(tmp_path), stats=stats).result(timeout=30)
+    assert stats['bytes'] == len(server.payload) - half
+    with open(file_path, 'rb') as f:
+        assert f.read() == server.payload
+
+def test_restarts_partial_file_with_stale_validator(server, tmp_path):
+    file_path = str(tmp_path / 'clip.mp4')
+    write_partial(server, file_path, 1000, validator='"some-older-version"')
+
+    stats = {}
+    assert save_clip(server.media_url('Slug1'), 'clip', str(tmp_path), None, stats=stats)
+    assert stats['bytes'] == len(server.payload)
+    with open(file_path, 'rb') as f:
+        assert f.read() == server.payload
+
+def test_rejects_html_payload(server, tmp_path):
+    # A clip page served with 200 where the media should be
+    with pytest.raises(InvalidMediaError):
+        save_clip(server.clip_url('Slug1'), 'clip', str(tmp_path), None)
+    assert os.listdir(tmp_path) == []
+
+def test_async_engine_rejects_html_payload(server, tmp_path):
+    with AsyncDownloadEngine(max_concurrency=2) as engine:
+        future = engine.submit(server.clip_url('Slug1'), 'clip', str(tmp_path))
+        with pytest.raises(InvalidMediaError):
+            future.result(timeout=30)
+    assert os.listdir(tmp_path) == []
+
+def test_invalid_media_is_not_transient(server, tmp_path):
+    with pytest.raises(InvalidMediaError) as error:
+        save_clip(server.clip_url('Slug1'), 'clip', str(tmp_path), None)
+    assert not is_transient(error.value)
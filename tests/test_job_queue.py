@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from downloader.job_queue import DONE, FAILED, PENDING, JobQueue, get_jobs_path
+
+# Worker IDs on another host, so their leases are never reclaimed early as dead local processes
+WORKER_A = 'elsewhere:1:aaaaaaaa'
+WORKER_B = 'elsewhere:2:bbbbbbbb'
+
+def make_clips(count):
+    return [{'url': f"https://www.twitch.tv/s/clip/Slug{i}", 'order': i, 'player': f"Player{i}"}
+            for i in range(1, count + 1)]
+
+@pytest.fixture
+def jobs(tmp_path):
+    jobs = JobQueue(get_jobs_path(str(tmp_path)), lease_seconds=0.2, max_attempts=2)
+    yield jobs
+    jobs.close()
+
+def test_leased_jobs_are_not_claimed_twice(jobs):
+    jobs.add(make_clips(3))
+    claimed = jobs.claim(WORKER_A, limit=2)
+    assert [clip['order'] for clip in claimed] == [1, 2]
+    assert [clip['order'] for clip in jobs.claim(WORKER_B, limit=5)] == [3]
+
+def test_expired_lease_is_reclaimed(jobs):
+    jobs.add(make_clips(1))
+    [job] = jobs.claim(WORKER_A)
+    assert jobs.claim(WORKER_B) == []
+
+    time.sleep(0.3)
+    assert [clip['job_id'] for clip in jobs.claim(WORKER_B)] == [job['job_id']]
+    # The worker that lost the lease may not finish the job any more
+    assert not jobs.finish(job['job_id'], WORKER_A)
+    assert jobs.finish(job['job_id'], WORKER_B)
+    assert jobs.counts() == {DONE: 1}
+
+def test_heartbeat_keeps_lease(jobs):
+    jobs.add(make_clips(1))
+    jobs.claim(WORKER_A)
+    for _ in range(3):
+        time.sleep(0.1)
+        assert jobs.heartbeat(WORKER_A) == 1
+    assert jobs.claim(WORKER_B) == []
+
+def test_job_lost_too_often_fails(jobs):
+    jobs.add(make_clips(1))
+    jobs.claim(WORKER_A)
+    time.sleep(0.3)
+    jobs.claim(WORKER_B)
+    time.sleep(0.3)
+    assert jobs.claim(WORKER_A) == []
+    counts = jobs.counts()
+    assert counts[FAILED] == 1
+    assert counts.get(PENDING, 0) == 0
+
+def test_fresh_batch_claims_only_its_own_jobs(jobs):
+    jobs.add(make_clips(2), batch='old')
+    jobs.add(make_clips(4)[2:], batch='new')
+    assert [clip['order'] for clip in jobs.claim(WORKER_A, limit=10, batch='new')] == [3, 4]
+    assert jobs.unfinished(exclude_batch='new') == 2
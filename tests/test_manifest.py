@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+
+from downloader.file_manager import SharedFileCounter, save_clip
+from downloader.job_queue import JobQueue, get_jobs_path
+from downloader.manifest import MANIFEST_NAME, Manifest, hash_file
+
+def write_clip(output_dir, filename, data=b'clip data'):
+    with open(os.path.join(output_dir, filename), 'wb') as f:
+        f.write(data)
+
+def test_add_and_reload(tmp_path):
+    write_clip(tmp_path, '1@Alpha.mp4')
+    manifest = Manifest(str(tmp_path))
+    entry = manifest.add('Slug1', '1@Alpha.mp4')
+    assert entry['number'] == 1
+    assert entry['size'] == len(b'clip data')
+    assert entry['sha256'] == hash_file(str(tmp_path / '1@Alpha.mp4'))
+
+    reloaded = Manifest(str(tmp_path))
+    assert reloaded.get('Slug1') == entry
+    assert reloaded.max_number == 1
+    assert reloaded.next_number() == 2
+
+def test_add_uses_streamed_digest(tmp_path):
+    write_clip(tmp_path, '1@Alpha.mp4')
+    entry = Manifest(str(tmp_path)).add('Slug1', '1@Alpha.mp4', 7, sha256='streamed')
+    assert (entry['number'], entry['sha256']) == (7, 'streamed')
+
+def test_ignores_torn_final_line(tmp_path):
+    write_clip(tmp_path, '1@Alpha.mp4')
+    Manifest(str(tmp_path)).add('Slug1', '1@Alpha.mp4')
+    # A crash in the middle of appending the next record
+    with open(tmp_path / MANIFEST_NAME, 'a', encoding='utf-8') as f:
+        f.write('{"slug": "Slug2", "filename": "2@Be')
+
+    manifest = Manifest(str(tmp_path))
+    assert len(manifest) == 1
+    assert manifest.is_present('Slug1')
+
+def test_later_records_win(tmp_path):
+    write_clip(tmp_path, '1@Alpha.mp4')
+    manifest = Manifest(str(tmp_path))
+    manifest.add('Slug1', '1@Alpha.mp4', 1)
+    write_clip(tmp_path, '1@Alpha.mp4', b'downloaded again')
+    manifest.add('Slug1', '1@Alpha.mp4', 5)
+    assert Manifest(str(tmp_path)).get('Slug1')['size'] == len(b'downloaded again')
+
+def test_is_present_checks_file_size(tmp_path):
+    write_clip(tmp_path, '1@Alpha.mp4')
+    write_clip(tmp_path, '2@Beta.mp4')
+    manifest = Manifest(str(tmp_path))
+    manifest.add('Slug1', '1@Alpha.mp4')
+    manifest.add('Slug2', '2@Beta.mp4')
+
+    write_clip(tmp_path, '1@Alpha.mp4', b'trunc')
+    os.remove(tmp_path / '2@Beta.mp4')
+    assert not manifest.is_present('Slug1')
+    assert not manifest.is_present('Slug2')
+    assert not manifest.is_present('Slug3')
+
+def test_rebuild_from_files(tmp_path):
+    write_clip(tmp_path, '1@Alpha.mp4', b'first')
+    write_clip(tmp_path, '2@Beta.mp4', b'second')
+    os.utime(tmp_path / '1@Alpha.mp4', (1000, 1000))
+    os.utime(tmp_path / '2@Beta.mp4', (2000, 2000))
+    write_clip(tmp_path, 'notes.txt')
+    clips = [{'order': 1, 'player': 'Alpha', 'url': 'https://www.twitch.tv/s/clip/Slug1'}]
+
+    manifest = Manifest(str(tmp_path))
+    assert manifest.rebuild(clips) == 2
+    with open(tmp_path / MANIFEST_NAME, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    assert [(e['slug'], e['filename'], e['number']) for e in entries] == \
+        [('Slug1', '1@Alpha.mp4', 1), (None, '2@Beta.mp4', 2)]
+    assert entries[1]['sha256'] == hash_file(str(tmp_path / '2@Beta.mp4'))
+    assert manifest.is_present('Slug1')
+    assert manifest.max_number == 2
+
+def test_streamed_digest_matches_file(server, tmp_path):
+    stats = {}
+    save_clip(server.media_url('Slug1'), 'clip', str(tmp_path), None, stats=stats)
+    assert stats['sha256'] == hash_file(str(tmp_path / 'clip.mp4'))
+
+def test_numbers_are_unique_across_workers(tmp_path):
+    # Two workers on one folder, each seeded from the same manifest
+    queues = [JobQueue(get_jobs_path(str(tmp_path))) for _ in range(2)]
+    counters = [SharedFileCounter(jobs, 5) for jobs in queues]
+    numbers = []
+    lock = threading.Lock()
+
+    def allocate(counter):
+        for _ in range(50):
+            number = counter.get_next()
+            with lock:
+                numbers.append(number)
+
+    threads = [threading.Thread(target=allocate, args=(counter,)) for counter in counters for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(numbers) == list(range(5, 205))
+    for jobs in queues:
+        jobs.close()
@@ -0,0 +1,69 @@
+import json
+import time
+from urllib.parse import quote
+
+import pytest
+
+from downloader.resolve_cache import EXPIRY_MARGIN, CachedResolver, ResolveCache, get_url_expiry
+from downloader.resolvers import GqlResolver
+
+def signed_url(expires):
+    token = quote(json.dumps({'expires': expires}))
+    return f"https://cdn.example/clip.mp4?sig=abc&token={token}"
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResolveCache(str(tmp_path / 'cache.sqlite'), max_entries=3)
+    yield cache
+    cache.close()
+
+def test_reads_expiry_from_signed_url():
+    assert get_url_expiry(signed_url(1700000000)) == 1700000000
+    assert get_url_expiry('https://cdn.example/clip.mp4') is None
+    assert get_url_expiry('https://cdn.example/clip.mp4?token=not-json') is None
+
+def test_hit_and_miss(cache):
+    download_url = signed_url(time.time() + 3600)
+    assert cache.get('Slug1') is None
+    cache.put('Slug1', download_url, {'slug': 'Slug1'})
+    assert cache.get('Slug1') == {'download_url': download_url, 'metadata': {'slug': 'Slug1'}}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_url_close_to_expiry_is_not_cached(cache):
+    cache.put('Slug1', signed_url(time.time() + EXPIRY_MARGIN / 2))
+    assert cache.get('Slug1') is None
+
+def test_unsigned_url_expires_after_default_ttl(tmp_path):
+    cache = ResolveCache(str(tmp_path / 'cache.sqlite'), default_ttl=0.2)
+    cache.put('Slug1', 'https://cdn.example/clip.mp4')
+    assert cache.get('Slug1') is not None
+    time.sleep(0.3)
+    assert cache.get('Slug1') is None
+    cache.close()
+
+def test_evicts_least_recently_used(cache):
+    expires = time.time() + 3600
+    for slug in ('Slug1', 'Slug2', 'Slug3'):
+        cache.put(slug, signed_url(expires))
+        time.sleep(0.01)
+    # Using Slug1 makes Slug2 the least recently used entry
+    assert cache.get('Slug1') is not None
+    time.sleep(0.01)
+    cache.put('Slug4', signed_url(expires))
+    assert [slug for slug in ('Slug1', 'Slug2', 'Slug3', 'Slug4') if cache.get(slug, count=False)] == \
+        ['Slug1', 'Slug3', 'Slug4']
+
+def test_cached_resolver_skips_lookup_on_hit(server, cache):
+    resolver = CachedResolver(GqlResolver(gql_url=f"{server.base_url}/gql"), cache)
+    url = 'https://www.twitch.tv/streamer/clip/Slug1'
+    first = resolver.resolve(url)
+    assert resolver.resolve(url) == first
+    resolver.prefetch([url])
+    assert resolver.resolve(url) == first
+    assert server.gql_requests == 1
+    assert resolver.get_metadata(url)['slug'] == 'Slug1'
+
+    resolver.invalidate(url)
+    assert cache.get('Slug1', count=False) is None
+    assert resolver.resolve(url) == first
+    assert server.gql_requests == 2
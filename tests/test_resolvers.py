@@ -0,0 +1,69 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+from downloader.resolvers import GqlResolver, parse_clip_access_token
+
+def clip_urls(count, prefix='Slug'):
+    return [f"https://www.twitch.tv/streamer/clip/{prefix}{i}" for i in range(count)]
+
+def test_gql_prefetch_batches_slugs(server):
+    resolver = GqlResolver(batch_size=35, gql_url=f"{server.base_url}/gql")
+    urls = clip_urls(70)
+    resolver.prefetch(urls + urls[:5])
+    assert server.gql_requests == 2
+
+    download_url = resolver.resolve(urls[3])
+    assert download_url.startswith(server.media_url('Slug3') + '?sig=')
+    # Prefetched clips resolve without another round trip
+    assert server.gql_requests == 2
+    resolver.close()
+
+def test_gql_missing_clip_resolves_to_none(server):
+    resolver = GqlResolver(gql_url=f"{server.base_url}/gql")
+    resolver.prefetch(clip_urls(2, 'Missing') + clip_urls(1))
+    assert resolver.resolve(clip_urls(1, 'Missing')[0]) is None
+    assert resolver.resolve(clip_urls(1)[0])
+    assert server.gql_requests == 1
+    resolver.close()
+
+def test_gql_failed_batch_falls_back_to_single_lookups(server):
+    server.gql_batch_limit = 5
+    resolver = GqlResolver(batch_size=10, gql_url=f"{server.base_url}/gql")
+    urls = clip_urls(10)
+    resolver.prefetch(urls)
+    # The rejected batch is not remembered, so each clip is looked up on its own
+    assert resolver.resolve(urls[0]).startswith(server.media_url('Slug0'))
+    assert server.gql_requests == 2
+    resolver.close()
+
+def test_gql_invalidate_forgets_clip(server):
+    resolver = GqlResolver(gql_url=f"{server.base_url}/gql")
+    url = clip_urls(1)[0]
+    resolver.resolve(url)
+    resolver.invalidate(url)
+    resolver.resolve(url)
+    assert server.gql_requests == 2
+    resolver.close()
+
+def test_parse_clip_access_token_picks_best_quality(server):
+    metadata = parse_clip_access_token('Slug1', server.clip_access_token('Slug1'))
+    assert [q['quality'] for q in metadata['qualities']] == ['1080', '720', '480']
+
+    url = urlparse(metadata['playback_url'])
+    assert f"{url.scheme}://{url.netloc}{url.path}" == server.media_url('Slug1')
+    query = parse_qs(url.query)
+    assert query['sig'] == [metadata['signature']]
+    assert json.loads(query['token'][0])['clip_uri'] == server.media_url('Slug1')
+
+def test_parse_clip_access_token_extends_existing_query():
+    item = {'data': {'clip': {
+        'playbackAccessToken': {'signature': 'abc', 'value': '{"a": 1}'},
+        'videoQualities': [{'quality': '720', 'frameRate': 30, 'sourceURL': 'https://cdn/clip.mp4?x=1'}],
+    }}}
+    metadata = parse_clip_access_token('Slug', item)
+    assert metadata['playback_url'] == 'https://cdn/clip.mp4?x=1&sig=abc&token=%7B%22a%22%3A%201%7D'
+
+def test_parse_clip_access_token_without_clip():
+    assert parse_clip_access_token('Gone', {'data': {'clip': None}}) is None
+    assert parse_clip_access_token('Gone', {'data': {'clip': {'videoQualities': []}}}) is None
+    assert parse_clip_access_token('Gone', {'errors': [{'message': 'service error'}]}) is None
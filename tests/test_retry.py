@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from downloader.file_manager import save_clip
+from downloader.mp4_validator import InvalidMediaError
+from downloader.retry import CircuitOpenError, RetryPolicy, is_transient
+
+def make_policy(**options):
+    # Short timings so an outage plays out in well under a second
+    return RetryPolicy(**{'attempts': 2, 'base_delay': 0.01, 'max_delay': 0.05, 'failure_threshold': 2,
+                          'reset_timeout': 0.1, 'max_outage': 30.0, **options})
+
+def test_retries_transient_errors(server, tmp_path):
+    server.error_rate = 0.5
+    policy = make_policy(attempts=20)
+    stats = {}
+    policy.run(lambda: save_clip(server.media_url('Slug1'), 'clip', str(tmp_path), None, stats=stats),
+               server.media_url('Slug1'), stats)
+    assert (tmp_path / 'clip.mp4').read_bytes() == server.payload
+
+def test_does_not_retry_not_found(server, tmp_path):
+    policy = make_policy(attempts=5)
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        save_clip(f"{server.base_url}/missing/clip.mp4", 'clip', str(tmp_path), None)
+
+    with pytest.raises(Exception):
+        policy.run(attempt, server.base_url)
+    assert len(calls) == 1
+
+def test_breaker_holds_clip_until_host_recovers(server, tmp_path):
+    # The host fails every request for a while, far more often than the attempt limit allows
+    server.error_rate = 1.0
+    recovery = threading.Timer(0.8, lambda: setattr(server, 'error_rate', 0.0))
+    recovery.start()
+    policy = make_policy()
+    url = server.media_url('Slug1')
+    try:
+        policy.run(lambda: save_clip(url, 'clip', str(tmp_path), None), url)
+    finally:
+        recovery.cancel()
+    assert (tmp_path / 'clip.mp4').read_bytes() == server.payload
+    assert server.errors_injected > policy.attempts
+    assert policy.breaker(url).state == 'closed'
+
+def test_breaker_gives_up_after_max_outage(server, tmp_path):
+    server.error_rate = 1.0
+    policy = make_policy(max_outage=0.5)
+    url = server.media_url('Slug1')
+    with pytest.raises(CircuitOpenError):
+        policy.run(lambda: save_clip(url, 'clip', str(tmp_path), None), url)
+    assert policy.breaker(url).state != 'closed'
+
+def open_breaker(policy, url):
+    breaker = policy.breaker(url)
+    for _ in range(policy.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == 'open'
+    return breaker
+
+@pytest.mark.parametrize('path', ['/missing/clip.mp4', '/streamer/clip/Slug1'], ids=['not-found', 'html'])
+def test_probe_answered_with_permanent_error_closes_breaker(server, tmp_path, path):
+    policy = make_policy(max_outage=5.0)
+    breaker = open_breaker(policy, server.base_url)
+    time.sleep(policy.reset_timeout)
+
+    # The probe reaches the host, which answers with a 404 or an HTML page instead of the clip
+    with pytest.raises((requests.HTTPError, InvalidMediaError)):
+        policy.run(lambda: save_clip(f"{server.base_url}{path}", 'clip', str(tmp_path), None), server.base_url)
+    assert breaker.state == 'closed'
+
+    start = time.monotonic()
+    assert policy.run(lambda: 'ok', server.base_url) == 'ok'
+    assert time.monotonic() - start < 0.5
+
+def test_interrupted_probe_lets_another_operation_probe(server):
+    policy = make_policy()
+    breaker = open_breaker(policy, server.base_url)
+    time.sleep(policy.reset_timeout)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        policy.run(interrupted, server.base_url)
+    start = time.monotonic()
+    assert policy.run(lambda: 'ok', server.base_url) == 'ok'
+    assert time.monotonic() - start < 0.5
+    assert breaker.state == 'closed'
+
+def test_not_found_is_permanent(server, tmp_path):
+    with pytest.raises(requests.HTTPError) as error:
+        save_clip(f"{server.base_url}/missing/clip.mp4", 'clip', str(tmp_path), None)
+    assert error.value.response.status_code == 404
+    assert not is_transient(error.value)
+
+def test_unavailable_is_transient(server, tmp_path):
+    server.error_rate = 1.0
+    with pytest.raises(requests.HTTPError) as error:
+        save_clip(server.media_url('Slug1'), 'clip', str(tmp_path), None)
+    assert error.value.response.status_code == 503
+    assert is_transient(error.value)
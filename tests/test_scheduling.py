@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from downloader.scheduling import BandwidthLimiter, ReadyPrefix, clip_priority
+
+READ_SIZE = 32 * 1024
+
+def transfer(limiter, size, priority=0):
+    with limiter.open(priority) as share:
+        for _ in range(size // READ_SIZE):
+            share.consume(READ_SIZE)
+    return time.monotonic()
+
+def transfer_all(limiter, size, priorities):
+    finished = {}
+    threads = [threading.Thread(target=lambda p=p: finished.__setitem__(p, transfer(limiter, size, p)))
+               for p in priorities]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return finished
+
+def test_unlimited_does_not_wait():
+    start = time.monotonic()
+    transfer(BandwidthLimiter(0), 4 * 2 ** 20)
+    assert time.monotonic() - start < 0.1
+
+def test_rate_is_capped():
+    start = time.monotonic()
+    transfer(BandwidthLimiter(4 * 2 ** 20), 2 ** 20)
+    # 1 MiB at 4 MiB/s, with no banked burst at the start
+    assert 0.2 <= time.monotonic() - start < 0.5
+
+def test_order_policy_finishes_first_clip_first():
+    start = time.monotonic()
+    finished = transfer_all(BandwidthLimiter(2 * 2 ** 20, 'order'), 2 ** 19, [1, 2])
+    # The first clip gets two thirds of the budget while both run: done after about 0.375 s, the other at 0.5 s
+    assert finished[1] - start < 0.45
+    assert finished[2] - finished[1] > 0.07
+
+def test_fair_policy_shares_evenly():
+    start = time.monotonic()
+    finished = transfer_all(BandwidthLimiter(2 * 2 ** 20, 'fair'), 2 ** 19, [1, 2])
+    assert abs(finished[1] - finished[2]) < 0.15
+    assert finished[1] - start > 0.4
+
+def test_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        BandwidthLimiter(0, 'fastest')
+
+def test_clip_priority():
+    assert clip_priority({'order': 3}) == 3
+    assert clip_priority({'order': 3, 'priority': None}) == 3
+    assert clip_priority({'order': 3, 'priority': 0}) == 0
+
+def test_ready_prefix_grows_in_input_order():
+    reports = []
+    ready = ReadyPrefix(on_ready=lambda order, count: reports.append((order, count)))
+    clips = [{'order': order, 'player': 'Player'} for order in (1, 2, 3, 5)]
+    for clip in clips:
+        ready.add(clip)
+
+    ready.mark_ready(clips[1])
+    ready.mark_ready(clips[2])
+    assert ready.count == 0 and reports == []
+
+    ready.mark_ready(clips[0])
+    assert reports == [(3, 3)]
+    ready.mark_ready(clips[3])
+    assert reports == [(3, 3), (5, 4)]
+    assert ready.last_order == 5
@@ -1,14 +1,110 @@
 import argparse
+import os
+import re
+import sys
 
-def parse_arguments():
+RATE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?(?:/s)?\s*$', re.IGNORECASE)
+
+def get_app_dir(name):
+    """
+    Directory for application data such as logs and caches.
+
+    Frozen executables use the per-user application data folder, scripts use
+    a folder next to the working directory.
+
+    :param name: Sub-directory name, e.g. 'logs'.
+    :return: Path of the directory (created if missing).
+    """
+    # Determine if the application is running as a script or frozen executable
+    if getattr(sys, 'frozen', False):
+        if sys.platform.startswith('win'):
+            app_dir = os.path.join(os.environ['APPDATA'], 'TwitchClipDownloader', name)
+        elif sys.platform.startswith('darwin'):
+            app_dir = os.path.expanduser(f'~/Library/Application Support/TwitchClipDownloader/{name}')
+        else:
+            app_dir = os.path.join(os.path.expanduser('~'), '.TwitchClipDownloader', name)
+    else:
+        app_dir = name
+
+    if not os.path.exists(app_dir):
+        os.makedirs(app_dir)
+    return app_dir
+
+def parse_rate(text):
+    """
+    Parse a bandwidth such as "500K", "2.5M" or "1G" (bytes per second, binary multiples).
+
+    :return: Bytes per second; 0 for unlimited.
+    :raises ValueError: If the text is not a rate.
+    """
+    match = RATE_PATTERN.match(str(text))
+    if not match:
+        raise ValueError(f"Invalid bandwidth: {text}")
+    scale = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}[match.group(2).lower()]
+    return int(float(match.group(1)) * scale)
+
+def parse_arguments(argv=None):
     """
     Parse command line arguments.
+
+    A leading "resume" selects the resume command, which works through the
+    job queue of the output directory instead of reading an input file.
     
-    :return: Command line argument object.
+    :param argv: Argument list, defaults to sys.argv[1:].
+    :return: Command line argument object; args.resume tells which command was given.
     """
-    parser = argparse.ArgumentParser(description='Twitch Clips Downloader')
-    parser.add_argument('-i', '--input', required=True, help='Text file containing clip links and names')
+    if argv is None:
+        argv = sys.argv[1:]
+    resume = bool(argv) and argv[0] == 'resume'
+    if resume:
+        argv = argv[1:]
+
+    parser = argparse.ArgumentParser(prog='cli.py resume' if resume else None,
+                                     description='Twitch Clips Downloader' + (' - resume a batch' if resume else ''))
+    if not resume:
+        parser.add_argument('-i', '--input', required=True, help='Text file containing clip links and names')
     parser.add_argument('-o', '--output', required=True, help='Directory to save downloaded files')
-    parser.add_argument('-t', '--threads', type=int, default=5, help='Number of parallel download threads')
+    parser.add_argument('-t', '--threads', type=int, default=5,
+                        help='Number of parallel resolver threads (one browser each when Selenium is used)')
+    parser.add_argument('-d', '--download-workers', type=int, default=20, help='Maximum downloads in flight')
+    parser.add_argument('--resolver', choices=['auto', 'http', 'selenium', 'gql'], default='auto',
+                        help='How clip pages are resolved to media URLs')
+    parser.add_argument('--lean-browser', action='store_true',
+                        help='Block images, fonts and media in Selenium and read the clip URL from network events')
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads', help='Transfer engine')
+    parser.add_argument('--segmented', action='store_true', help='Split large clips into parallel range requests')
+    parser.add_argument('--write-buffer', type=int, default=256, help='KiB per network read and disk write')
+    parser.add_argument('--fsync', action='store_true', help='Flush every clip to disk before recording it')
+    parser.add_argument('--drop-cache', action='store_true', help='Drop finished clips from the OS page cache')
+    parser.add_argument('--max-bandwidth', type=parse_rate, default=0,
+                        help='Combined download limit in bytes per second, e.g. 500K or 2.5M (default: unlimited)')
+    parser.add_argument('--bandwidth-policy', choices=['order', 'fair'], default='order',
+                        help='Split the limit weighted towards earlier clips, or evenly')
+    parser.add_argument('--no-validate', action='store_true', help='Skip the MP4 structure check of downloads')
+    parser.add_argument('--summary', help='Write the JSON run summary to this file instead of stdout')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the resolved URL cache')
+    parser.add_argument('--purge-cache', action='store_true', help='Empty the resolved URL cache before starting')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Tune concurrency while running, with -t and -d as ceilings')
+    parser.add_argument('--min-workers', type=int, default=1, help='Concurrency floor for --adaptive')
+    parser.add_argument('--retries', type=int, default=3, help='Extra attempts for transient failures')
+    parser.add_argument('--max-outage', type=float, default=600,
+                        help='Seconds a failing host may stay down before the clips waiting for it fail')
+    parser.add_argument('--failed-file', help='Write clips that failed to this file, ready to be re-run with -i')
+    parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error'], default='info',
+                        help='Lowest level written to the logs')
+    parser.add_argument('--log-sample', type=float, default=1.0,
+                        help='Fraction of routine per-clip log lines kept, e.g. 0.1 (warnings and errors are always kept)')
+    parser.add_argument('--log-drop', action='store_true',
+                        help='Drop routine log lines instead of waiting when the log writer falls behind')
+    parser.add_argument('--log-json', help='Also write the log to this file as JSON lines with per-clip fields')
+    parser.add_argument('--metrics-file', help='Keep this file updated with metrics in Prometheus text format')
+    parser.add_argument('--trace-file', help='Write resolve and download spans here as Chrome trace JSON')
+    parser.add_argument('--no-wal', action='store_true',
+                        help='Use a rollback journal for the job queue, for workers on several machines')
+    if resume:
+        parser.add_argument('--retry-failed', action='store_true', help='Queue clips that failed before again')
     
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    args.resume = resume
+    return args
@@ -0,0 +1,55 @@
+import logging
+import threading
+from collections import deque
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+class GUILogHandler(QObject, logging.Handler):
+    """
+    Logging handler that buffers records and hands them to the GUI in batches.
+
+    Worker threads only append to a bounded buffer; a timer on the GUI thread
+    flushes it a few times per second with a single signal, so a burst of
+    thousands of records costs a handful of repaints. If the buffer overflows
+    between flushes the oldest lines are dropped and counted.
+    """
+    new_logs = pyqtSignal(list)
+
+    def __init__(self, flush_interval=100, max_pending=2000):
+        """
+        :param flush_interval: Milliseconds between flushes to the view.
+        :param max_pending: Lines kept between flushes; older ones are dropped.
+        """
+        super().__init__()
+        logging.Handler.__init__(self)
+        self._pending = deque(maxlen=max_pending)
+        self._dropped = 0
+        self._buffer_lock = threading.Lock()
+
+        # Created on the GUI thread, so flush_pending() always runs there
+        self._timer = QTimer(self)
+        self._timer.setInterval(flush_interval)
+        self._timer.timeout.connect(self.flush_pending)
+        self._timer.start()
+
+    def emit(self, record):
+        try:
+            msg = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._buffer_lock:
+            if len(self._pending) == self._pending.maxlen:
+                self._dropped += 1
+            self._pending.append(msg)
+
+    def flush_pending(self):
+        with self._buffer_lock:
+            if not self._pending:
+                return
+            lines = list(self._pending)
+            dropped = self._dropped
+            self._pending.clear()
+            self._dropped = 0
+        if dropped:
+            lines.insert(0, f"... {dropped} log lines skipped, see the log file for the full output")
+        self.new_logs.emit(lines)
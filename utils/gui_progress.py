@@ -0,0 +1,99 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer, pyqtSignal
+
+COLUMNS = ('#', 'Player', 'State', 'Size', 'Speed', 'Error')
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+class ClipTableModel(QAbstractTableModel):
+    """
+    Table model of a batch's clips, fed from a ClipProgress.
+
+    The model polls the progress object on a timer instead of reacting to
+    every state change, and reports each poll's changes as one dataChanged
+    range, so the view repaints at most a few times per second however many
+    clips are moving.
+    """
+    totals_changed = pyqtSignal(dict)
+
+    def __init__(self, progress, clips=(), refresh_interval=250, parent=None):
+        """
+        :param progress: ClipProgress the download batch reports to.
+        :param clips: Clips of the batch, shown as queued until they report progress.
+        :param refresh_interval: Milliseconds between polls.
+        """
+        super().__init__(parent)
+        self.progress = progress
+        self._rows = []
+        self._index = {}
+        for clip in clips:
+            self._add_row({'order': clip['order'], 'player': clip['player'], 'state': 'queued',
+                           'bytes': 0, 'speed': None, 'error': None})
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(refresh_interval)
+        self._timer.timeout.connect(self.refresh)
+
+    def _add_row(self, row):
+        self._index[(row['order'], row['player'])] = len(self._rows)
+        self._rows.append(row)
+
+    def start(self):
+        self._timer.start()
+
+    def stop(self):
+        """
+        Stop polling after one last refresh.
+        """
+        self._timer.stop()
+        self.refresh()
+
+    def refresh(self):
+        changes = self.progress.take_changes()
+        new_rows = [row for row in changes if (row['order'], row['player']) not in self._index]
+        if new_rows:
+            # Clips the model was not told about up front (e.g. jobs left by an earlier run) are appended
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(new_rows) - 1)
+            for row in new_rows:
+                self._add_row(row)
+            self.endInsertRows()
+
+        changed = []
+        for row in changes:
+            position = self._index[(row['order'], row['player'])]
+            self._rows[position] = row
+            changed.append(position)
+        if changed:
+            self.dataChanged.emit(self.index(min(changed), 0), self.index(max(changed), len(COLUMNS) - 1))
+        self.totals_changed.emit(self.progress.totals())
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(row['order'])
+        if column == 1:
+            return row['player']
+        if column == 2:
+            return row['state']
+        if column == 3:
+            return format_bytes(row['bytes']) if row['bytes'] else ''
+        if column == 4:
+            return f"{format_bytes(row['speed'])}/s" if row['speed'] else ''
+        return row['error'] or ''
@@ -1,58 +1,192 @@
+import atexit
+import json
 import logging
 import os
-import sys
-from logging.handlers import RotatingFileHandler
-from PyQt6.QtCore import QObject, pyqtSignal
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from utils.config import get_app_dir
 
-class GUILogHandler(QObject, logging.Handler):
-    new_log = pyqtSignal(str)
+# Per-clip fields passed with extra=, copied into JSON log lines when present
+CLIP_FIELDS = ('order', 'player', 'slug', 'phase', 'duration')
+# Records waiting for the listener; beyond this workers wait for room (or drop routine records, if asked to)
+MAX_QUEUED_RECORDS = 10000
 
-    def __init__(self):
+_listener = None
+_listener_lock = threading.Lock()
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, with the per-clip fields of
+    CLIP_FIELDS when the record carries them.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in CLIP_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class ClipSampler(logging.Filter):
+    """
+    Keeps a fraction of routine per-clip records (below WARNING, with a phase
+    field) so a batch of thousands of clips does not drown the log. Batch
+    level lines, warnings and errors always pass. Sampling is deterministic:
+    with rate 0.1 every tenth clip record of each phase is kept.
+    """
+
+    def __init__(self, rate=1.0):
+        """
+        :param rate: Fraction of per-clip records to keep, between 0 and 1.
+        """
         super().__init__()
-        logging.Handler.__init__(self)
+        self.rate = min(1.0, max(0.0, rate))
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        phase = getattr(record, 'phase', None)
+        if self.rate >= 1.0 or phase is None or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            seen = self._seen.get(phase, 0)
+            self._seen[phase] = seen + 1
+        # Keep the record whenever the running total of kept records would tick over
+        return int((seen + 1) * self.rate) > int(seen * self.rate)
+
+class WorkerQueueHandler(QueueHandler):
+    """
+    QueueHandler for worker threads: the record is only stripped of its
+    arguments and put on the queue, formatting happens on the listener thread.
+    When the listener falls behind by MAX_QUEUED_RECORDS, the logging thread
+    waits for room, so no record is lost. With drop_when_behind, routine
+    records are dropped and counted instead; warnings and errors still wait.
+    """
+
+    def __init__(self, log_queue, drop_when_behind=False):
+        """
+        :param log_queue: Queue drained by the listener.
+        :param drop_when_behind: Drop records below WARNING rather than wait when the queue is full.
+        """
+        super().__init__(log_queue)
+        self.drop_when_behind = drop_when_behind
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge the arguments now; they may change before the listener gets to the record
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if not self.drop_when_behind or record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogListener(QueueListener):
+    """
+    QueueListener whose stop() waits for room in a full queue instead of failing.
+    """
 
-    def emit(self, record):
-        msg = self.format(record)
-        self.new_log.emit(msg)
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
 
-def setup_logger(log_file="download.log", max_bytes=1048576, backup_count=5, gui_handler=None):
+def stop_logger():
+    """
+    Stop the listener started by setup_logger, writing out the records still queued.
+    """
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        logger = logging.getLogger('TwitchClipDownloader')
+        dropped = sum(handler.dropped for handler in logger.handlers if isinstance(handler, WorkerQueueHandler))
+        if dropped:
+            # The queue is closed by now; hand the record to the sinks directly
+            listener.handle(logger.makeRecord(logger.name, logging.WARNING, __file__, 0,
+                                              f"{dropped} log records dropped while the log writer was behind",
+                                              None, None))
+        for handler in listener.handlers:
+            handler.close()
+
+def setup_logger(log_file="download.log", max_bytes=1048576, backup_count=5, gui_handler=None, json_file=None,
+                 level=logging.INFO, sample_rate=1.0, log_dir=None, drop_when_behind=False):
+    """
+    Configure the application logger.
+
+    Threads that log only put records on a queue. A single listener thread
+    formats them and writes them to the log file, the console, the GUI
+    handler and the optional JSON-lines file, so no worker waits on disk I/O,
+    file rotation or the GUI.
+
+    :param log_file: Name of the rotating text log file.
+    :param max_bytes: Size at which the text log is rotated.
+    :param backup_count: Rotated text logs kept.
+    :param gui_handler: Optional handler feeding the GUI log view.
+    :param json_file: Optional path of a JSON-lines log with per-clip fields (order, player, slug, phase, duration).
+    :param level: Lowest level logged; DEBUG adds per-request detail.
+    :param sample_rate: Fraction of routine per-clip records kept (see ClipSampler).
+    :param log_dir: Directory of the text log; defaults to the application's logs folder.
+    :param drop_when_behind: Drop routine records instead of waiting when the writer falls
+                             MAX_QUEUED_RECORDS behind; the drop count is logged at the end.
+    :return: Logger object
+    """
+    stop_logger()
     logger = logging.getLogger('TwitchClipDownloader')
-    logger.setLevel(logging.INFO)
+    logger.setLevel(level)
     logger.handlers = []  # Clear existing handlers
 
-    # Determine if the application is running as a script or frozen executable
-    if getattr(sys, 'frozen', False):
-        if sys.platform.startswith('win'):
-            log_dir = os.path.join(os.environ['APPDATA'], 'TwitchClipDownloader', 'logs')
-        elif sys.platform.startswith('darwin'):
-            log_dir = os.path.expanduser('~/Library/Application Support/TwitchClipDownloader/logs')
-        else:
-            log_dir = os.path.join(os.path.expanduser('~'), '.TwitchClipDownloader', 'logs')
-    else:
-        log_dir = 'logs'
-
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    log_dir = log_dir or get_app_dir('logs')
 
     file_handler = RotatingFileHandler(
         os.path.join(log_dir, log_file),
         maxBytes=max_bytes,
         backupCount=backup_count
     )
-    file_handler.setLevel(logging.INFO)
-
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
 
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
-
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    handlers = [file_handler, console_handler]
 
     if gui_handler:
         gui_handler.setFormatter(formatter)
-        logger.addHandler(gui_handler)
+        handlers.append(gui_handler)
+
+    if json_file:
+        json_handler = logging.FileHandler(json_file, encoding='utf-8')
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+
+    log_queue = queue.Queue(MAX_QUEUED_RECORDS)
+    queue_handler = WorkerQueueHandler(log_queue, drop_when_behind=drop_when_behind)
+    if sample_rate < 1.0:
+        # Sampled on the worker side, so skipped records never reach the queue
+        queue_handler.addFilter(ClipSampler(sample_rate))
+    logger.addHandler(queue_handler)
+
+    global _listener
+    listener = LogListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    with _listener_lock:
+        _listener = listener
 
     return logger
+
+# Runs before logging's own shutdown hook, which was registered first
+atexit.register(stop_logger)